@@ -0,0 +1,284 @@
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from .machine import (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, OP_HALT, JUMP_OPS,
+                      PostMachine)
+
+# Виды окончания линейного участка
+K_NEXT, K_IF1, K_IF0, K_HALT = range(4)
+# Сколько участков сливается в один при выполнении (см. flatten)
+MAX_FUSED = 16
+
+
+class Diagnostic(NamedTuple):
+    kind: str            # 'unreachable', 'falls_off_end', 'no_halt', 'dangling_label', 'unused_label', 'duplicate_label'
+    index: Optional[int]  # индекс инструкции, если относится к ней
+    line: Optional[int]   # номер строки исходного текста
+    message: str
+
+
+class Block(NamedTuple):
+    pc: int                             # первая инструкция участка
+    writes: Tuple[Tuple[int, int], ...]  # итоговые записи (смещение от головки на входе, значение)
+    move: int                           # суммарный сдвиг головки
+    nsteps: int                         # число исходных инструкций участка, включая последнюю
+    kind: int
+    taken: Optional[tuple]              # переход (pc, исходный pc, доп. шаги) для K_NEXT/K_IF*, pc для K_HALT
+    fallthrough: Optional[tuple]        # переход при невыполненном условии K_IF*
+
+
+class OptimizedProgram(NamedTuple):
+    blocks: Dict[int, Block]   # по pc первой инструкции; только достижимые участки
+    instructions: int          # исходных инструкций
+    removed: int               # удалено недостижимых инструкций
+    threaded: int              # переходов, сокращённых через цепочки GOTO
+
+
+def successors(code: List[Tuple[int, int]], pc: int) -> List[int]:
+    # Возможные следующие pc; len(code) и больше — выход за конец программы
+    op, target = code[pc]
+    if op == OP_HALT:
+        return []
+    if op == OP_GOTO:
+        return [target]
+    if op in (OP_IF1, OP_IF0):
+        return [target, pc + 1] if target != pc + 1 else [target]
+    return [pc + 1]
+
+
+def build_cfg(code: List[Tuple[int, int]]) -> List[List[int]]:
+    """Граф потока управления по инструкциям: для каждой — список преемников."""
+    return [successors(code, pc) for pc in range(len(code))]
+
+
+def reachable(code: List[Tuple[int, int]], start_pc: int) -> Set[int]:
+    seen: Set[int] = set()
+    stack = [start_pc]
+    while stack:
+        pc = stack.pop()
+        if pc in seen or not (0 <= pc < len(code)):
+            continue
+        seen.add(pc)
+        stack.extend(successors(code, pc))
+    return seen
+
+
+def analyze(pm: PostMachine) -> List[Diagnostic]:
+    """Статическая проверка разобранной программы; ошибки разбора PostMachine выдаёт сама."""
+    code = pm.code
+    n = len(code)
+    found: List[Diagnostic] = []
+
+    def line(idx):
+        return pm.line_numbers[idx] if 0 <= idx < n else None
+
+    seen_labels: Set[str] = set()
+    for text in pm.lines:
+        if text.endswith(':'):
+            lbl = text[:-1].strip()
+            if lbl in seen_labels:
+                found.append(Diagnostic('duplicate_label', None, None,
+                                        f"Метка {lbl} объявлена повторно, используется последнее объявление"))
+            seen_labels.add(lbl)
+
+    live = reachable(code, pm.start_pc)
+    idx = 0
+    while idx < n:
+        if idx in live:
+            idx += 1
+            continue
+        end = idx
+        while end + 1 < n and end + 1 not in live:
+            end += 1
+        where = f"строка {line(idx)}" if end == idx else f"строки {line(idx)}–{line(end)}"
+        found.append(Diagnostic('unreachable', idx, line(idx), f"Недостижимый код: {where}"))
+        idx = end + 1
+
+    for pc in sorted(live):
+        if any(s >= n for s in successors(code, pc)):
+            found.append(Diagnostic('falls_off_end', pc, line(pc),
+                                    f"Строка {line(pc)}: выполнение может выйти за конец программы"))
+
+    targets = {target for op, target in code if op in JUMP_OPS}
+    start_label = next(iter(pm.labels))
+    for lbl, idx in pm.labels.items():
+        if idx >= n:
+            found.append(Diagnostic('dangling_label', None, None,
+                                    f"Метка {lbl} стоит в конце программы и не указывает ни на одну команду"))
+        elif lbl != start_label and idx not in targets:
+            found.append(Diagnostic('unused_label', idx, line(idx), f"Метка {lbl} не используется"))
+
+    if not any(code[pc][0] == OP_HALT for pc in live):
+        found.append(Diagnostic('no_halt', None, None, "Нет достижимой команды HALT: программа не остановится сама"))
+    return found
+
+
+def _leaders(code: List[Tuple[int, int]], start_pc: int) -> Set[int]:
+    leaders = {start_pc}
+    for pc, (op, target) in enumerate(code):
+        if op in JUMP_OPS:
+            leaders.add(target)
+        if op in JUMP_OPS or op == OP_HALT:
+            leaders.add(pc + 1)
+    return leaders
+
+
+def _block(code: List[Tuple[int, int]], pc: int, leaders: Set[int]) -> Block:
+    # Подряд идущие сдвиги складываются, повторные записи в одну ячейку заменяют предыдущие
+    writes: Dict[int, int] = {}
+    move = 0
+    start = pc
+    n = len(code)
+    while pc < n:
+        op, target = code[pc]
+        if op in (OP_MARK, OP_ERASE):
+            writes[move] = 1 if op == OP_MARK else 0
+        elif op == OP_LEFT:
+            move -= 1
+        elif op == OP_RIGHT:
+            move += 1
+        else:
+            nsteps = pc - start + 1
+            if op == OP_HALT:
+                return Block(start, tuple(writes.items()), move, nsteps, K_HALT, pc, None)
+            if op == OP_GOTO:
+                return Block(start, tuple(writes.items()), move, nsteps, K_NEXT, (target, target, 0), None)
+            kind = K_IF1 if op == OP_IF1 else K_IF0
+            return Block(start, tuple(writes.items()), move, nsteps, kind,
+                         (target, target, 0), (pc + 1, pc + 1, 0))
+        pc += 1
+        if pc in leaders:
+            break
+    return Block(start, tuple(writes.items()), move, pc - start, K_NEXT, (pc, pc, 0), None)
+
+
+def optimize(code: List[Tuple[int, int]], start_pc: int) -> OptimizedProgram:
+    """Разбивает достижимый код на линейные участки и сокращает переходы через цепочки GOTO.
+
+    Каждый участок и каждый переход хранят число исходных шагов, поэтому счётчик steps
+    при выполнении совпадает с обычным интерпретатором.
+    """
+    leaders = _leaders(code, start_pc)
+    blocks: Dict[int, Block] = {}
+    stack = [start_pc]
+    while stack:
+        pc = stack.pop()
+        if pc in blocks or not (0 <= pc < len(code)):
+            continue
+        block = _block(code, pc, leaders)
+        blocks[pc] = block
+        for edge in (block.taken, block.fallthrough):
+            if isinstance(edge, tuple):
+                stack.append(edge[0])
+
+    def pure_goto(pc):
+        b = blocks.get(pc)
+        return b is not None and b.kind == K_NEXT and b.nsteps == 1 and not b.writes and not b.move \
+            and code[pc][0] == OP_GOTO
+
+    threaded = 0
+
+    def thread(edge):
+        nonlocal threaded
+        target, orig, extra = edge
+        seen = set()
+        while pure_goto(target) and target not in seen:
+            seen.add(target)
+            target = code[target][1]
+            extra += 1
+        if extra:
+            threaded += 1
+        return target, orig, extra
+
+    for pc, b in list(blocks.items()):
+        if b.kind == K_HALT:
+            continue
+        blocks[pc] = b._replace(taken=thread(b.taken),
+                                fallthrough=thread(b.fallthrough) if b.fallthrough else None)
+    live = reachable(code, start_pc)
+    return OptimizedProgram(blocks, len(code), len(code) - len(live), threaded)
+
+
+def flatten(optimized: OptimizedProgram, n: int) -> List[Optional[tuple]]:
+    """Таблица для run_optimized: по pc начала участка — (kind, writes, move, nsteps, taken, fallthrough).
+
+    Участок, который безусловно переходит дальше (K_NEXT), сливается со следующими за ним,
+    пока не встретится условие, HALT или повтор, так что цикл программы обычно выполняется
+    за одно обращение к таблице. Цепочки GOTO входят в слитый участок вместе со своими шагами.
+    Для pc вне участков (включая n — выход за конец программы) в таблице None.
+    """
+    blocks = optimized.blocks
+    table: List[Optional[tuple]] = [None] * (n + 1)
+    for start in blocks:
+        writes: Dict[int, int] = {}
+        move = nsteps = 0
+        seen = {start}
+        block = blocks[start]
+        while True:
+            for off, val in block.writes:
+                writes[move + off] = val
+            move += block.move
+            nsteps += block.nsteps
+            if block.kind != K_NEXT:
+                break
+            nxt = block.taken[1]
+            if nxt in seen or nxt not in blocks or len(seen) >= MAX_FUSED:
+                break
+            seen.add(nxt)
+            block = blocks[nxt]
+        kind = block.kind
+        if kind == K_HALT:
+            taken, fallthrough = block.taken, None
+        else:
+            taken = block.taken[1]
+            fallthrough = block.fallthrough[1] if block.fallthrough else None
+        table[start] = (kind, tuple(writes.items()), move, nsteps, taken, fallthrough)
+    return table
+
+
+def run_optimized(pm: PostMachine) -> bool:
+    if pm.halted:
+        return True
+    table = getattr(pm.program, '_optimized', None)
+    if table is None:
+        table = pm.program._optimized = flatten(optimize(pm.code, pm.start_pc), len(pm.code))
+    tape = pm.tape
+    get = tape.get
+    pop = tape.pop
+    while True:
+        # Продолжение с середины участка (например, после прерванного запуска): доходим до его конца
+        while not (0 <= pm.pc < len(table)) or table[pm.pc] is None:
+            if pm.halted or pm.steps >= pm.step_limit:
+                return pm.halted
+            pm.step()
+        pc, head, steps, limit = pm.pc, pm.head, pm.steps, pm.step_limit
+        try:
+            while True:
+                entry = table[pc]
+                if entry is None:
+                    break
+                kind, writes, move, nsteps, taken, fallthrough = entry
+                if steps + nsteps > limit:
+                    break
+                steps += nsteps
+                if writes:
+                    for off, val in writes:
+                        if val:
+                            tape[head + off] = 1
+                        else:
+                            pop(head + off, None)
+                head += move
+                if kind == K_IF0:
+                    pc = taken if get(head, 0) == 0 else fallthrough
+                elif kind == K_IF1:
+                    pc = taken if get(head, 0) == 1 else fallthrough
+                elif kind == K_NEXT:
+                    pc = taken
+                else:
+                    pc = taken
+                    pm.halted = True
+                    return True
+        finally:
+            pm.pc, pm.head, pm.steps = pc, head, steps
+        if table[pm.pc] is not None:
+            # Участок не укладывается в лимит шагов: хвост выполняет обычный run()
+            return pm.run()
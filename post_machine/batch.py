@@ -0,0 +1,164 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .machine import PostMachine, tape_from_str
+from .report import RunResult
+
+DEFAULT_CHUNK_SIZE = 64
+# Частей в работе на один рабочий процесс
+MAX_IN_FLIGHT = 2
+
+
+class BatchResult(NamedTuple):
+    program: int
+    input: int
+    halted: bool
+    steps: int
+    tape: str
+    offset: int
+    head: int
+    elapsed: float
+    error: Optional[str] = None
+
+
+# Машины, разобранные один раз на процесс (заполняется инициализатором пула)
+_MACHINES: List[PostMachine] = []
+
+
+def _init_worker(programs: Sequence[str], step_limit: int):
+    _MACHINES[:] = [PostMachine(code, step_limit=step_limit) for code in programs]
+
+
+def _run_one(pm: PostMachine, prog_idx: int, inp_idx: int, data: str, fast: bool) -> BatchResult:
+    start = time.perf_counter()
+    try:
+        pm.reset(tape_from_str(data), head=len(data) - 1)
+        pm.run(fast=fast)
+    except Exception as e:
+        return BatchResult(prog_idx, inp_idx, pm.halted, pm.steps, "", 0, pm.head,
+                           time.perf_counter() - start, str(e))
+    norm, offset, head_norm = RunResult(pm, data).normalized
+    return BatchResult(prog_idx, inp_idx, pm.halted, pm.steps, norm, offset, head_norm,
+                       time.perf_counter() - start)
+
+
+def _run_chunk(chunk: List[Tuple[int,int,str]], fast: bool) -> List[BatchResult]:
+    return [_run_one(_MACHINES[p], p, i, data, fast) for p, i, data in chunk]
+
+
+def _chunks(programs: Sequence[str], inputs: Sequence[str], size: int) -> Iterator[List[Tuple[int,int,str]]]:
+    chunk = []
+    for p in range(len(programs)):
+        for i, data in enumerate(inputs):
+            chunk.append((p, i, data))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+
+def _run_vector(programs: Sequence[str], inputs: Sequence[str], step_limit: int) -> Iterator[BatchResult]:
+    from .vector import VectorMachine, FAILED
+    for p, code in enumerate(programs):
+        start = time.perf_counter()
+        vm = VectorMachine(code, inputs, step_limit=step_limit)
+        status = vm.run()
+        elapsed = (time.perf_counter() - start) / max(len(inputs), 1)
+        for i in range(len(inputs)):
+            pm = vm.machine(i)
+            if status[i] == FAILED:
+                yield BatchResult(p, i, False, pm.steps, "", 0, pm.head, elapsed, "PC выходит за границы программы")
+                continue
+            norm, offset, head_norm = RunResult(pm, inputs[i]).normalized
+            yield BatchResult(p, i, pm.halted, pm.steps, norm, offset, head_norm, elapsed)
+
+
+def run_matrix(programs: Sequence[str], inputs: Sequence[str], step_limit: int=10000,
+               workers: Optional[int]=None, chunk_size: int=DEFAULT_CHUNK_SIZE,
+               fast: bool=False, engine: str="interp") -> Iterator[BatchResult]:
+    """Запускает каждую программу на каждом входе; результаты выдаются по мере готовности.
+
+    Программы разбираются один раз в каждом рабочем процессе. workers=1 — без пула,
+    в текущем процессе, в исходном порядке. engine="vector" — все входы программы
+    выполняются в текущем процессе одним VectorMachine (нужен numpy).
+    """
+    # Ошибки разбора программ сообщаем сразу, а не из рабочих процессов
+    for code in programs:
+        PostMachine(code, step_limit=step_limit)
+    if engine == "vector":
+        yield from _run_vector(programs, inputs, step_limit)
+        return
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        _init_worker(programs, step_limit)
+        for chunk in _chunks(programs, inputs, chunk_size):
+            yield from _run_chunk(chunk, fast)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(list(programs), step_limit)) as pool:
+        # В работе не больше MAX_IN_FLIGHT частей на процесс: части создаются по мере
+        # готовности результатов, и в памяти не накапливается весь набор входов
+        chunks = _chunks(programs, inputs, chunk_size)
+        pending = set()
+        for chunk in islice(chunks, MAX_IN_FLIGHT * workers):
+            pending.add(pool.submit(_run_chunk, chunk, fast))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for chunk in islice(chunks, len(done)):
+                pending.add(pool.submit(_run_chunk, chunk, fast))
+            for fut in done:
+                yield from fut.result()
+
+
+def run_batch(program: str, inputs: Sequence[str], **kwargs) -> Iterator[BatchResult]:
+    return run_matrix([program], inputs, **kwargs)
+
+
+def _read_lines(path: str) -> List[str]:
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    with stream:
+        return [line.strip() for line in stream if line.strip()]
+
+
+def _db_inputs() -> List[str]:
+    from .db import init_db, iter_inputs
+    init_db()
+    return [data for _, data in iter_inputs()]
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m post_machine.batch",
+                                     description="Пакетный запуск программ машины Поста на множестве входов")
+    parser.add_argument("programs", nargs="+", help="файлы с программами")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("-i", "--inputs", help="файл со входами, по одной двоичной строке в строке ('-' — stdin)")
+    src.add_argument("--db-inputs", action="store_true", help="все входы из базы данных")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("-l", "--step-limit", type=int, default=10000)
+    parser.add_argument("--fast", action="store_true", help="блочное выполнение циклов поиска")
+    parser.add_argument("--engine", choices=["interp", "vector"], default="interp",
+                        help="vector — все входы одновременно на массивах numpy")
+    args = parser.parse_args(argv)
+
+    programs = []
+    for path in args.programs:
+        with open(path, encoding='utf-8') as f:
+            programs.append(f.read())
+    inputs = _db_inputs() if args.db_inputs else _read_lines(args.inputs)
+    for res in run_matrix(programs, inputs, step_limit=args.step_limit, workers=args.workers,
+                          chunk_size=args.chunk_size, fast=args.fast, engine=args.engine):
+        print(json.dumps(res._asdict(), ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Optional
+
+from . import db
+from .machine import PostMachine, tape_from_str, normalize_and_build_str
+
+# Типичные программы: (текст, вход, начальная головка)
+UNARY_INCREMENT = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+done:
+    MARK
+    HALT
+"""
+
+UNARY_ADDITION = """
+start:
+    IF0 gap
+    RIGHT
+    GOTO start
+gap:
+    MARK
+    RIGHT
+second:
+    IF0 last
+    RIGHT
+    GOTO second
+last:
+    LEFT
+    ERASE
+    HALT
+"""
+
+BINARY_INCREMENT = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    HALT
+"""
+
+LONG_SCAN = """
+right:
+    RIGHT
+    IF1 right
+left:
+    LEFT
+    IF1 left
+    HALT
+"""
+
+
+def _programs(n: int) -> Dict[str, tuple]:
+    return {
+        "unary_increment": (UNARY_INCREMENT, "1" * n, 0),
+        "unary_addition": (UNARY_ADDITION, "1" * (n // 2) + "0" + "1" * (n // 2), 0),
+        "binary_increment": (BINARY_INCREMENT, "1" * n, n - 1),
+        "long_scan": (LONG_SCAN, "1" * n, 0),
+    }
+
+
+BENCHMARKS: Dict[str, Callable[[dict], List[dict]]] = {}
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _result(name: str, value: float, unit: str, **params) -> dict:
+    return {"name": name, "value": value, "unit": unit, "params": params}
+
+
+@benchmark("interpreter")
+def bench_interpreter(opts: dict) -> List[dict]:
+    results = []
+    for prog_name, (code, data, head) in _programs(opts["program_size"]).items():
+        for mode in ("step", "run", "fast", "jit", "optimize"):
+            def once():
+                pm = PostMachine(code, tape=tape_from_str(data), head=head, step_limit=10**9)
+                if mode == "step":
+                    while not pm.halted:
+                        pm.step()
+                else:
+                    pm.run(fast=mode == "fast", jit=mode == "jit", optimize=mode == "optimize")
+                return pm
+            steps = once().steps
+            elapsed = _best(once, opts["repeat"])
+            results.append(_result(f"steps_per_sec.{prog_name}", steps / elapsed, "steps/s",
+                                   mode=mode, steps=steps))
+    return results
+
+
+@benchmark("tape_memory")
+def bench_tape_memory(opts: dict) -> List[dict]:
+    results = []
+    for cells in opts["tape_sizes"]:
+        for density, data in (("dense", "1" * cells), ("sparse", ("1" + "0" * 999) * max(1, cells // 1000))):
+            for backend in ("dict", "bit"):
+                tracemalloc.start()
+                tape = tape_from_str(data, dense=backend == "bit")
+                size = tracemalloc.get_traced_memory()[0]
+                tracemalloc.stop()
+                del tape
+                results.append(_result("tape_memory", size, "bytes", cells=cells, density=density, backend=backend))
+    return results
+
+
+@benchmark("tape_slicing")
+def bench_tape_slicing(opts: dict) -> List[dict]:
+    results = []
+    for cells in opts["tape_sizes"]:
+        data = "10" * (cells // 2)
+        for backend in ("dict", "bit"):
+            pm = PostMachine(UNARY_INCREMENT, tape=tape_from_str(data, dense=backend == "bit"))
+            left, right = pm.get_tape_span()
+            t = _best(lambda: pm.tape_as_str_range(left, right), opts["repeat"])
+            results.append(_result("tape_as_str_range", cells / t, "cells/s", cells=cells, backend=backend))
+            t = _best(lambda: normalize_and_build_str(pm), opts["repeat"])
+            results.append(_result("normalize_and_build_str", cells / t, "cells/s", cells=cells, backend=backend))
+    return results
+
+
+@benchmark("db")
+def bench_db(opts: dict) -> List[dict]:
+    n = opts["db_rows"]
+    items = [(f"input{i}", bin(i)[2:]) for i in range(n)]
+    saved_name = db.DB_NAME
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_NAME = os.path.join(tmp, "bench.db")
+        try:
+            db.init_db()
+            start = time.perf_counter()
+            for name, data in items[:min(n, 1000)]:
+                db.save_input(name, data)
+            single = min(n, 1000) / (time.perf_counter() - start)
+            start = time.perf_counter()
+            db.save_inputs_many(items)
+            bulk = n / (time.perf_counter() - start)
+            start = time.perf_counter()
+            for name, _ in items[:min(n, 1000)]:
+                db.load_input(name)
+            load = min(n, 1000) / (time.perf_counter() - start)
+            start = time.perf_counter()
+            count = sum(1 for _ in db.iter_inputs())
+            stream = count / (time.perf_counter() - start)
+        finally:
+            db.close_db()
+            db.DB_NAME = saved_name
+    return [
+        _result("db.save_input", single, "rows/s"),
+        _result("db.save_inputs_many", bulk, "rows/s", rows=n),
+        _result("db.load_input", load, "rows/s"),
+        _result("db.iter_inputs", stream, "rows/s", rows=n),
+    ]
+
+
+DEFAULTS = {
+    "program_size": 2000,
+    "tape_sizes": [10**3, 10**4, 10**5, 10**6],
+    "db_rows": 10000,
+    "repeat": 3,
+}
+
+
+def run_benchmarks(names: Optional[Iterable[str]] = None, **opts) -> dict:
+    options = dict(DEFAULTS, **opts)
+    results = []
+    for name in names or BENCHMARKS:
+        results.extend(BENCHMARKS[name](options))
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.time(),
+        "options": options,
+        "results": results,
+    }
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m post_machine.bench",
+                                     description="Замеры производительности машины Поста")
+    parser.add_argument("benchmarks", nargs="*", metavar="NAME",
+                        help="какие замеры выполнить: " + ", ".join(BENCHMARKS) + " (по умолчанию все)")
+    parser.add_argument("-o", "--output", help="файл для результатов в JSON (по умолчанию stdout)")
+    parser.add_argument("--program-size", type=int, default=DEFAULTS["program_size"])
+    parser.add_argument("--max-cells", type=int, default=10**6, help="наибольший размер ленты (до 10^7)")
+    parser.add_argument("--db-rows", type=int, default=DEFAULTS["db_rows"])
+    parser.add_argument("--repeat", type=int, default=DEFAULTS["repeat"])
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"неизвестные замеры: {', '.join(unknown)}")
+
+    sizes = []
+    cells = 10**3
+    while cells <= args.max_cells:
+        sizes.append(cells)
+        cells *= 10
+    report = run_benchmarks(args.benchmarks or None, program_size=args.program_size, tape_sizes=sizes,
+                            db_rows=args.db_rows, repeat=args.repeat)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
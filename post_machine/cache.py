@@ -0,0 +1,132 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from . import db
+from .machine import PostMachine, tape_from_str
+
+DEFAULT_MAXSIZE = 1024
+DEFAULT_MAX_ROWS = 100000
+# Как часто (в записях) проверять размер таблицы results
+EVICT_EVERY = 64
+
+
+def result_key(prog_hash: str, data: str, head: int, step_limit: int) -> str:
+    raw = f"{prog_hash}\0{data}\0{head}\0{step_limit}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Кэш результатов выполнения: LRU в памяти поверх таблицы results в базе.
+
+    Машина детерминирована, поэтому результат однозначно определяется нормализованным
+    текстом программы, входом, начальной позицией головки и step_limit. Сохраняются только
+    завершившиеся без исключения запуски (остановка по HALT или по лимиту шагов).
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, max_rows: Optional[int] = DEFAULT_MAX_ROWS,
+                 persistent: bool = True):
+        self.maxsize = maxsize
+        self.max_rows = max_rows
+        self.persistent = persistent
+        self.hits = 0
+        self.misses = 0
+        self._lru: 'OrderedDict[str, Tuple[str, Tuple]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        # Слабая ссылка: незакрытый кэш не остаётся в списке навсегда
+        self._hook = weakref.WeakMethod(self.invalidate_program)
+        db.program_replaced_hooks.append(self._hook)
+
+    def close(self):
+        """Отключает кэш от уведомлений о перезаписи программ."""
+        if self._hook in db.program_replaced_hooks:
+            db.program_replaced_hooks.remove(self._hook)
+
+    def get(self, key: str, prog_hash: Optional[str] = None) -> Optional[Tuple]:
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+                return entry[1]
+        if self.persistent:
+            row = db.load_result(key)
+            if row is not None:
+                self._remember(key, prog_hash, tuple(row))
+                return tuple(row)
+        return None
+
+    def put(self, key: str, prog_hash: str, data: str, head: int, step_limit: int, result: Tuple):
+        self._remember(key, prog_hash, result)
+        if self.persistent:
+            db.save_result(key, prog_hash, data, head, step_limit, result)
+            self._writes += 1
+            if self.max_rows is not None and self._writes % EVICT_EVERY == 0:
+                db.evict_results(self.max_rows)
+
+    def _remember(self, key: str, prog_hash: Optional[str], result: Tuple):
+        with self._lock:
+            self._lru[key] = (prog_hash, result)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+
+    def invalidate_program(self, prog_hash: str):
+        # Строки в базе удаляет db.save_program; здесь чистим только память
+        with self._lock:
+            for key in [k for k, (h, _) in self._lru.items() if h == prog_hash]:
+                del self._lru[key]
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+        if self.persistent:
+            db.clear_results()
+
+    def lookup(self, code: str, data: str, head: Optional[int] = None,
+               step_limit: int = 10000) -> Optional[PostMachine]:
+        # Машина в конечном состоянии из кэша или None
+        if head is None:
+            head = len(data) - 1
+        prog_hash = db.program_hash(code)
+        cached = self.get(result_key(prog_hash, data, head, step_limit), prog_hash)
+        if cached is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        tape_left, tape_str, final_head, pc, steps, halted = cached
+        pm = PostMachine(code, tape=tape_from_str(tape_str, tape_left), head=final_head, step_limit=step_limit)
+        pm.pc, pm.steps, pm.halted = pc, steps, bool(halted)
+        return pm
+
+    def store(self, pm: PostMachine, code: str, data: str, head: Optional[int] = None):
+        # head — начальная позиция головки, с которой был запущен pm
+        if head is None:
+            head = len(data) - 1
+        prog_hash = db.program_hash(code)
+        left, right = pm.get_tape_span()
+        tape_str = pm.tape_as_str_range(left, right) if pm.tape else ""
+        self.put(result_key(prog_hash, data, head, pm.step_limit), prog_hash, data, head, pm.step_limit,
+                 (left, tape_str, pm.head, pm.pc, pm.steps, int(pm.halted)))
+
+    def run(self, code: str, data: str, head: Optional[int] = None, step_limit: int = 10000,
+            **run_kwargs) -> PostMachine:
+        """Возвращает машину в конечном состоянии; при попадании в кэш программа не выполняется."""
+        if head is None:
+            head = len(data) - 1
+        pm = self.lookup(code, data, head, step_limit)
+        if pm is not None:
+            return pm
+        pm = PostMachine(code, tape=tape_from_str(data), head=head, step_limit=step_limit)
+        pm.run(**run_kwargs)
+        self.store(pm, code, data, head)
+        return pm
+
+
+default_cache = ResultCache()
+
+
+def run_cached(code: str, data: str, head: Optional[int] = None, step_limit: int = 10000, **run_kwargs) -> PostMachine:
+    return default_cache.run(code, data, head, step_limit, **run_kwargs)
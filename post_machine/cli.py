@@ -0,0 +1,229 @@
+import argparse
+import json
+import sys
+from typing import Iterable, Optional
+
+from . import db
+from .machine import PostMachine, tape_from_str
+from .report import RunResult, format_report
+from .profiler import Profile
+from .tape import save_tape_file
+from .trace import BinaryTraceWriter, RingTrace, format_trace
+
+# Модуль не импортирует tkinter: графический интерфейс подгружается только командой "gui"
+
+
+def _read_source(path: str) -> str:
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+def _positive_int(text: str) -> int:
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число: {text}")
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"ожидается положительное число: {text}")
+    return value
+
+
+def _load_program(args) -> str:
+    if args.program_name:
+        db.init_db()
+        return db.load_program(args.program_name)
+    return _read_source(args.program)
+
+
+def _load_input(args) -> str:
+    if args.input_name:
+        db.init_db()
+        return db.load_input(args.input_name)
+    if args.input_file:
+        return _read_source(args.input_file).strip()
+    return args.input
+
+
+def cmd_run(args) -> int:
+    try:
+        code = _load_program(args)
+        data = _load_input(args)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    if any(ch not in "01" for ch in data) or data == "":
+        print("Ошибка: входные данные должны быть двоичной строкой (например, 1011).", file=sys.stderr)
+        return 2
+
+    trace_file = None
+    profile = Profile() if args.profile else None
+    history = RingTrace(args.history) if args.history is not None else None
+    try:
+        pm = PostMachine(code, tape=tape_from_str(data, dense=args.dense), head=len(data) - 1,
+                         step_limit=args.step_limit)
+        if args.trace or history is not None:
+            writer = None
+            if args.trace:
+                trace_file = open(args.trace, 'wb')
+                writer = BinaryTraceWriter(trace_file)
+
+            def emit(rec):
+                if writer:
+                    writer(rec)
+                if history is not None:
+                    history(rec)
+            try:
+                pm.run(trace=emit)
+            finally:
+                if writer:
+                    writer.close()
+        elif profile is not None:
+            pm.run(profile=profile)
+        else:
+            pm.run(fast=args.fast, detect_loops=args.detect_loops, jit=args.jit, optimize=args.optimize,
+                   memo=args.memo)
+    except (ValueError, RuntimeError, OSError) as e:
+        print(f"Ошибка выполнения: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if trace_file:
+            trace_file.close()
+
+    if args.tape_out:
+        try:
+            save_tape_file(pm.tape, args.tape_out)
+        except OSError as e:
+            print(f"Ошибка: {e}", file=sys.stderr)
+            return 1
+
+    result = RunResult(pm, data)
+    if args.json:
+        report = result.to_dict()
+        if profile is not None:
+            report["profile"] = profile.to_dict()
+        if history is not None:
+            report["history"] = [rec._asdict() for rec in history.records()]
+        print(json.dumps(report, ensure_ascii=False))
+    else:
+        print(format_report(result), end='')
+        if profile is not None:
+            print("\nПрофиль выполнения:")
+            print(profile.report())
+        if history is not None:
+            print("\nИстория выполненных команд (последние шаги):")
+            print(format_trace(history.records(), pm))
+    return 0 if pm.halted else 1
+
+
+def cmd_check(args) -> int:
+    from .analysis import analyze, optimize
+    try:
+        pm = PostMachine(_load_program(args))
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 2
+    diagnostics = analyze(pm)
+    opt = optimize(pm.code, pm.start_pc)
+    if args.json:
+        print(json.dumps({"diagnostics": [d._asdict() for d in diagnostics],
+                          "instructions": opt.instructions, "blocks": len(opt.blocks),
+                          "removed": opt.removed, "threaded": opt.threaded}, ensure_ascii=False))
+    else:
+        for d in diagnostics:
+            print(f"Предупреждение: {d.message}")
+        print(f"Инструкций: {opt.instructions}; участков после оптимизации: {len(opt.blocks)}; "
+              f"удалено недостижимых: {opt.removed}; сокращено переходов GOTO: {opt.threaded}")
+    return 1 if diagnostics else 0
+
+
+def cmd_list(args) -> int:
+    db.init_db()
+    fetch = db.list_programs_page if args.kind == "programs" else db.list_inputs_page
+    rows = fetch(args.query, args.after, args.limit)
+    if args.json:
+        print(json.dumps([row._asdict() for row in rows], ensure_ascii=False))
+    else:
+        for row in rows:
+            print(f"{row.name}\t{row.size}\t{row.hash[:12]}")
+    return 0
+
+
+def cmd_gui(args) -> int:
+    from .gui import main as gui_main
+    gui_main()
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m post_machine", description="Машина Поста")
+    parser.add_argument("--db", help="путь к файлу базы данных SQLite")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run = sub.add_parser("run", help="выполнить программу без графического интерфейса")
+    prog = run.add_mutually_exclusive_group(required=True)
+    prog.add_argument("-p", "--program", help="файл с программой ('-' — stdin)")
+    prog.add_argument("-P", "--program-name", help="имя программы в базе данных")
+    inp = run.add_mutually_exclusive_group(required=True)
+    inp.add_argument("-i", "--input", help="входная двоичная строка")
+    inp.add_argument("-f", "--input-file", help="файл со входной строкой ('-' — stdin)")
+    inp.add_argument("-I", "--input-name", help="имя входа в базе данных")
+    run.add_argument("-l", "--step-limit", type=int, default=10000)
+    run.add_argument("--fast", action="store_true", help="блочное выполнение циклов поиска")
+    run.add_argument("--jit", action="store_true", help="трансляция программы в функцию Python")
+    run.add_argument("--optimize", action="store_true", help="выполнение укрупнёнными участками после статической оптимизации")
+    run.add_argument("--memo", action="store_true", help="переходы по блокам ленты из кэша (для долгих повторяющихся вычислений)")
+    run.add_argument("--detect-loops", action="store_true", help="останавливать заведомо бесконечные программы")
+    run.add_argument("--dense", action="store_true", help="битовая лента вместо словаря")
+    run.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    run.add_argument("--profile", action="store_true", help="счётчики выполнения по строкам и меткам")
+    run.add_argument("--trace", metavar="FILE", help="записать двоичную трассу выполнения в файл")
+    run.add_argument("--tape-out", metavar="FILE", help="сохранить итоговую ленту в упакованный двоичный файл")
+    run.add_argument("--history", metavar="K", type=_positive_int, default=None, help="показать последние K выполненных команд")
+    run.set_defaults(func=cmd_run)
+
+    check = sub.add_parser("check", help="статическая проверка программы")
+    src = check.add_mutually_exclusive_group(required=True)
+    src.add_argument("-p", "--program", help="файл с программой ('-' — stdin)")
+    src.add_argument("-P", "--program-name", help="имя программы в базе данных")
+    check.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    check.set_defaults(func=cmd_check)
+
+    listing = sub.add_parser("list", help="каталог программ или входов в базе данных (постранично)")
+    listing.add_argument("kind", choices=["programs", "inputs"])
+    listing.add_argument("-q", "--query", default="", help="поиск по имени (у программ — и по тексту)")
+    listing.add_argument("--after", help="начать после этого имени (следующая страница)")
+    listing.add_argument("-n", "--limit", type=int, default=db.PAGE_SIZE)
+    listing.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    listing.set_defaults(func=cmd_list)
+
+    gui = sub.add_parser("gui", help="запустить графический интерфейс")
+    gui.set_defaults(func=cmd_gui)
+    return parser
+
+
+# Флаги run, выбирающие способ выполнения; одновременно допустим только один
+_ENGINE_FLAGS = (("--fast", "fast"), ("--jit", "jit"), ("--optimize", "optimize"), ("--memo", "memo"),
+                 ("--detect-loops", "detect_loops"))
+
+
+def _check_run_args(parser: argparse.ArgumentParser, args):
+    engines = [flag for flag, attr in _ENGINE_FLAGS if getattr(args, attr)]
+    if args.trace or args.history is not None:
+        # Трасса и история пишутся пошаговым выполнением и с другими режимами не сочетаются
+        engines.append("--trace/--history")
+    if args.profile:
+        engines.append("--profile")
+    if len(engines) > 1:
+        parser.error(f"run: нельзя использовать вместе {', '.join(engines)}")
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        _check_run_args(parser, args)
+    if args.db:
+        db.DB_NAME = args.db
+    return args.func(args)
@@ -1,64 +1,428 @@
+import hashlib
+import os
+import re
 import sqlite3
-from typing import List, Tuple
+import struct
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .tape import BitTape, blob_to_tape, decode_bits, encode_bits
 
 DB_NAME = "post_machine.db"
 
+# Лимит параметров в одном запросе SQLite (старые сборки — 999)
+_MAX_VARS = 500
+# Строк на странице каталога по умолчанию
+PAGE_SIZE = 100
+# Текущее время (Unix, с долями секунды) в запросах SQL
+_NOW = "((julianday('now') - 2440587.5) * 86400.0)"
+# Метаданные каталога в таблицах programs и inputs (добавляются и в старые базы)
+_CATALOG_COLUMNS = (("size", "INTEGER"), ("hash", "TEXT"), ("created", "REAL"), ("updated", "REAL"))
+
+
+class CatalogEntry(NamedTuple):
+    id: int
+    name: str
+    size: int        # символов текста программы или ячеек входа
+    created: float
+    updated: float
+    hash: str        # program_hash для программ, sha256 содержимого для входов
+
+
+class ConnectionManager:
+    """Одно переиспользуемое соединение на файл базы, общее для всех потоков.
+
+    Доступ сериализуется блокировкой; после fork (пул процессов) соединение открывается заново.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._path: Optional[str] = None
+        self._pid: Optional[int] = None
+
+    def _open(self, path: str) -> sqlite3.Connection:
+        conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Метаданные каталога вычисляются в самих запросах INSERT
+        conn.create_function("program_hash", 1, program_hash, deterministic=True)
+        conn.create_function("input_size", 1, _input_size, deterministic=True)
+        conn.create_function("input_hash", 1, _input_hash, deterministic=True)
+        return conn
+
+    def _get(self) -> sqlite3.Connection:
+        # DB_NAME читается при каждом обращении, чтобы его можно было подменить (тесты, --db)
+        path = DB_NAME
+        if self._conn is None or self._path != path or self._pid != os.getpid():
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = self._open(path)
+            self._path = path
+            self._pid = os.getpid()
+        return self._conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self._get()
+            conn.execute("BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        # Для чтения: без явной транзакции
+        with self._lock:
+            yield self._get()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._path = None
+
+
+manager = ConnectionManager()
+# Есть ли в сборке SQLite модуль FTS5 (определяется в init_db)
+_fts_enabled = False
+
+# Вызываются с хэшем старого текста, когда save_program перезаписывает программу.
+# Методы объектов хранятся как weakref.WeakMethod и не удерживают объект; умершие удаляются
+program_replaced_hooks: List[Callable[[str], None]] = []
+
+
+def close_db():
+    manager.close()
+
+
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS programs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE,
-        code TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS inputs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT UNIQUE,
-        data TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    # Файл базы мог быть удалён или заменён — начинаем с нового соединения
+    close_db()
+    with manager.transaction() as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS programs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            code TEXT
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS inputs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            data TEXT
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS results (
+            key TEXT PRIMARY KEY,
+            program_hash TEXT,
+            input BLOB,
+            head INTEGER,
+            step_limit INTEGER,
+            tape_left INTEGER,
+            tape BLOB,
+            final_head INTEGER,
+            pc INTEGER,
+            steps INTEGER,
+            halted INTEGER,
+            last_used REAL
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS snapshots (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE,
+            program_hash TEXT,
+            steps INTEGER,
+            data BLOB,
+            created REAL
+        )
+        """)
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_records (
+            size INTEGER,
+            metric TEXT,
+            value INTEGER,
+            steps INTEGER,
+            marks INTEGER,
+            step_limit INTEGER,
+            code TEXT,
+            program_hash TEXT,
+            found REAL,
+            PRIMARY KEY (size, metric)
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS results_program ON results (program_hash)")
+        conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        _init_catalog(conn)
+
+def _init_catalog(conn: sqlite3.Connection):
+    # Старые базы получают столбцы метаданных; пустые значения заполняются по содержимому
+    global _fts_enabled
+    for table in ("programs", "inputs"):
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column, kind in _CATALOG_COLUMNS:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {kind}")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_updated ON {table} (updated)")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_hash ON {table} (hash)")
+    conn.execute(f"UPDATE programs SET size = length(code), hash = program_hash(code), "
+                 f"created = coalesce(created, {_NOW}), updated = coalesce(updated, {_NOW}) WHERE hash IS NULL")
+    conn.execute(f"UPDATE inputs SET size = input_size(data), hash = input_hash(data), "
+                 f"created = coalesce(created, {_NOW}), updated = coalesce(updated, {_NOW}) WHERE hash IS NULL")
+    # Полнотекстовый поиск: по имени и тексту программ, по именам входов.
+    # Индексы FTS5 синхронизируются триггерами; без FTS5 поиск идёт через LIKE по имени
+    try:
+        for table, columns in (("programs", ("name", "code")), ("inputs", ("name",))):
+            fts = f"{table}_fts"
+            exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (fts,)).fetchone()
+            cols = ", ".join(columns)
+            new = ", ".join(f"new.{c}" for c in columns)
+            old = ", ".join(f"old.{c}" for c in columns)
+            conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({cols}, content='{table}', "
+                         f"content_rowid='id', prefix='2 3')")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN "
+                         f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new}); END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN "
+                         f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); END")
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {cols} ON {table} BEGIN "
+                         f"INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old}); "
+                         f"INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new}); END")
+            if not exists:
+                conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        _fts_enabled = True
+    except sqlite3.OperationalError:
+        # Сборка SQLite без FTS5
+        _fts_enabled = False
+
+def program_hash(code: str) -> str:
+    # Хэш нормализованного текста: без пустых строк, комментариев и лишних пробелов
+    lines = [' '.join(line.split()) for line in code.splitlines()
+             if line.strip() and not line.strip().startswith('#')]
+    return hashlib.sha256('\n'.join(lines).encode('utf-8')).hexdigest()
 
 def save_program(name: str, code: str):
-    conn = sqlite3.connect(DB_NAME)
-    conn.execute("INSERT OR REPLACE INTO programs (name, code) VALUES (?, ?)", (name, code))
-    conn.commit()
-    conn.close()
+    # Перезапись сохраняет id и время создания, обновляет остальные метаданные
+    with manager.transaction() as conn:
+        row = conn.execute("SELECT code FROM programs WHERE name = ?", (name,)).fetchone()
+        conn.execute(f"INSERT INTO programs (name, code, size, hash, created, updated) "
+                     f"VALUES (?1, ?2, length(?2), program_hash(?2), {_NOW}, {_NOW}) "
+                     f"ON CONFLICT (name) DO UPDATE SET code = excluded.code, size = excluded.size, "
+                     f"hash = excluded.hash, updated = excluded.updated", (name, code))
+        old_hash = program_hash(row[0]) if row else None
+        if old_hash is not None and old_hash != program_hash(code):
+            conn.execute("DELETE FROM results WHERE program_hash = ?", (old_hash,))
+    if old_hash is not None and old_hash != program_hash(code):
+        for hook in list(program_replaced_hooks):
+            fn = hook() if isinstance(hook, weakref.WeakMethod) else hook
+            if fn is None:
+                program_replaced_hooks.remove(hook)
+            else:
+                fn(old_hash)
+
+def _encode_input(data: str):
+    # Двоичные строки хранятся упакованными (BLOB, бит на ячейку), прочие — как текст
+    if data and not data.strip('01'):
+        return encode_bits(data)
+    return data
+
+def _decode_input(value) -> str:
+    # Старые базы содержат строки TEXT — они читаются как есть
+    return decode_bits(value) if isinstance(value, bytes) else value
+
+def _input_size(value) -> Optional[int]:
+    if isinstance(value, bytes):
+        return struct.unpack_from('<q', value)[0]
+    return None if value is None else len(value)
+
+def _input_hash(value) -> Optional[str]:
+    # Хэш упакованного вида, поэтому старая строка TEXT и тот же вход в BLOB совпадают
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = _encode_input(value)
+        value = value if isinstance(value, bytes) else value.encode('utf-8')
+    return hashlib.sha256(value).hexdigest()
 
 def save_input(name: str, data: str):
-    conn = sqlite3.connect(DB_NAME)
-    conn.execute("INSERT OR REPLACE INTO inputs (name, data) VALUES (?, ?)", (name, data))
-    conn.commit()
-    conn.close()
+    save_inputs_many([(name, data)])
+
+def save_inputs_many(items: Iterable[Tuple[str, str]]):
+    # Все строки пишутся одной транзакцией
+    with manager.transaction() as conn:
+        conn.executemany(f"INSERT INTO inputs (name, data, size, hash, created, updated) "
+                         f"VALUES (?1, ?2, input_size(?2), input_hash(?2), {_NOW}, {_NOW}) "
+                         f"ON CONFLICT (name) DO UPDATE SET data = excluded.data, size = excluded.size, "
+                         f"hash = excluded.hash, updated = excluded.updated",
+                         ((name, *map(_encode_input, rest)) for name, *rest in items))
 
 def list_programs() -> List[Tuple[int, str]]:
-    conn = sqlite3.connect(DB_NAME)
-    rows = conn.execute("SELECT id, name FROM programs").fetchall()
-    conn.close()
-    return rows
+    with manager.connection() as conn:
+        return conn.execute("SELECT id, name FROM programs").fetchall()
 
 def list_inputs() -> List[Tuple[int, str]]:
-    conn = sqlite3.connect(DB_NAME)
-    rows = conn.execute("SELECT id, name FROM inputs").fetchall()
-    conn.close()
-    return rows
+    with manager.connection() as conn:
+        return conn.execute("SELECT id, name FROM inputs").fetchall()
+
+# --- Каталог ---
+def _fts_query(text: str) -> str:
+    # Каждое слово запроса — префикс ("inc bin" находит "increment_binary")
+    return " ".join('"{}"*'.format(word.replace('"', '""')) for word in re.findall(r"\w+", text))
+
+def _catalog_page(table: str, query: str, after: Optional[str], limit: int) -> List[CatalogEntry]:
+    # Постраничный вывод по ключу: следующая страница начинается после имени after (индекс UNIQUE по name)
+    sql = f"SELECT t.id, t.name, t.size, t.created, t.updated, t.hash FROM {table} t"
+    where: List[str] = []
+    params: List = []
+    match = _fts_query(query)
+    if match and _fts_enabled:
+        sql += f" JOIN {table}_fts f ON f.rowid = t.id"
+        where.append(f"{table}_fts MATCH ?")
+        params.append(match)
+    elif query.strip():
+        where.append("t.name LIKE ? ESCAPE '\\'")
+        params.append("%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%")
+    if after is not None:
+        where.append("t.name > ?")
+        params.append(after)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY t.name LIMIT ?"
+    params.append(limit)
+    with manager.connection() as conn:
+        return [CatalogEntry(*row) for row in conn.execute(sql, params)]
+
+def list_programs_page(query: str = "", after: Optional[str] = None, limit: int = PAGE_SIZE) -> List[CatalogEntry]:
+    """Страница каталога программ по имени; query ищет по имени и тексту программы."""
+    return _catalog_page("programs", query, after, limit)
+
+def list_inputs_page(query: str = "", after: Optional[str] = None, limit: int = PAGE_SIZE) -> List[CatalogEntry]:
+    """Страница каталога входов по имени; query ищет по имени."""
+    return _catalog_page("inputs", query, after, limit)
 
 def load_program(name: str) -> str:
-    conn = sqlite3.connect(DB_NAME)
-    row = conn.execute("SELECT code FROM programs WHERE name = ?", (name,)).fetchone()
-    conn.close()
+    with manager.connection() as conn:
+        row = conn.execute("SELECT code FROM programs WHERE name = ?", (name,)).fetchone()
     if not row:
         raise ValueError("Программа не найдена")
     return row[0]
 
 def load_input(name: str) -> str:
-    conn = sqlite3.connect(DB_NAME)
-    row = conn.execute("SELECT data FROM inputs WHERE name = ?", (name,)).fetchone()
-    conn.close()
+    with manager.connection() as conn:
+        row = conn.execute("SELECT data FROM inputs WHERE name = ?", (name,)).fetchone()
+    if not row:
+        raise ValueError("Входные данные не найдены")
+    return _decode_input(row[0])
+
+def load_input_tape(name: str, left_index: int = 0, dense: bool = True):
+    """Лента входных данных без промежуточной строки: BitTape строится прямо из BLOB."""
+    with manager.connection() as conn:
+        row = conn.execute("SELECT data FROM inputs WHERE name = ?", (name,)).fetchone()
     if not row:
         raise ValueError("Входные данные не найдены")
+    if isinstance(row[0], bytes):
+        return blob_to_tape(row[0], left_index, dense)
+    tape = BitTape.from_str(row[0], left_index)
+    return tape if dense else dict(tape.items())
+
+def load_inputs_many(names: Iterable[str]) -> Dict[str, str]:
+    # Отсутствующие имена в результат не попадают
+    names = list(names)
+    result = {}
+    with manager.connection() as conn:
+        for i in range(0, len(names), _MAX_VARS):
+            part = names[i:i + _MAX_VARS]
+            marks = ",".join("?" * len(part))
+            rows = conn.execute(f"SELECT name, data FROM inputs WHERE name IN ({marks})", part)
+            result.update((name, _decode_input(data)) for name, data in rows)
+    return result
+
+def iter_inputs(batch_size: int = 1000) -> Iterator[Tuple[str, str]]:
+    # Потоковое чтение таблицы inputs страницами по id; между страницами блокировка не удерживается
+    last_id = 0
+    while True:
+        with manager.connection() as conn:
+            rows = conn.execute("SELECT id, name, data FROM inputs WHERE id > ? ORDER BY id LIMIT ?",
+                                (last_id, batch_size)).fetchall()
+        if not rows:
+            return
+        for _, name, data in rows:
+            yield name, _decode_input(data)
+        last_id = rows[-1][0]
+
+# --- Кэш результатов ---
+def save_result(key: str, prog_hash: str, data: str, head: int, step_limit: int, result: Tuple):
+    # result = (tape_left, tape, final_head, pc, steps, halted); вход и лента хранятся упакованными, как в inputs
+    tape_left, tape, *rest = result
+    with manager.transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                     (key, prog_hash, _encode_input(data), head, step_limit, tape_left, _encode_input(tape),
+                      *rest, time.time()))
+
+def evict_results(max_rows: int):
+    # Оставляет max_rows последних использованных результатов
+    with manager.transaction() as conn:
+        conn.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY last_used DESC "
+                     "LIMIT -1 OFFSET ?)", (max_rows,))
+
+def load_result(key: str) -> Optional[Tuple]:
+    with manager.transaction() as conn:
+        row = conn.execute("SELECT tape_left, tape, final_head, pc, steps, halted FROM results WHERE key = ?",
+                           (key,)).fetchone()
+        if row:
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (time.time(), key))
+    if row is None:
+        return None
+    return (row[0], _decode_input(row[1])) + tuple(row[2:])
+
+def clear_results():
+    with manager.transaction() as conn:
+        conn.execute("DELETE FROM results")
+
+# --- Снимки состояния машины ---
+def save_snapshot(name: str, prog_hash: str, steps: int, data: bytes):
+    with manager.transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO snapshots (name, program_hash, steps, data, created) "
+                     "VALUES (?, ?, ?, ?, ?)", (name, prog_hash, steps, data, time.time()))
+
+def load_snapshot(name: str) -> bytes:
+    with manager.connection() as conn:
+        row = conn.execute("SELECT data FROM snapshots WHERE name = ?", (name,)).fetchone()
+    if not row:
+        raise ValueError("Снимок не найден")
     return row[0]
+
+def list_snapshots() -> List[Tuple[int, str, int]]:
+    with manager.connection() as conn:
+        return conn.execute("SELECT id, name, steps FROM snapshots").fetchall()
+
+# --- Рекорды перебора программ (search.py) ---
+def save_search_records(records: Iterable, step_limit: int):
+    # records — search.Champion; запись заменяется только большим значением
+    with manager.transaction() as conn:
+        conn.executemany(
+            "INSERT INTO search_records (size, metric, value, steps, marks, step_limit, code, program_hash, found) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (size, metric) DO UPDATE SET value = excluded.value, steps = excluded.steps, "
+            "marks = excluded.marks, step_limit = excluded.step_limit, code = excluded.code, "
+            "program_hash = excluded.program_hash, found = excluded.found "
+            "WHERE excluded.value > search_records.value",
+            [(r.size, r.metric, r.value, r.steps, r.marks, step_limit, r.program, program_hash(r.program),
+              time.time()) for r in records])
+
+
+def list_search_records() -> List[Tuple[int, str, int, int, int, int, str]]:
+    # (size, metric, value, steps, marks, step_limit, code) по возрастанию размера
+    with manager.connection() as conn:
+        return conn.execute("SELECT size, metric, value, steps, marks, step_limit, code FROM search_records "
+                            "ORDER BY size, metric").fetchall()
@@ -0,0 +1,406 @@
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .machine import PostMachine, NonTerminationError, tape_from_str
+
+# Сколько случаев отдаётся рабочему процессу за раз
+DEFAULT_CHUNK_SIZE = 200
+# Отметка в Outcome.error для движка, сообщившего о заведомо бесконечной программе
+NONTERMINATION = "nontermination"
+
+
+class Case(NamedTuple):
+    program: str
+    input: str
+    head: int
+    step_limit: int
+
+
+class Outcome(NamedTuple):
+    steps: int
+    pc: int
+    head: int
+    halted: bool
+    tape: Tuple[int, ...]   # отмеченные ячейки по возрастанию
+    error: Optional[str] = None
+
+
+class Failure(NamedTuple):
+    engine: str
+    case: Case
+    expected: Outcome
+    got: Outcome
+
+
+class DiffReport(NamedTuple):
+    cases: int
+    failures: List[Failure]
+    throughput: Dict[str, dict]   # движок -> {"seconds", "steps", "steps_per_sec", "cases_per_sec"}
+
+
+# --- Генератор случаев ---
+_COMMANDS = ["MARK", "ERASE", "LEFT", "RIGHT", "IF1", "IF0", "GOTO", "HALT"]
+# Движения и ветвления чаще остальных: так получаются циклы поиска, на которых работают ускорения
+_WEIGHTS = [2, 2, 3, 3, 3, 3, 2, 1]
+
+
+def random_program(rng: random.Random, max_size: int = 12, max_labels: int = 4) -> str:
+    """Случайная синтаксически правильная программа: метки объявлены, переходы ведут на них."""
+    labels = [f"L{i}" for i in range(rng.randint(1, max_labels))]
+    body = []
+    for _ in range(rng.randint(1, max_size)):
+        cmd = rng.choices(_COMMANDS, _WEIGHTS)[0]
+        body.append(f"    {cmd} {rng.choice(labels)}" if cmd in ("IF1", "IF0", "GOTO") else f"    {cmd}")
+    # Первая метка — точка входа; остальные ставятся в случайные места, в том числе в конец
+    lines = [labels[0] + ":"] + body
+    for lbl in labels[1:]:
+        lines.insert(rng.randint(1, len(lines)), lbl + ":")
+    return "\n".join(lines) + "\n"
+
+
+def random_case(rng: random.Random, max_size: int = 12, max_input: int = 10, max_steps: int = 500) -> Case:
+    data = "".join(rng.choice("01") for _ in range(rng.randint(1, max_input)))
+    return Case(random_program(rng, max_size), data, rng.randint(-2, len(data) + 1), rng.randint(0, max_steps))
+
+
+def case_for(seed: int, index: int, **params) -> Case:
+    # Случай однозначно определяется (seed, index), поэтому процессам не нужно передавать сами программы
+    return random_case(random.Random(seed * 1000003 + index), **params)
+
+
+# --- Движки ---
+def _outcome(pm: PostMachine, error: Optional[str] = None) -> Outcome:
+    tape = tuple(sorted(pos for pos, val in pm.tape.items() if val))
+    return Outcome(pm.steps, pm.pc, pm.head, pm.halted, tape, error)
+
+
+def reference(case: Case) -> Outcome:
+    """Эталон: пошаговое выполнение через PostMachine.step()."""
+    pm = PostMachine(case.program, tape=tape_from_str(case.input), head=case.head, step_limit=case.step_limit)
+    try:
+        while not pm.halted and pm.steps < pm.step_limit:
+            pm.step()
+    except RuntimeError as e:
+        return _outcome(pm, str(e))
+    return _outcome(pm)
+
+
+ENGINES: Dict[str, Callable[[Case], Tuple[Outcome, float]]] = {}
+
+
+def engine(name: str):
+    def register(fn):
+        ENGINES[name] = fn
+        return fn
+    return register
+
+
+def _timed_run(case: Case, dense: bool = False, **run_kwargs) -> Tuple[Outcome, float]:
+    # Время замеряется только для выполнения, без разбора программы
+    pm = PostMachine(case.program, tape=tape_from_str(case.input, dense=dense), head=case.head,
+                     step_limit=case.step_limit)
+    start = time.perf_counter()
+    try:
+        pm.run(**run_kwargs)
+    except NonTerminationError:
+        return _outcome(pm, NONTERMINATION), time.perf_counter() - start
+    except RuntimeError as e:
+        return _outcome(pm, str(e)), time.perf_counter() - start
+    return _outcome(pm), time.perf_counter() - start
+
+
+@engine("step")
+def _step(case):
+    start = time.perf_counter()
+    out = reference(case)
+    return out, time.perf_counter() - start
+
+
+@engine("run")
+def _run(case):
+    return _timed_run(case)
+
+
+@engine("dense")
+def _dense(case):
+    return _timed_run(case, dense=True)
+
+
+@engine("fast")
+def _fast(case):
+    return _timed_run(case, fast=True)
+
+
+@engine("fast_dense")
+def _fast_dense(case):
+    return _timed_run(case, dense=True, fast=True)
+
+
+@engine("jit")
+def _jit(case):
+    return _timed_run(case, jit=True)
+
+
+@engine("optimize")
+def _optimize(case):
+    return _timed_run(case, optimize=True)
+
+
+@engine("memo")
+def _memo(case):
+    return _timed_run(case, memo=True)
+
+
+@engine("memo_small")
+def _memo_small(case):
+    # Узкие блоки: головка чаще пересекает границы, и ветви переходов проверяются чаще
+    from .memo import TransitionCache, run_memoized
+    pm = PostMachine(case.program, tape=tape_from_str(case.input), head=case.head, step_limit=case.step_limit)
+    start = time.perf_counter()
+    try:
+        run_memoized(pm, block_size=3, cache=TransitionCache(64))
+    except RuntimeError as e:
+        return _outcome(pm, str(e)), time.perf_counter() - start
+    return _outcome(pm), time.perf_counter() - start
+
+
+@engine("profile")
+def _profile(case):
+    from .profiler import Profile
+    return _timed_run(case, profile=Profile())
+
+
+@engine("trace")
+def _trace(case):
+    return _timed_run(case, trace=lambda record: None)
+
+
+@engine("detect_loops")
+def _detect_loops(case):
+    return _timed_run(case, detect_loops=True)
+
+
+@engine("fork")
+def _fork(case):
+    # Половина шагов в исходной машине, остаток — в ответвлении с лентой CowTape
+    pm = PostMachine(case.program, tape=tape_from_str(case.input), head=case.head,
+                     step_limit=case.step_limit // 2)
+    start = time.perf_counter()
+    try:
+        pm.run()
+        child = pm.fork()
+        child.step_limit = case.step_limit
+        pm.tape[child.head] = 1
+        child.run()
+    except RuntimeError as e:
+        return _outcome(pm if pm.steps < pm.step_limit else child, str(e)), time.perf_counter() - start
+    return _outcome(child), time.perf_counter() - start
+
+
+@engine("vector")
+def _vector(case):
+    from .vector import VectorMachine, FAILED
+    vm = VectorMachine(case.program, [case.input], [case.head], case.step_limit)
+    start = time.perf_counter()
+    status = vm.run()
+    elapsed = time.perf_counter() - start
+    error = "PC выходит за границы программы" if status[0] == FAILED else None
+    return _outcome(vm.machine(0), error), elapsed
+
+
+# Запускаются только по явному запросу: на одиночных случаях накладные расходы numpy
+# на шаг в сотни раз больше, чем у интерпретатора
+OPT_IN_ENGINES = {"vector"}
+
+
+def available_engines() -> List[str]:
+    return [name for name in ENGINES if name not in OPT_IN_ENGINES]
+
+
+def matches(expected: Outcome, got: Outcome) -> bool:
+    if got.error == NONTERMINATION:
+        # Поиск циклов может остановить выполнение раньше лимита; ошибка — если эталон на деле завершился
+        return not expected.halted and expected.error is None
+    return expected == got
+
+
+# --- Прогон ---
+def _run_chunk(seed: int, first: int, count: int, engines: Sequence[str],
+               params: dict) -> Tuple[List[Failure], Dict[str, float], int]:
+    failures: List[Failure] = []
+    seconds = {name: 0.0 for name in engines}
+    steps = 0
+    for index in range(first, first + count):
+        case = case_for(seed, index, **params)
+        expected = reference(case)
+        steps += expected.steps
+        for name in engines:
+            try:
+                got, elapsed = ENGINES[name](case)
+            except Exception as e:
+                # Исключение, которого нет у эталона, — тоже расхождение
+                failures.append(Failure(name, case, expected, expected._replace(error=f"{type(e).__name__}: {e}")))
+                continue
+            seconds[name] += elapsed
+            if not matches(expected, got):
+                failures.append(Failure(name, case, expected, got))
+    return failures, seconds, steps
+
+
+def _fails(case: Case, name: str) -> bool:
+    try:
+        expected = reference(case)
+    except ValueError:
+        return False
+    try:
+        got, _ = ENGINES[name](case)
+    except ValueError:
+        return False
+    except Exception:
+        return True
+    return not matches(expected, got)
+
+
+def _candidates(case: Case) -> Iterable[Case]:
+    # Упрощения по убыванию выигрыша: лимит шагов, строки программы, вход, положение головки
+    limit = case.step_limit
+    for smaller in sorted({0, limit // 2, limit * 3 // 4, limit - 1}):
+        if 0 <= smaller < limit:
+            yield case._replace(step_limit=smaller)
+    lines = case.program.splitlines()
+    for i in range(len(lines)):
+        yield case._replace(program="\n".join(lines[:i] + lines[i + 1:]) + "\n")
+    data = case.input
+    if len(data) > 1:
+        yield case._replace(input=data[:len(data) // 2])
+        yield case._replace(input=data[1:], head=case.head - 1)
+        yield case._replace(input=data[:-1])
+    for i, ch in enumerate(data):
+        if ch == "1":
+            yield case._replace(input=data[:i] + "0" + data[i + 1:])
+    if case.head:
+        yield case._replace(head=0)
+        yield case._replace(head=case.head - 1 if case.head > 0 else case.head + 1)
+
+
+def shrink(case: Case, name: str, max_checks: int = 10000) -> Case:
+    """Жадно упрощает случай, на котором движок name расходится с эталоном."""
+    checks = 0
+    improved = True
+    while improved and checks < max_checks:
+        improved = False
+        for candidate in _candidates(case):
+            checks += 1
+            if _fails(candidate, name):
+                case = candidate
+                improved = True
+                break
+    return case
+
+
+def run_differential(cases: int = 1000, seed: int = 0, engines: Optional[Sequence[str]] = None,
+                     workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                     shrink_failures: bool = True, **params) -> DiffReport:
+    """Сравнивает движки с эталонным step() на cases случайных случаях.
+
+    params передаются генератору (max_size, max_input, max_steps). workers=1 — без пула процессов.
+    Для каждого движка расхождение сокращается shrink() до минимального случая (по одному на движок).
+    """
+    engines = list(engines) if engines else available_engines()
+    unknown = [name for name in engines if name not in ENGINES]
+    if unknown:
+        raise ValueError(f"Неизвестные движки: {', '.join(unknown)}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    chunks = [(first, min(chunk_size, cases - first)) for first in range(0, cases, chunk_size)]
+    failures: List[Failure] = []
+    seconds = {name: 0.0 for name in engines}
+    steps = 0
+    if workers <= 1:
+        results = (_run_chunk(seed, first, count, engines, params) for first, count in chunks)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        results = pool.map(_run_chunk, *zip(*[(seed, first, count, engines, params) for first, count in chunks]))
+    try:
+        for chunk_failures, chunk_seconds, chunk_steps in results:
+            failures.extend(chunk_failures)
+            steps += chunk_steps
+            for name, value in chunk_seconds.items():
+                seconds[name] += value
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    if shrink_failures:
+        shrunk, seen = [], set()
+        for failure in failures:
+            if failure.engine in seen:
+                continue
+            seen.add(failure.engine)
+            case = shrink(failure.case, failure.engine)
+            expected = reference(case)
+            try:
+                got, _ = ENGINES[failure.engine](case)
+            except Exception as e:
+                got = expected._replace(error=f"{type(e).__name__}: {e}")
+            shrunk.append(Failure(failure.engine, case, expected, got))
+        failures = shrunk
+
+    throughput = {
+        name: {"seconds": seconds[name], "steps": steps,
+               "steps_per_sec": steps / seconds[name] if seconds[name] else 0.0,
+               "cases_per_sec": cases / seconds[name] if seconds[name] else 0.0}
+        for name in engines
+    }
+    return DiffReport(cases, failures, throughput)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m post_machine.difftest",
+                                     description="Сравнение движков выполнения с эталонным интерпретатором")
+    parser.add_argument("engines", nargs="*", metavar="ENGINE",
+                        help="движки: " + ", ".join(ENGINES) + " (по умолчанию все, кроме vector)")
+    parser.add_argument("-n", "--cases", type=int, default=10000)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--max-size", type=int, default=12, help="наибольшее число команд в программе")
+    parser.add_argument("--max-input", type=int, default=10, help="наибольшая длина входа")
+    parser.add_argument("--max-steps", type=int, default=500, help="наибольший лимит шагов")
+    parser.add_argument("--no-shrink", action="store_true", help="не сокращать найденные расхождения")
+    parser.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.engines if name not in ENGINES]
+    if unknown:
+        parser.error(f"неизвестные движки: {', '.join(unknown)}")
+
+    report = run_differential(args.cases, args.seed, args.engines or None, args.workers, args.chunk_size,
+                              not args.no_shrink, max_size=args.max_size, max_input=args.max_input,
+                              max_steps=args.max_steps)
+    if args.json:
+        print(json.dumps({"cases": report.cases, "throughput": report.throughput,
+                          "failures": [{"engine": f.engine, "case": f.case._asdict(),
+                                        "expected": f.expected._asdict(), "got": f.got._asdict()}
+                                       for f in report.failures]}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Случаев: {report.cases}")
+        print(f"{'движок':<14} {'шагов/с':>14} {'случаев/с':>12}")
+        for name, t in report.throughput.items():
+            print(f"{name:<14} {t['steps_per_sec']:>14.0f} {t['cases_per_sec']:>12.0f}")
+        for f in report.failures:
+            print(f"\nРасхождение в движке {f.engine}: вход {f.case.input}, головка {f.case.head}, "
+                  f"лимит {f.case.step_limit}")
+            print(f.case.program, end="")
+            print(f"  эталон: {f.expected}")
+            print(f"  движок: {f.got}")
+    return 1 if report.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
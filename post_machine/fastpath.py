@@ -0,0 +1,227 @@
+from typing import List, Optional, Tuple
+from .machine import (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO,
+                      PostMachine)
+from .tape import tape_find
+
+# Макро-операции, которые выполняются за один проход вместо покомандной интерпретации:
+#   ('block', writes, move, nsteps, exit_pc) — линейный участок из MARK/ERASE/LEFT/RIGHT/GOTO;
+#     writes — кортеж пар (смещение от головки, значение) в итоговом виде
+#   ('scan', d, m, c, k, t, exit_pc) — цикл поиска: за итерацию k шагов, один сдвиг на d,
+#     одна проверка (t — её номер в итерации) ячейки head+m; цикл продолжается, пока ячейка == c
+MOVES = {OP_LEFT: -1, OP_RIGHT: 1}
+# Коды макро-операций в таблице fast_code (вне диапазона кодов машины)
+OP_BLOCK, OP_SCAN = -1, -2
+MAX_LOOP_LEN = 32
+
+
+def _find_block(code: List[Tuple[int,int]], start: int):
+    writes = {}
+    move = 0
+    pc = start
+    nsteps = 0
+    seen = set()
+    while 0 <= pc < len(code) and pc not in seen:
+        op, target = code[pc]
+        if op == OP_MARK or op == OP_ERASE:
+            writes[move] = 1 if op == OP_MARK else 0
+        elif op in MOVES:
+            move += MOVES[op]
+        elif op == OP_GOTO:
+            seen.add(pc)
+            pc = target
+            nsteps += 1
+            continue
+        else:
+            break
+        seen.add(pc)
+        pc += 1
+        nsteps += 1
+    if nsteps < 2:
+        return None
+    return ('block', tuple(writes.items()), move, nsteps, pc)
+
+
+def _walk_back(code: List[Tuple[int,int]], pc: int, start: int, moves: List[int], limit: int) -> Optional[int]:
+    # Идём по безусловному пути до возврата в start; возвращаем число шагов или None
+    n = 0
+    while n < limit:
+        if pc == start:
+            return n
+        if not (0 <= pc < len(code)):
+            return None
+        op, target = code[pc]
+        if op in MOVES:
+            moves.append(MOVES[op])
+            pc += 1
+        elif op == OP_GOTO:
+            pc = target
+        else:
+            return None
+        n += 1
+    return None
+
+
+def _find_scan(code: List[Tuple[int,int]], start: int):
+    # Префикс итерации: сдвиги и GOTO до единственной проверки
+    pre_moves: List[int] = []
+    pc = start
+    t = 0
+    while 0 <= pc < len(code) and t < MAX_LOOP_LEN:
+        op, target = code[pc]
+        if op in MOVES:
+            pre_moves.append(MOVES[op])
+        elif op == OP_GOTO:
+            if target == start:
+                return None
+        elif op in (OP_IF1, OP_IF0):
+            break
+        else:
+            return None
+        pc = target if op == OP_GOTO else pc + 1
+        t += 1
+    else:
+        return None
+    test_pc = pc
+    op, target = code[test_pc]
+    for cont, exit_pc, on_jump in ((target, test_pc + 1, True), (test_pc + 1, target, False)):
+        post_moves: List[int] = []
+        rest = _walk_back(code, cont, start, post_moves, MAX_LOOP_LEN)
+        if rest is None:
+            continue
+        moves = pre_moves + post_moves
+        if len(moves) != 1:
+            continue
+        d = moves[0]
+        jump_val = 1 if op == OP_IF1 else 0
+        c = jump_val if on_jump else 1 - jump_val
+        m = d if pre_moves else 0
+        return ('scan', d, m, c, t + 1 + rest, t, exit_pc)
+    return None
+
+
+def find_macros(code: List[Tuple[int,int]]) -> List[Optional[tuple]]:
+    macros = []
+    for pc in range(len(code)):
+        macros.append(_find_scan(code, pc) or _find_block(code, pc))
+    return macros
+
+
+def fast_code(program) -> List[tuple]:
+    # Код программы, в котором команды с макро-операцией заменены на (OP_BLOCK/OP_SCAN, поля макро).
+    # Зависит только от программы и кэшируется в общем объекте Program
+    table = getattr(program, '_macros', None)
+    if table is None:
+        table = program._macros = [
+            instr if macro is None else (OP_SCAN if macro[0] == 'scan' else OP_BLOCK, macro[1:])
+            for instr, macro in zip(program.code, find_macros(program.code))]
+    return table
+
+
+def _step(code: List[Tuple[int,int]], tape, pc: int, head: int) -> Tuple[int, int, bool]:
+    # Одна команда исходной программы: (pc, head, остановилась ли машина)
+    if not (0 <= pc < len(code)):
+        raise RuntimeError("PC выходит за границы программы")
+    op, target = code[pc]
+    if op == OP_IF1:
+        return (target if tape.get(head, 0) == 1 else pc + 1), head, False
+    if op == OP_IF0:
+        return (target if tape.get(head, 0) == 0 else pc + 1), head, False
+    if op in MOVES:
+        return pc + 1, head + MOVES[op], False
+    if op == OP_GOTO:
+        return target, head, False
+    if op == OP_MARK:
+        tape[head] = 1
+        return pc + 1, head, False
+    if op == OP_ERASE:
+        tape.pop(head, None)
+        return pc + 1, head, False
+    return pc, head, True
+
+
+def run_fast(pm: PostMachine) -> bool:
+    # Горячий цикл PostMachine.run, в котором команды с макро-операцией выполняются целиком.
+    # Макро-операции проверяются сразу после условных переходов: сдвиги и GOTO вне участков редки
+    if pm.halted:
+        return True
+    code = fast_code(pm.program)
+    n = len(code)
+    tape = pm.tape
+    read = tape.get
+    erase = tape.pop
+    pc, head, steps, limit = pm.pc, pm.head, pm.steps, pm.step_limit
+    try:
+        while steps < limit:
+            if not (0 <= pc < n):
+                raise RuntimeError("PC выходит за границы программы")
+            op, target = code[pc]
+            if op == OP_IF1:
+                steps += 1
+                pc = target if read(head, 0) == 1 else pc + 1
+            elif op == OP_IF0:
+                steps += 1
+                pc = target if read(head, 0) == 0 else pc + 1
+            elif op == OP_SCAN:
+                d, m, c, k, t, exit_pc = target
+                remaining = limit - steps
+                max_iters = remaining // k
+                found = tape_find(tape, head + m, 1 - c, d, max_iters + 1)
+                iters = max_iters if found is None else (found - head - m) * d
+                if found is not None and iters * k + t + 1 <= remaining:
+                    head += iters * d + m
+                    steps += iters * k + t + 1
+                    pc = exit_pc
+                    continue
+                # Не укладываемся в лимит: выполняем целые итерации разом, хвост — по шагам
+                iters = min(iters, max_iters)
+                head += iters * d
+                steps += iters * k
+                for _ in range(k):
+                    if steps >= limit:
+                        break
+                    pc, head, halted = _step(pm.code, tape, pc, head)
+                    steps += 1
+                    if halted:
+                        pm.halted = True
+                        return True
+            elif op == OP_BLOCK:
+                writes, move, nsteps, exit_pc = target
+                if nsteps > limit - steps:
+                    # Участок не помещается в оставшиеся шаги: его первая команда — отдельно
+                    pc, head, _ = _step(pm.code, tape, pc, head)
+                    steps += 1
+                    continue
+                for off, val in writes:
+                    if val:
+                        tape[head + off] = 1
+                    else:
+                        erase(head + off, None)
+                head += move
+                steps += nsteps
+                pc = exit_pc
+            elif op == OP_RIGHT:
+                steps += 1
+                head += 1
+                pc += 1
+            elif op == OP_LEFT:
+                steps += 1
+                head -= 1
+                pc += 1
+            elif op == OP_GOTO:
+                steps += 1
+                pc = target
+            elif op == OP_MARK:
+                steps += 1
+                tape[head] = 1
+                pc += 1
+            elif op == OP_ERASE:
+                steps += 1
+                erase(head, None)
+                pc += 1
+            else:
+                steps += 1
+                pm.halted = True
+                break
+    finally:
+        pm.pc, pm.head, pm.steps = pc, head, steps
+    return pm.halted
@@ -1,7 +1,79 @@
+import queue
 import tkinter as tk
 from tkinter import ttk, messagebox
-from .db import init_db, save_program, save_input, list_programs, list_inputs, load_program, load_input
-from .machine import PostMachine, tape_from_str, normalize_and_build_str, tape_str_to_int
+from .db import (init_db, save_program, save_input, list_programs_page, list_inputs_page, load_program,
+                 load_input, PAGE_SIZE)
+from .cache import default_cache
+from .machine import PostMachine, tape_from_str
+from .report import RunResult, format_report
+from .timetravel import TimeTravel
+from .worker import MachineWorker, WINDOW
+
+# Период опроса очереди фонового выполнения, мс
+POLL_MS = 50
+# Задержка поиска после ввода в списке, мс
+SEARCH_DELAY_MS = 200
+# Последний пункт списка, по которому подгружается следующая страница
+MORE_ITEM = "… ещё"
+
+
+class CatalogCombobox(ttk.Combobox):
+    """Выпадающий список имён из каталога базы данных.
+
+    Имена загружаются страницами (fetch(query, after, limit) — db.list_*_page) при открытии
+    списка, а введённый текст работает как поиск: список обновляется после паузы в наборе.
+    Пункт MORE_ITEM в конце списка подгружает следующую страницу.
+    """
+
+    def __init__(self, master, fetch, **kwargs):
+        super().__init__(master, postcommand=self._on_post, **kwargs)
+        self.fetch = fetch
+        self._names = []
+        self._query = ""
+        self._more = False
+        self._pending = None
+        self._keep = False
+        self.bind("<KeyRelease>", self._on_key)
+        self.bind("<<ComboboxSelected>>", self._on_select)
+
+    def refresh(self):
+        # Первая страница по текущему тексту поля; уже выбранное имя список не сужает
+        query = self.get().strip()
+        self._query = "" if query in self._names else query
+        self._names = []
+        self._load_page()
+
+    def _on_post(self):
+        # После подгрузки страницы список открывается заново без сброса на первую страницу
+        if self._keep:
+            self._keep = False
+        else:
+            self.refresh()
+
+    def _load_page(self):
+        after = self._names[-1] if self._names else None
+        rows = self.fetch(self._query, after, PAGE_SIZE + 1)
+        self._more = len(rows) > PAGE_SIZE
+        self._names.extend(row.name for row in rows[:PAGE_SIZE])
+        self["values"] = self._names + ([MORE_ITEM] if self._more else [])
+
+    def _on_key(self, event):
+        if event.keysym in ("Up", "Down", "Return", "Escape", "Tab"):
+            return
+        if self._pending is not None:
+            self.after_cancel(self._pending)
+        self._pending = self.after(SEARCH_DELAY_MS, self._search)
+
+    def _search(self):
+        self._pending = None
+        self.refresh()
+
+    def _on_select(self, event):
+        if self.get() == MORE_ITEM:
+            self.set(self._query)
+            self._load_page()
+            self._keep = True
+            self.event_generate("<Down>")
 
 
 class PostMachineGUI(tk.Tk):
@@ -16,6 +88,10 @@ class PostMachineGUI(tk.Tk):
         self.notebook = ttk.Notebook(self)
         self.notebook.pack(fill="both", expand=True)
 
+        self.worker = None
+        self.history = None
+        self.events = queue.Queue()
+
         self._build_program_tab()
         self._build_input_tab()
         self._build_run_tab()
@@ -36,7 +112,7 @@ class PostMachineGUI(tk.Tk):
         ttk.Button(frame, text="Сохранить", command=self.save_program_action).pack(pady=5)
         ttk.Button(frame, text="Загрузить", command=self.load_program_action).pack(pady=5)
 
-        self.prog_list = ttk.Combobox(frame, values=[n for _, n in list_programs()], width=40)
+        self.prog_list = CatalogCombobox(frame, list_programs_page, width=40)
         self.prog_list.pack(pady=10)
 
     # --- Входные данные ---
@@ -55,7 +131,7 @@ class PostMachineGUI(tk.Tk):
         ttk.Button(frame, text="Сохранить", command=self.save_input_action).pack(pady=5)
         ttk.Button(frame, text="Загрузить", command=self.load_input_action).pack(pady=5)
 
-        self.input_list = ttk.Combobox(frame, values=[n for _, n in list_inputs()], width=40)
+        self.input_list = CatalogCombobox(frame, list_inputs_page, width=40)
         self.input_list.pack(pady=10)
 
     # --- Запуск ---
@@ -64,15 +140,44 @@ class PostMachineGUI(tk.Tk):
         self.notebook.add(frame, text="Запуск")
 
         ttk.Label(frame, text="Выберите программу:").pack(pady=5)
-        self.run_prog_combo = ttk.Combobox(frame, values=[n for _, n in list_programs()], width=40)
+        self.run_prog_combo = CatalogCombobox(frame, list_programs_page, width=40)
         self.run_prog_combo.pack()
 
         ttk.Label(frame, text="Выберите вход:").pack(pady=5)
-        self.run_input_combo = ttk.Combobox(frame, values=[n for _, n in list_inputs()], width=40)
+        self.run_input_combo = CatalogCombobox(frame, list_inputs_page, width=40)
         self.run_input_combo.pack()
 
-        ttk.Button(frame, text="Запустить", command=self.run_program_action).pack(pady=10)
-        self.result_text = tk.Text(frame, height=20, width=100, state="disabled", wrap="word")
+        buttons = ttk.Frame(frame)
+        buttons.pack(pady=10)
+        self.run_button = ttk.Button(buttons, text="Запустить", command=self.run_program_action)
+        self.run_button.pack(side="left", padx=3)
+        self.pause_button = ttk.Button(buttons, text="Пауза", command=self.pause_action, state="disabled")
+        self.pause_button.pack(side="left", padx=3)
+        self.cancel_button = ttk.Button(buttons, text="Отмена", command=self.cancel_action, state="disabled")
+        self.cancel_button.pack(side="left", padx=3)
+        self.record_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(buttons, text="Записывать историю", variable=self.record_var).pack(side="left", padx=3)
+
+        # Во время выполнения показывается только окно ленты вокруг головки
+        self.progress_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=self.progress_var).pack()
+        self.tape_var = tk.StringVar(value="")
+        ttk.Label(frame, textvariable=self.tape_var, font=("Courier", 11)).pack()
+
+        # Перемещение по записанной истории после остановки
+        scrub = ttk.Frame(frame)
+        scrub.pack(pady=3)
+        self.back_button = ttk.Button(scrub, text="◀", width=3, command=lambda: self._seek_relative(-1),
+                                      state="disabled")
+        self.back_button.pack(side="left")
+        self.scrub_scale = ttk.Scale(scrub, from_=0, to=0, length=500, command=self._scrub_action,
+                                     state="disabled")
+        self.scrub_scale.pack(side="left", padx=3)
+        self.forward_button = ttk.Button(scrub, text="▶", width=3, command=lambda: self._seek_relative(1),
+                                         state="disabled")
+        self.forward_button.pack(side="left")
+
+        self.result_text = tk.Text(frame, height=15, width=100, state="disabled", wrap="word")
         self.result_text.pack(pady=5)
 
     # --- Сохранение/загрузка ---
@@ -84,8 +189,7 @@ class PostMachineGUI(tk.Tk):
             return
         save_program(name, code)
         messagebox.showinfo("Успех", f"Программа '{name}' сохранена.")
-        self.prog_list["values"] = [n for _, n in list_programs()]
-        self.run_prog_combo["values"] = self.prog_list["values"]
+        self.prog_list.refresh()
 
     def load_program_action(self):
         name = self.prog_list.get()
@@ -106,8 +210,7 @@ class PostMachineGUI(tk.Tk):
             return
         save_input(name, data)
         messagebox.showinfo("Успех", f"Вход '{name}' сохранён.")
-        self.input_list["values"] = [n for _, n in list_inputs()]
-        self.run_input_combo["values"] = self.input_list["values"]
+        self.input_list.refresh()
 
     def load_input_action(self):
         name = self.input_list.get()
@@ -140,66 +243,124 @@ class PostMachineGUI(tk.Tk):
             messagebox.showerror("Ошибка", "Входные данные должны быть двоичной строкой (например, 1011).")
             return
 
-        try:
-            tape = tape_from_str(data, left_index=0)
-            pm = PostMachine(code, tape=tape, head=len(data) - 1)
-
-            pm.run()
-
-            orig_left = 0
-            orig_right = len(data) - 1
-
-            left, right = pm.get_tape_span()
-            # если лента пустая (нет 1), get_tape_span вернёт (0,0) в текущей реализации,
-            # но на всякий случай корректируем:
-            if not pm.tape:
-                left = orig_left
-                right = orig_right
-
-            # расширяем границы так, чтобы захватить исходную длину и возможное расширение
-            left_bound = min(left, orig_left)
-            right_bound = max(right, orig_right)
-
-            # получаем полную строку в этом расширенном диапазоне
-            raw_full = pm.tape_as_str_range(left_bound, right_bound)
-
-            # Смещённая нормализация: offset = left_bound, позиция головки нормализована относительно offset
-            offset = left_bound
-            head_norm = pm.head - offset
-
-            # человекочитаемая: убираем только ведущие нули слева, но сохраняем все биты справа
-            readable = raw_full.lstrip('0') or '0'
-            decimal_value = tape_str_to_int(readable)
-
-            # также сохраним "физическую" ленту по реальным границам (для отладки)
-            raw_tape = pm.tape_as_str_range(left, right)
-
-            self.result_text.configure(state="normal")
-            self.result_text.delete("1.0", "end")
-            self.result_text.insert("1.0", f"Результат выполнения программы:\n\n")
-            self.result_text.insert("end", f"Исходные данные: {data} (десятичное: {int(data, 2)})\n")
-            self.result_text.insert("end", f"Шагов выполнено: {pm.steps}\n\n")
-
-            self.result_text.insert("end", "Лента (физическая, слева-направо) — расширенный диапазон:\n")
-            self.result_text.insert("end", f"  [{left_bound} .. {right_bound}]: {raw_full}\n\n")
-
-            self.result_text.insert("end", "Лента (физическая, где есть 1):\n")
-            self.result_text.insert("end", f"  [{left} .. {right}]: {raw_tape}\n\n")
-
-            self.result_text.insert("end", "Человекочитаемый результат (нормализованная лента):\n")
-            self.result_text.insert("end", f"  Бинарно: {readable}\n")
-            self.result_text.insert("end", f"  Десятично: {decimal_value}\n")
-
-            self.result_text.insert("end", f"\nСмещение (offset): {offset}\n")
-            self.result_text.insert("end", f"Позиция головки (внутренняя): {pm.head}\n")
-            self.result_text.insert("end", f"Позиция головки (нормализованная): {head_norm}\n")
-
-            self.result_text.configure(state="disabled")
-
+        self.run_data = data
+        # История прошлого запуска к новому результату не относится
+        self._set_history(None)
+        record = self.record_var.get()
+        # Повторный запуск той же пары (программа, вход) берётся из кэша результатов;
+        # при записи истории машину нужно выполнить заново, поэтому кэш не используется
+        pm = None if record else default_cache.lookup(code, data, head=len(data) - 1)
+        if pm is not None:
+            self._show_result(pm)
+            return
 
+        try:
+            pm = PostMachine(code, tape=tape_from_str(data, left_index=0), head=len(data) - 1)
         except Exception as e:
             messagebox.showerror("Ошибка выполнения", str(e))
+            return
 
+        self.run_code = code
+        history = TimeTravel(pm) if record else None
+        self.worker = MachineWorker(pm, self.events, history=history)
+        self.run_button.configure(state="disabled")
+        self.pause_button.configure(state="normal", text="Пауза")
+        self.cancel_button.configure(state="normal")
+        self.progress_var.set("Выполнение...")
+        self.worker.start()
+        self.after(POLL_MS, self._poll_worker)
+
+    def pause_action(self):
+        if self.worker is None:
+            return
+        if self.worker.paused:
+            self.worker.resume()
+            self.pause_button.configure(text="Пауза")
+        else:
+            self.worker.pause()
+            self.pause_button.configure(text="Продолжить")
+
+    def cancel_action(self):
+        if self.worker is not None:
+            self.worker.cancel()
+
+    def _poll_worker(self):
+        last_progress = None
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'progress':
+                last_progress = event
+            else:
+                self._finish_run(event)
+                return
+        # перерисовываем только последнее окно ленты из накопившихся
+        if last_progress is not None:
+            _, steps, rate, head, left, window = last_progress
+            self.progress_var.set(f"Шагов: {steps}   скорость: {rate:,.0f} шаг/с   головка: {head}")
+            self.tape_var.set(f"{window}\n{' ' * (head - left)}^")
+        self.after(POLL_MS, self._poll_worker)
+
+    def _finish_run(self, event):
+        history = self.worker.history
+        self.worker = None
+        self.run_button.configure(state="normal")
+        self.pause_button.configure(state="disabled", text="Пауза")
+        self.cancel_button.configure(state="disabled")
+        kind, pm = event[0], event[1]
+        if kind == 'error':
+            self.progress_var.set("")
+            messagebox.showerror("Ошибка выполнения", event[2])
+            self._set_history(history)
+            return
+        if kind == 'cancelled':
+            self.progress_var.set(f"Выполнение отменено на шаге {pm.steps}")
+        else:
+            self.progress_var.set("")
+            default_cache.store(pm, self.run_code, self.run_data)
+        self._show_result(pm)
+        self._set_history(history)
+
+    # --- История выполнения ---
+    def _set_history(self, history):
+        self.history = history
+        state = "disabled" if history is None else "normal"
+        for widget in (self.back_button, self.scrub_scale, self.forward_button):
+            widget.configure(state=state)
+        if history is not None:
+            self._final_step = history.position
+            self.scrub_scale.configure(from_=history.earliest, to=self._final_step)
+            self.scrub_scale.set(self._final_step)
+
+    def _seek_relative(self, delta):
+        if self.history is not None:
+            self._seek(self.history.position + delta)
+
+    def _scrub_action(self, value):
+        if self.history is not None and int(float(value)) != self.history.position:
+            self._seek(int(float(value)))
+
+    def _seek(self, step):
+        # Переход выполняется по журналу и снимкам, не дальше шага, на котором выполнение остановилось
+        history = self.history
+        try:
+            history.seek(min(max(step, history.earliest), self._final_step))
+        except RuntimeError as e:
+            messagebox.showerror("Ошибка выполнения", str(e))
+            return
+        pm = history.pm
+        self.scrub_scale.set(pm.steps)
+        left = pm.head - WINDOW
+        self.progress_var.set(f"Шаг: {pm.steps}   команда: {pm.pc}   головка: {pm.head}")
+        self.tape_var.set(f"{pm.tape_as_str_range(left, pm.head + WINDOW)}\n{' ' * WINDOW}^")
+
+    def _show_result(self, pm):
+        self.result_text.configure(state="normal")
+        self.result_text.delete("1.0", "end")
+        self.result_text.insert("1.0", format_report(RunResult(pm, self.run_data)))
+        self.result_text.configure(state="disabled")
 
 def main():
     app = PostMachineGUI()
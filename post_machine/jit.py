@@ -0,0 +1,135 @@
+from functools import lru_cache
+from typing import Callable, List, Tuple
+
+from .machine import (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, OP_HALT,
+                      PostMachine)
+
+# Сколько скомпилированных программ держать в памяти
+CACHE_SIZE = 256
+
+# Коды возврата сгенерированной функции
+STOPPED, HALTED = 0, 1
+
+
+def _blocks(code: List[Tuple[int,int]], start_pc: int) -> List[Tuple[int, List[int]]]:
+    # Линейные участки: начинаются с точки входа, цели перехода или команды после перехода
+    leaders = {start_pc}
+    for pc, (op, target) in enumerate(code):
+        if op in (OP_IF1, OP_IF0, OP_GOTO):
+            leaders.add(target)
+        if op in (OP_IF1, OP_IF0, OP_GOTO, OP_HALT):
+            leaders.add(pc + 1)
+    leaders = sorted(pc for pc in leaders if 0 <= pc < len(code))
+    blocks = []
+    for i, lead in enumerate(leaders):
+        end = leaders[i + 1] if i + 1 < len(leaders) else len(code)
+        body = []
+        for pc in range(lead, end):
+            body.append(pc)
+            if code[pc][0] in (OP_IF1, OP_IF0, OP_GOTO, OP_HALT):
+                break
+        blocks.append((lead, body))
+    return blocks
+
+
+def _emit_block(code: List[Tuple[int,int]], body: List[int], indent: str) -> List[str]:
+    n = len(body)
+    out = [f"{indent}if steps + {n} > limit:",
+           f"{indent}    return pc, head, steps, {STOPPED}",
+           f"{indent}steps += {n}"]
+    off = 0
+
+    def at():
+        return "head" if off == 0 else f"head + {off}" if off > 0 else f"head - {-off}"
+
+    def flush():
+        if off:
+            out.append(f"{indent}head += {off}")
+
+    for pc in body:
+        op, target = code[pc]
+        if op == OP_MARK:
+            out.append(f"{indent}tape[{at()}] = 1")
+        elif op == OP_ERASE:
+            out.append(f"{indent}pop({at()}, None)")
+        elif op == OP_LEFT:
+            off -= 1
+        elif op == OP_RIGHT:
+            off += 1
+        elif op == OP_GOTO:
+            flush()
+            out.append(f"{indent}pc = {target}")
+            return out
+        elif op == OP_HALT:
+            flush()
+            out.append(f"{indent}return {pc}, head, steps, {HALTED}")
+            return out
+        else:
+            flush()
+            val = 1 if op == OP_IF1 else 0
+            out.append(f"{indent}pc = {target} if get(head, 0) == {val} else {pc + 1}")
+            return out
+    flush()
+    out.append(f"{indent}pc = {body[-1] + 1}")
+    return out
+
+
+def _emit_dispatch(code, blocks, indent: str) -> List[str]:
+    # Двоичное дерево сравнений по pc: O(log число участков) проверок на переход
+    if len(blocks) == 1:
+        lead, body = blocks[0]
+        return [f"{indent}if pc == {lead}:"] + _emit_block(code, body, indent + "    ") + \
+               [f"{indent}else:", f"{indent}    return pc, head, steps, {STOPPED}"]
+    mid = len(blocks) // 2
+    return [f"{indent}if pc < {blocks[mid][0]}:"] + _emit_dispatch(code, blocks[:mid], indent + "    ") + \
+           [f"{indent}else:"] + _emit_dispatch(code, blocks[mid:], indent + "    ")
+
+
+def generate_source(code: List[Tuple[int,int]], start_pc: int) -> str:
+    lines = [
+        "def run_program(tape, head, pc, steps, limit):",
+        "    get = tape.get",
+        "    pop = tape.pop",
+        "    while True:",
+    ]
+    blocks = _blocks(code, start_pc)
+    if blocks:
+        lines += _emit_dispatch(code, blocks, "        ")
+    else:
+        lines.append(f"        return pc, head, steps, {STOPPED}")
+    return "\n".join(lines) + "\n"
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def compile_code(code: Tuple[Tuple[int,int], ...], start_pc: int) -> Callable:
+    """Генерирует и компилирует функцию run_program(tape, head, pc, steps, limit) для программы.
+
+    Функция возвращает (pc, head, steps, status); STOPPED означает, что следующий участок
+    не укладывается в лимит шагов или pc вне программы — остаток выполняет интерпретатор.
+    """
+    namespace = {}
+    exec(compile(generate_source(list(code), start_pc), "<post_machine.jit>", "exec"), namespace)
+    fn = namespace["run_program"]
+    fn.leaders = frozenset(lead for lead, _ in _blocks(list(code), start_pc))
+    return fn
+
+
+def run_compiled(pm: PostMachine) -> bool:
+    if pm.halted:
+        return True
+    fn = compile_code(tuple(pm.code), pm.start_pc)
+    n = len(pm.code)
+    while True:
+        pc, head, steps, status = fn(pm.tape, pm.head, pm.pc, pm.steps, pm.step_limit)
+        pm.pc, pm.head, pm.steps = pc, head, steps
+        if status == HALTED:
+            pm.halted = True
+            return True
+        if pc in fn.leaders or not (0 <= pc < n):
+            # Хвост у лимита шагов и выход pc за границы обрабатывает обычный run()
+            return pm.run()
+        # Продолжение с середины участка (например, после прерванного запуска): доходим до его конца
+        while pm.pc not in fn.leaders and not pm.halted and pm.steps < pm.step_limit:
+            pm.step()
+        if pm.halted or pm.steps >= pm.step_limit:
+            return pm.halted
@@ -0,0 +1,116 @@
+from collections import deque
+from typing import Dict, List
+from .machine import PostMachine, NonTerminationError
+
+# Сколько ячеек позади головки запоминается в контрольной точке-рекорде
+WINDOW = 64
+# Сколько последних рекордов с тем же pc проверяется как начало цикла
+MAX_CANDIDATES = 8
+# Сколько последних рекордов хранится для проверки сдвинутых циклов
+MAX_RECORDS = 4096
+
+
+class LoopDetector:
+    """Обнаруживает программы, которые гарантированно не остановятся.
+
+    Два критерия:
+      * точный цикл — повторение конфигурации (pc, head, лента); ищется алгоритмом Брента,
+        конфигурация запоминается на шагах 1, 2, 4, 8, ...;
+      * сдвинутый цикл — в моменты, когда головка впервые заходит за край посещённой
+        области (справа от неё лента пуста), запоминаются pc и окно ленты позади головки.
+        Если то же pc повторяется со сдвигом d, головка между моментами не отходила назад
+        дальше окна и содержимое от самой дальней точки отката до головки совпадает со
+        сдвигом, то дальнейшее выполнение будет повторяться со сдвигом d бесконечно.
+    """
+
+    def __init__(self, pm: PostMachine, window: int = WINDOW):
+        # Окно хранится вместе с ячейкой под головкой
+        window = max(window, 1)
+        self.pm = pm
+        self.window = window
+        self._saved = None
+        self._next_save = 1
+        lo, hi = pm.get_tape_span() if pm.tape else (pm.head, pm.head)
+        self._bounds = [min(lo, pm.head), max(hi, pm.head)]
+        # Для каждой стороны (-1 — влево, 1 — вправо): рекорды и минимальный откат с последнего рекорда
+        self._records: Dict[int, deque] = {-1: deque(maxlen=MAX_RECORDS), 1: deque(maxlen=MAX_RECORDS)}
+        self._keys: Dict[int, Dict[int, List[int]]] = {-1: {}, 1: {}}
+        self._back = {-1: pm.head, 1: pm.head}
+        self._serial = {-1: 0, 1: 0}
+
+    def check(self):
+        pm = self.pm
+        head = pm.head
+        # откат назад относительно последнего рекорда каждой стороны
+        if head < self._back[1]:
+            self._back[1] = head
+        if head > self._back[-1]:
+            self._back[-1] = head
+        if head > self._bounds[1]:
+            self._bounds[1] = head
+            self._record(1)
+        elif head < self._bounds[0]:
+            self._bounds[0] = head
+            self._record(-1)
+        self._check_exact()
+
+    def _check_exact(self):
+        pm = self.pm
+        saved = self._saved
+        if saved is not None and saved[0] == pm.pc and saved[1] == pm.head and \
+                saved[2] == len(pm.tape) and saved[3] == frozenset(pm.tape.keys()):
+            raise NonTerminationError("Программа зациклилась: конфигурация повторилась", 'cycle', pm.steps - saved[4])
+        if pm.steps >= self._next_save:
+            self._saved = (pm.pc, pm.head, len(pm.tape), frozenset(pm.tape.keys()), pm.steps)
+            self._next_save = pm.steps * 2
+
+    def _record(self, side: int):
+        pm = self.pm
+        head = pm.head
+        # окно ленты позади головки, от головки назад
+        if side > 0:
+            window = pm.tape_as_str_range(head - self.window, head)[::-1]
+        else:
+            window = pm.tape_as_str_range(head, head + self.window)
+        records = self._records[side]
+        serial = self._serial[side]
+        if records:
+            # фиксируем откат для закончившегося отрезка между рекордами
+            records[-1][3] = (records[-1][1] - self._back[side]) * side
+        candidates = self._keys[side].setdefault(pm.pc, [])
+        first_serial = serial - len(records)
+        for cand in reversed(candidates):
+            if cand < first_serial:
+                continue
+            if self._verify(side, cand - first_serial, window, head):
+                raise NonTerminationError("Программа не остановится: шаблон повторяется со сдвигом",
+                                          'translated', pm.steps - records[cand - first_serial][2])
+        candidates.append(serial)
+        if len(candidates) > MAX_CANDIDATES:
+            del candidates[0]
+        records.append([window, head, pm.steps, 0])
+        self._serial[side] = serial + 1
+        self._back[side] = head
+
+    def _verify(self, side: int, idx: int, window: str, head: int) -> bool:
+        records = self._records[side]
+        old_window, old_head = records[idx][0], records[idx][1]
+        # наибольший откат (назад от головки в момент старого рекорда) на всём интервале
+        back = 0
+        for i in range(idx, len(records)):
+            rec = records[i]
+            back = max(back, rec[3] + (rec[1] - old_head) * -side)
+            if back >= self.window:
+                return False
+        return old_window[:back + 1] == window[:back + 1]
+
+
+def run_detecting(pm: PostMachine, window: int = WINDOW) -> bool:
+    if pm.halted:
+        return True
+    detector = LoopDetector(pm, window)
+    while not pm.halted and pm.steps < pm.step_limit:
+        pm.step()
+        if not pm.halted:
+            detector.check()
+    return pm.halted
@@ -1,33 +1,218 @@
+from functools import lru_cache
+from types import MappingProxyType
 from typing import Dict, List, Tuple, Optional
+from .tape import BitTape, fork_tape, tape_span, tape_range_str
 
+# Коды операций скомпилированной программы
+OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, OP_HALT = range(8)
+
+OPCODES = {
+    'MARK': OP_MARK,
+    'ERASE': OP_ERASE,
+    'LEFT': OP_LEFT,
+    'RIGHT': OP_RIGHT,
+    'IF1': OP_IF1,
+    'IF0': OP_IF0,
+    'GOTO': OP_GOTO,
+    'HALT': OP_HALT,
+}
+JUMP_OPS = (OP_IF1, OP_IF0, OP_GOTO)
+_OP_NAMES = {op: name for name, op in OPCODES.items()}
+
+
+class NonTerminationError(RuntimeError):
+    # Программа гарантированно не остановится; kind — 'cycle' или 'translated', period — длина цикла в шагах
+    def __init__(self, message: str, kind: str, period: int):
+        super().__init__(message)
+        self.kind = kind
+        self.period = period
+
+
+def compile_program(instructions: List[Tuple[Optional[str], str]], labels: Dict[str,int]) -> List[Tuple[int,int]]:
+    # Переводит текстовые инструкции в пары (opcode, operand); для переходов operand — индекс инструкции
+    code = []
+    for _, instr in instructions:
+        parts = instr.split()
+        cmd = parts[0].upper()
+        arg = parts[1] if len(parts) > 1 else None
+        op = OPCODES.get(cmd)
+        if op is None:
+            raise ValueError(f"Неизвестная команда: {cmd}")
+        target = -1
+        if op in JUMP_OPS:
+            if arg is None:
+                raise ValueError(f"{cmd} требует метку")
+            if arg not in labels:
+                raise ValueError(f"Метка не найдена: {arg}")
+            target = labels[arg]
+        code.append((op, target))
+    return code
 
-class PostMachine:
-    def __init__(self, program_text: str, tape: Dict[int,int]=None, head:int=0, step_limit:int=10000):
-        self.lines = [line.rstrip() for line in program_text.splitlines() if line.strip() and not line.strip().startswith('#')]
-        self.instructions: List[Tuple[Optional[str], str]] = []
-        self.labels: Dict[str,int] = {}
-        self._parse()
-        if not self.labels:
-            raise ValueError("Программа должна содержать хотя бы одну метку")
-        first_label = next(iter(self.labels))
-        self.pc = self.labels[first_label]
-        self.tape = tape if tape is not None else {}
-        self.head = head
-        self.step_limit = step_limit
-        self.steps = 0
-        self.halted = False
-        
 
-    def _parse(self):
+# Сколько разобранных программ держать в кэше parse_program
+PROGRAM_CACHE_SIZE = 1024
+
+
+class Program:
+    """Разобранная программа. Неизменяема, поэтому одну программу разделяют любые машины.
+
+    Атрибуты с подчёркиванием — кэши движков (fastpath, analysis), заполняемые при первом запуске.
+    """
+    __slots__ = ('text', 'lines', 'line_numbers', 'instructions', 'labels', 'code', 'start_pc',
+                 '_macros', '_optimized')
+
+    def __init__(self, program_text: str):
+        numbered = [(n, line.rstrip()) for n, line in enumerate(program_text.splitlines(), 1)
+                    if line.strip() and not line.strip().startswith('#')]
+        lines = [line for _, line in numbered]
+        instructions: List[Tuple[Optional[str], str]] = []
+        labels: Dict[str,int] = {}
         current_label = None
-        for line in self.lines:
+        for line in lines:
             if line.endswith(':'):
                 lbl = line[:-1].strip()
-                self.labels[lbl] = len(self.instructions)
+                labels[lbl] = len(instructions)
                 current_label = lbl
             else:
-                self.instructions.append((current_label, line.strip()))
+                instructions.append((current_label, line.strip()))
                 current_label = None
+        code = compile_program(instructions, labels)
+        if not labels:
+            raise ValueError("Программа должна содержать хотя бы одну метку")
+        # Номера строк исходного текста для каждой инструкции (для отчётов профилировщика)
+        self._assign(program_text, lines, [n for n, line in numbered if not line.endswith(':')],
+                     instructions, labels, code)
+
+    def _assign(self, text, lines, line_numbers, instructions, labels, code):
+        set_ = object.__setattr__
+        set_(self, 'text', text)
+        set_(self, 'lines', tuple(lines))
+        set_(self, 'line_numbers', tuple(line_numbers))
+        set_(self, 'instructions', tuple(instructions))
+        set_(self, 'labels', MappingProxyType(labels))
+        set_(self, 'code', tuple(code))
+        set_(self, 'start_pc', labels[next(iter(labels))])
+
+    @classmethod
+    def from_code(cls, code) -> 'Program':
+        """Программа из готовых пар (opcode, operand) без разбора текста.
+
+        Точка входа — первая команда; метки называются L<индекс> и ставятся перед
+        первой командой и перед целями переходов. Текст программы строится тут же
+        и при разборе даёт тот же код.
+        """
+        n = len(code)
+        for op, target in code:
+            if op not in _OP_NAMES:
+                raise ValueError(f"Неизвестный код операции: {op}")
+            if op in JUMP_OPS and not (0 <= target <= n):
+                raise ValueError(f"Переход за пределы программы: {target}")
+        targets = {0}
+        targets.update(target for op, target in code if op in JUMP_OPS)
+        lines: List[str] = []
+        line_numbers: List[int] = []
+        instructions: List[Tuple[Optional[str], str]] = []
+        labels: Dict[str, int] = {}
+        for idx, (op, target) in enumerate(code):
+            label = None
+            if idx in targets:
+                label = f"L{idx}"
+                labels[label] = idx
+                lines.append(label + ":")
+            instr = f"{_OP_NAMES[op]} L{target}" if op in JUMP_OPS else _OP_NAMES[op]
+            instructions.append((label, instr))
+            lines.append("    " + instr)
+            line_numbers.append(len(lines))
+        if n in targets:
+            labels[f"L{n}"] = n
+            lines.append(f"L{n}:")
+        self = cls.__new__(cls)
+        self._assign("\n".join(lines) + "\n", lines, line_numbers, instructions, labels,
+                     [(op, target if op in JUMP_OPS else -1) for op, target in code])
+        return self
+
+    def __setattr__(self, name, value):
+        if not name.startswith('_'):
+            raise AttributeError("Program неизменяема")
+        object.__setattr__(self, name, value)
+
+    def __reduce__(self):
+        # При передаче в другой процесс программа разбирается заново (через кэш)
+        return parse_program, (self.text,)
+
+    def __len__(self) -> int:
+        return len(self.code)
+
+
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def parse_program(program_text: str) -> Program:
+    return Program(program_text)
+
+
+class PostMachine:
+    # Состояние машины; всё, что относится к самой программе, — в общем объекте Program
+    __slots__ = ('program', 'tape', 'head', 'pc', 'steps', 'step_limit', 'halted')
+
+    def __init__(self, program_text, tape: Dict[int,int]=None, head:int=0, step_limit:int=10000):
+        # program_text — текст программы или уже разобранный Program
+        self.program = program_text if isinstance(program_text, Program) else parse_program(program_text)
+        self.pc = self.program.start_pc
+        self.tape = tape if tape is not None else {}
+        self.head = head
+        self.step_limit = step_limit
+        self.steps = 0
+        self.halted = False
+
+    @property
+    def lines(self) -> Tuple[str, ...]:
+        return self.program.lines
+
+    @property
+    def line_numbers(self) -> Tuple[int, ...]:
+        return self.program.line_numbers
+
+    @property
+    def instructions(self) -> Tuple[Tuple[Optional[str], str], ...]:
+        return self.program.instructions
+
+    @property
+    def labels(self):
+        return self.program.labels
+
+    @property
+    def code(self) -> Tuple[Tuple[int,int], ...]:
+        return self.program.code
+
+    @property
+    def start_pc(self) -> int:
+        return self.program.start_pc
+
+    def reset(self, tape: Dict[int,int]=None, head: int=0):
+        # Повторный запуск уже разобранной программы на новой ленте без повторного разбора
+        self.pc = self.start_pc
+        self.tape = tape if tape is not None else {}
+        self.head = head
+        self.steps = 0
+        self.halted = False
+
+    def fork(self) -> 'PostMachine':
+        """Независимая копия машины.
+
+        Обе машины получают ленты с копированием при записи (CowTape) над общей основой
+        только для чтения: каждая хранит только свои изменения. Первое ответвление
+        ленты-словаря копирует её в основу (O(n) один раз), так что запись через ссылку
+        на прежний словарь ни одну из машин не затрагивает; дальнейшие ответвления — O(1),
+        а запись в ставшую основой CowTape вызывает TypeError.
+        BitTape копируется целиком (по биту на ячейку, O(n)), и обе машины остаются на
+        плотном представлении; лента исходной машины при этом не заменяется.
+        """
+        self.tape, tape = fork_tape(self.tape)
+        child = PostMachine.__new__(PostMachine)
+        child.program = self.program
+        child.tape = tape
+        child.head, child.pc, child.steps = self.head, self.pc, self.steps
+        child.step_limit, child.halted = self.step_limit, self.halted
+        return child
 
     def _read(self, pos:int)->int:
         return self.tape.get(pos, 0)
@@ -43,54 +228,120 @@ class PostMachine:
             return
         if self.steps >= self.step_limit:
             raise RuntimeError("Превышен лимит шагов")
-        if not (0 <= self.pc < len(self.instructions)):
+        code = self.program.code
+        if not (0 <= self.pc < len(code)):
             raise RuntimeError("PC выходит за границы программы")
-        _, instr = self.instructions[self.pc]
-        parts = instr.split()
-        cmd = parts[0].upper()
-        arg = parts[1] if len(parts) > 1 else None
+        op, target = code[self.pc]
         self.steps += 1
-        if cmd == 'MARK':
+        if op == OP_MARK:
             self._write(self.head, 1)
             self.pc += 1
-        elif cmd == 'ERASE':
+        elif op == OP_ERASE:
             self._write(self.head, 0)
             self.pc += 1
-        elif cmd == 'LEFT':
+        elif op == OP_LEFT:
             self.head -= 1
             self.pc += 1
-        elif cmd == 'RIGHT':
+        elif op == OP_RIGHT:
             self.head += 1
             self.pc += 1
-        elif cmd == 'IF1':
-            if arg is None:
-                raise ValueError("IF1 требует метку")
+        elif op == OP_IF1:
             if self._read(self.head) == 1:
-                self.pc = self.labels[arg]
+                self.pc = target
             else:
                 self.pc += 1
-        elif cmd == 'IF0':
-            if arg is None:
-                raise ValueError("IF0 требует метку")
+        elif op == OP_IF0:
             if self._read(self.head) == 0:
-                self.pc = self.labels[arg]
+                self.pc = target
             else:
                 self.pc += 1
-        elif cmd == 'GOTO':
-            if arg is None:
-                raise ValueError("GOTO требует метку")
-            self.pc = self.labels[arg]
-        elif cmd == 'HALT':
-            self.halted = True
+        elif op == OP_GOTO:
+            self.pc = target
         else:
-            raise ValueError(f"Неизвестная команда: {cmd}")
+            self.halted = True
 
-    def run(self):
-        while not self.halted and self.steps < self.step_limit:
-            self.step()
-            # В CLI-версии печатался формат состояния; в GUI это не нужно, но функция оставлена
+    def run(self, fast: bool=False, detect_loops: bool=False, trace=None, trace_every: int=1, jit: bool=False,
+            profile=None, optimize: bool=False, memo: bool=False):
+        # Режимы выполнения взаимоисключающие: молча выбирать один из запрошенных нельзя
+        if (profile is not None) + jit + (trace is not None) + detect_loops + memo + optimize + fast > 1:
+            chosen = [name for name, on in (("profile", profile is not None), ("jit", jit),
+                                            ("trace", trace is not None), ("detect_loops", detect_loops),
+                                            ("memo", memo), ("optimize", optimize), ("fast", fast)) if on]
+            raise ValueError(f"Режимы выполнения несовместимы: {', '.join(chosen)}")
+        if profile is not None:
+            # Подсчёт выполнений по инструкциям и перемещений головки (см. profiler.py)
+            from .profiler import run_profiled
+            return run_profiled(self, profile)
+        if jit:
+            # Программа транслируется в функцию Python и кэшируется (см. jit.py)
+            from .jit import run_compiled
+            return run_compiled(self)
+        if trace is not None:
+            # Пошаговое выполнение с передачей записей трассы в trace(record) (см. trace.py)
+            from .trace import run_traced
+            return run_traced(self, trace, trace_every)
+        if detect_loops:
+            # Пошаговое выполнение с поиском циклов (см. loops.py); при зацикливании — NonTerminationError
+            from .loops import run_detecting
+            return run_detecting(self)
+        if memo:
+            # Переходы по блокам ленты берутся из кэша программы (см. memo.py)
+            from .memo import run_memoized
+            return run_memoized(self)
+        if optimize:
+            # Достижимый код выполняется укрупнёнными участками с точным счётом шагов (см. analysis.py)
+            from .analysis import run_optimized
+            return run_optimized(self)
+        if fast:
+            # Линейные участки и циклы поиска выполняются целиком (см. fastpath.py)
+            from .fastpath import run_fast
+            return run_fast(self)
+        # Горячий цикл: состояние держим в локальных переменных и записываем обратно в finally,
+        # чтобы при исключении (выход PC за границы) объект остался согласованным
+        if self.halted:
+            return True
+        code = self.code
+        n = len(code)
+        tape = self.tape
+        read = tape.get
+        erase = tape.pop
+        pc, head, steps, limit = self.pc, self.head, self.steps, self.step_limit
+        try:
+            while steps < limit:
+                if not (0 <= pc < n):
+                    raise RuntimeError("PC выходит за границы программы")
+                op, target = code[pc]
+                steps += 1
+                if op == OP_IF1:
+                    pc = target if read(head, 0) == 1 else pc + 1
+                elif op == OP_IF0:
+                    pc = target if read(head, 0) == 0 else pc + 1
+                elif op == OP_RIGHT:
+                    head += 1
+                    pc += 1
+                elif op == OP_LEFT:
+                    head -= 1
+                    pc += 1
+                elif op == OP_GOTO:
+                    pc = target
+                elif op == OP_MARK:
+                    tape[head] = 1
+                    pc += 1
+                elif op == OP_ERASE:
+                    erase(head, None)
+                    pc += 1
+                else:
+                    self.halted = True
+                    break
+        finally:
+            self.pc, self.head, self.steps = pc, head, steps
         return self.halted
 
+    def run_for(self, n: int, **run_kwargs):
+        # Продолжить выполнение ещё не более чем на n шагов (лимит шагов сдвигается)
+        self.step_limit = self.steps + n
+        return self.run(**run_kwargs)
+
     def format_state(self, window: int=10) -> str:
         left = self.head - window
         right = self.head + window
@@ -98,19 +349,18 @@ class PostMachine:
         return f"step={self.steps:4d} pc={self.pc:3d} head={self.head:4d} tape[{left}..{right}]={cells}"
 
     def get_tape_span(self):
-        if not self.tape:
-            return (0, 0)
-        return (min(self.tape.keys()), max(self.tape.keys()))
+        return tape_span(self.tape)
 
     def tape_as_str_range(self, left:int, right:int) -> str:
         # Возвращает строку слева->справа (min_index .. max_index)
-        if left > right:
-            return ""
-        return ''.join(str(self._read(i)) for i in range(left, right+1))
+        return tape_range_str(self.tape, left, right)
 
 
-def tape_from_str(s: str, left_index: int=0) -> Dict[int,int]:
+def tape_from_str(s: str, left_index: int=0, dense: bool=False) -> Dict[int,int]:
     # Прямое соответствие: s[0] помещается на индекс left_index, s[1] -> left_index+1 и т.д.
+    # dense=True возвращает битовую ленту BitTape (1 бит на ячейку) вместо словаря
+    if dense:
+        return BitTape.from_str(s, left_index)
     t = {}
     for i, ch in enumerate(s):
         if ch == '1':
@@ -120,29 +370,9 @@ def tape_from_str(s: str, left_index: int=0) -> Dict[int,int]:
 
 # Утилиты для нормализации/интерпретации ленты (как в CLI-версии)
 def normalize_and_build_str(pm: PostMachine):
-    if not pm.tape:
-        return "0", 0, pm.head
-
-    left, right = pm.get_tape_span()
-    raw = pm.tape_as_str_range(left, right)  # физическая лента
-
-    # Найдём первую и последнюю '1'
-    first_one = raw.find('1')
-    last_one = raw.rfind('1')
-
-    if first_one == -1:
-        # На ленте нет единиц, всё нули
-        norm = "0"
-        offset = left
-        head_norm = pm.head - offset
-        return norm, offset, head_norm
-
-    # Нормализованный диапазон по первой и последней единице
-    norm = raw[first_one:last_one + 1]
-    offset = left + first_one
-    head_norm = pm.head - offset
-    return norm, offset, head_norm
-
+    # (norm, offset, head_norm) — то же, что RunResult.normalized
+    from .report import RunResult
+    return RunResult(pm, "").normalized
 
 
 def tape_str_to_int(bin_str: str) -> int:
@@ -0,0 +1,192 @@
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .machine import OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, PostMachine
+
+# Ширина блока ленты в ячейках
+BLOCK_SIZE = 32
+# Сколько переходов хранить в кэше одной программы
+CACHE_SIZE = 1 << 16
+# Сколько кэшей (программа, ширина блока) держать в памяти; давно не использованные вытесняются
+PROGRAM_CACHES = 8
+# Наибольшее число шагов одного перехода; дольше программа остаётся внутри блока — переход делится
+MAX_INNER = 1 << 14
+
+# Чем закончился переход
+EXIT, HALT, INSIDE, ERROR = range(4)
+
+
+class TransitionCache:
+    """Кэш переходов по блокам ленты с вытеснением давно не использованных (LRU).
+
+    Ключ — (pc, смещение головки в блоке, содержимое блока), значение —
+    (новое содержимое, pc, смещение, шагов, вид окончания).
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self._data: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: tuple) -> Optional[tuple]:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+        return value
+
+    def put(self, key: tuple, value: tuple):
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+
+def _simulate(code, pc: int, off: int, bits: int, size: int) -> tuple:
+    # Пошаговое выполнение внутри одного блока до выхода головки за его край
+    n = len(code)
+    steps = 0
+    while steps < MAX_INNER:
+        if not (0 <= pc < n):
+            return bits, pc, off, steps, ERROR
+        op, target = code[pc]
+        steps += 1
+        if op == OP_IF1:
+            pc = target if bits >> off & 1 else pc + 1
+        elif op == OP_IF0:
+            pc = pc + 1 if bits >> off & 1 else target
+        elif op == OP_RIGHT:
+            off += 1
+            pc += 1
+            if off == size:
+                return bits, pc, off, steps, EXIT
+        elif op == OP_LEFT:
+            off -= 1
+            pc += 1
+            if off < 0:
+                return bits, pc, off, steps, EXIT
+        elif op == OP_GOTO:
+            pc = target
+        elif op == OP_MARK:
+            bits |= 1 << off
+            pc += 1
+        elif op == OP_ERASE:
+            bits &= ~(1 << off)
+            pc += 1
+        else:
+            return bits, pc, off, steps, HALT
+    return bits, pc, off, steps, INSIDE
+
+
+# (программа, ширина блока) -> кэш переходов; в памяти не больше PROGRAM_CACHES кэшей,
+# так что долгоживущий процесс (service, batch) держит не больше PROGRAM_CACHES * CACHE_SIZE переходов
+_caches: 'OrderedDict[tuple, TransitionCache]' = OrderedDict()
+
+
+def program_cache(pm: PostMachine, block_size: int = BLOCK_SIZE) -> TransitionCache:
+    """Кэш переходов программы pm для блоков заданной ширины; общий для всех машин с этой программой."""
+    key = (pm.program, block_size)
+    cache = _caches.get(key)
+    if cache is None:
+        cache = _caches[key] = TransitionCache()
+        if len(_caches) > PROGRAM_CACHES:
+            _caches.popitem(last=False)
+    else:
+        _caches.move_to_end(key)
+    return cache
+
+
+def clear_caches():
+    # Освобождает кэши переходов всех программ
+    _caches.clear()
+
+
+def _split(tape, size: int) -> Dict[int, int]:
+    blocks: Dict[int, int] = {}
+    for pos in tape.keys():
+        k, off = divmod(pos, size)
+        blocks[k] = blocks.get(k, 0) | 1 << off
+    return blocks
+
+
+def run_memoized(pm: PostMachine, block_size: int = BLOCK_SIZE,
+                 cache: Optional[TransitionCache] = None) -> bool:
+    """Выполняет машину переходами между блоками ленты по кэшу; steps совпадает с run()."""
+    if pm.halted:
+        return True
+    if cache is None:
+        cache = program_cache(pm, block_size)
+    code = pm.code
+    size = block_size
+    tape = pm.tape
+    original = _split(tape, size)
+    blocks = dict(original)
+    touched = set()
+    get, put = cache.get, cache.put
+    pc, steps, limit = pm.pc, pm.steps, pm.step_limit
+    k, off = divmod(pm.head, size)
+    halted = False
+    try:
+        while steps < limit:
+            bits = blocks.get(k, 0)
+            key = (pc, off, bits)
+            tr = get(key)
+            if tr is None:
+                tr = _simulate(code, pc, off, bits, size)
+                put(key, tr)
+            new_bits, new_pc, new_off, n, kind = tr
+            if kind == ERROR or steps + n > limit:
+                # Хвост перед лимитом и выход pc за границы выполняет обычный run()
+                break
+            steps += n
+            pc = new_pc
+            if new_bits != bits:
+                blocks[k] = new_bits
+                touched.add(k)
+            if kind == HALT:
+                off = new_off
+                halted = True
+                break
+            if new_off < 0:
+                k -= 1
+                off = size - 1
+            elif new_off >= size:
+                k += 1
+                off = 0
+            else:
+                off = new_off
+    finally:
+        # Изменённые ячейки переносятся обратно в ленту машины (тот же объект)
+        for bk in touched:
+            diff = original.get(bk, 0) ^ blocks.get(bk, 0)
+            new = blocks.get(bk, 0)
+            base = bk * size
+            while diff:
+                low = diff & -diff
+                i = low.bit_length() - 1
+                if new & low:
+                    tape[base + i] = 1
+                else:
+                    tape.pop(base + i, None)
+                diff ^= low
+        pm.pc, pm.head, pm.steps = pc, k * size + off, steps
+        pm.halted = halted
+    if halted or steps >= limit:
+        return pm.halted
+    return pm.run()
@@ -0,0 +1,149 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from .machine import OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, PostMachine
+
+
+class Profile:
+    """Счётчики выполнения; один объект можно передавать в несколько запусков одной программы."""
+
+    def __init__(self):
+        self.counts: List[int] = []
+        self.head_min: Optional[int] = None
+        self.head_max: Optional[int] = None
+        self.steps = 0
+        self.pm: Optional[PostMachine] = None
+
+    def _machine(self) -> PostMachine:
+        if self.pm is None:
+            raise ValueError("Профиль пуст: программа ещё не выполнялась с этим профилем")
+        return self.pm
+
+    @property
+    def cells_touched(self) -> int:
+        # Головка сдвигается на одну ячейку, поэтому посещённые ячейки образуют отрезок
+        if self.head_min is None:
+            return 0
+        return self.head_max - self.head_min + 1
+
+    @property
+    def head_travel(self) -> int:
+        return sum(c for c, (op, _) in zip(self.counts, self._machine().code) if op in (OP_LEFT, OP_RIGHT))
+
+    @property
+    def writes(self) -> int:
+        return sum(c for c, (op, _) in zip(self.counts, self._machine().code) if op in (OP_MARK, OP_ERASE))
+
+    def label_counts(self) -> Dict[str, int]:
+        # Инструкция относится к ближайшей метке выше неё
+        pm = self._machine()
+        owners = self._owners()
+        result = {lbl: 0 for lbl in pm.labels}
+        for idx, count in enumerate(self.counts):
+            if owners[idx] is not None:
+                result[owners[idx]] += count
+        return result
+
+    def _owners(self) -> List[Optional[str]]:
+        pm = self._machine()
+        starts = sorted((idx, lbl) for lbl, idx in pm.labels.items())
+        owners: List[Optional[str]] = []
+        j = -1
+        for idx in range(len(pm.code)):
+            while j + 1 < len(starts) and starts[j + 1][0] <= idx:
+                j += 1
+            owners.append(starts[j][1] if j >= 0 else None)
+        return owners
+
+    def to_dict(self) -> Dict[str, Any]:
+        pm = self._machine()
+        owners = self._owners()
+        return {
+            "steps": self.steps,
+            "head_travel": self.head_travel,
+            "cells_touched": self.cells_touched,
+            "writes": self.writes,
+            "instructions": [
+                {"index": idx, "line": pm.line_numbers[idx], "label": owners[idx],
+                 "text": pm.instructions[idx][1], "count": count}
+                for idx, count in enumerate(self.counts)
+            ],
+            "labels": self.label_counts(),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+
+    def report(self) -> str:
+        pm = self._machine()
+        total = self.steps or 1
+        owners = self._owners()
+        lines = [f"{'стр.':>5} {'метка':<12} {'команда':<16} {'выполнений':>12} {'%':>6}"]
+        for idx, count in sorted(enumerate(self.counts), key=lambda x: -x[1]):
+            lines.append(f"{pm.line_numbers[idx]:>5} {owners[idx] or '':<12} {pm.instructions[idx][1]:<16} "
+                         f"{count:>12} {100 * count / total:>6.1f}")
+        lines.append("")
+        lines.append(f"{'метка':<12} {'шагов':>12} {'%':>6}")
+        for lbl, count in sorted(self.label_counts().items(), key=lambda x: -x[1]):
+            lines.append(f"{lbl:<12} {count:>12} {100 * count / total:>6.1f}")
+        lines.append("")
+        lines.append(f"Всего шагов: {self.steps}; путь головки: {self.head_travel}; "
+                     f"посещено ячеек: {self.cells_touched}; записей: {self.writes}")
+        return '\n'.join(lines)
+
+
+def run_profiled(pm: PostMachine, profile: Profile) -> bool:
+    # Тот же цикл, что и PostMachine.run(), плюс счётчик на инструкцию и границы головки
+    if profile.pm is None or profile.pm.code != pm.code:
+        profile.__init__()
+        profile.pm = pm
+        profile.counts = [0] * len(pm.code)
+    if pm.halted:
+        return True
+    counts = profile.counts
+    code = pm.code
+    n = len(code)
+    tape = pm.tape
+    read = tape.get
+    erase = tape.pop
+    pc, head, steps, limit = pm.pc, pm.head, pm.steps, pm.step_limit
+    lo = hi = head
+    start_steps = steps
+    try:
+        while steps < limit:
+            if not (0 <= pc < n):
+                raise RuntimeError("PC выходит за границы программы")
+            counts[pc] += 1
+            op, target = code[pc]
+            steps += 1
+            if op == OP_IF1:
+                pc = target if read(head, 0) == 1 else pc + 1
+            elif op == OP_IF0:
+                pc = target if read(head, 0) == 0 else pc + 1
+            elif op == OP_RIGHT:
+                head += 1
+                pc += 1
+                if head > hi:
+                    hi = head
+            elif op == OP_LEFT:
+                head -= 1
+                pc += 1
+                if head < lo:
+                    lo = head
+            elif op == OP_GOTO:
+                pc = target
+            elif op == OP_MARK:
+                tape[head] = 1
+                pc += 1
+            elif op == OP_ERASE:
+                erase(head, None)
+                pc += 1
+            else:
+                pm.halted = True
+                break
+    finally:
+        pm.pc, pm.head, pm.steps = pc, head, steps
+        profile.steps += steps - start_steps
+        profile.head_min = lo if profile.head_min is None else min(lo, profile.head_min)
+        profile.head_max = hi if profile.head_max is None else max(hi, profile.head_max)
+    return pm.halted
@@ -0,0 +1,140 @@
+from functools import cached_property
+from typing import Any, Dict, Tuple
+from .machine import PostMachine, tape_str_to_int
+
+# Поля отчёта в порядке вывода to_dict()
+FIELDS = ("input", "input_decimal", "steps", "halted", "left_bound", "right_bound", "tape_full",
+          "left", "right", "tape", "binary", "decimal", "offset", "head", "head_norm")
+
+
+class RunResult:
+    """Результат выполнения в том виде, в каком его показывает вкладка "Запуск".
+
+    Каждое поле вычисляется при первом обращении и запоминается: границы ленты
+    берутся один раз, строка расширенного диапазона строится один раз, а остальные
+    строки получаются из неё срезами. Один объект используют GUI, CLI, пакетный
+    запуск и сервис.
+
+    Границы берутся у ленты: BitTape (--dense) обновляет крайние отметки и число
+    единиц при каждой записи, поэтому span() там O(1). Для ленты-словаря границы
+    при записи не отслеживаются (это замедлило бы каждый MARK/ERASE на ~35%),
+    и span вычисляется одним проходом по ключам при первом обращении.
+    """
+
+    def __init__(self, pm: PostMachine, data: str):
+        self.pm = pm
+        self.input = data
+        self.steps = pm.steps
+        self.halted = pm.halted
+        self.head = pm.head
+
+    @cached_property
+    def input_decimal(self) -> int:
+        return int(self.input, 2)
+
+    @cached_property
+    def span(self) -> Tuple[int, int]:
+        # если лента пустая (нет 1), берём границы исходных данных
+        if not self.pm.tape:
+            return 0, len(self.input) - 1
+        return self.pm.get_tape_span()
+
+    @property
+    def left(self) -> int:
+        return self.span[0]
+
+    @property
+    def right(self) -> int:
+        return self.span[1]
+
+    @property
+    def left_bound(self) -> int:
+        # расширяем границы так, чтобы захватить исходную длину и возможное расширение
+        return min(self.left, 0)
+
+    @property
+    def right_bound(self) -> int:
+        return max(self.right, len(self.input) - 1)
+
+    @cached_property
+    def tape_full(self) -> str:
+        return self.pm.tape_as_str_range(self.left_bound, self.right_bound)
+
+    @cached_property
+    def tape(self) -> str:
+        # "физическая" лента по реальным границам (для отладки) — срез расширенной строки,
+        # если она уже построена; иначе строим только диапазон отметок
+        if "tape_full" not in self.__dict__:
+            return self.pm.tape_as_str_range(self.left, self.right)
+        start = self.left - self.left_bound
+        return self.tape_full[start:start + self.right - self.left + 1]
+
+    @cached_property
+    def binary(self) -> str:
+        # человекочитаемая: убираем только ведущие нули слева, но сохраняем все биты справа;
+        # первая единица стоит на self.left, так что строку не нужно просматривать
+        if not self.pm.tape:
+            return '0'
+        return self.tape_full[self.left - self.left_bound:]
+
+    @cached_property
+    def decimal(self) -> int:
+        return tape_str_to_int(self.binary)
+
+    @property
+    def offset(self) -> int:
+        # Смещённая нормализация: offset = left_bound, позиция головки относительно offset
+        return self.left_bound
+
+    @property
+    def head_norm(self) -> int:
+        return self.head - self.offset
+
+    @cached_property
+    def normalized(self) -> Tuple[str, int, int]:
+        """(отмеченная часть ленты, индекс её первой ячейки, головка относительно него).
+
+        Форма результата пакетного запуска; пустая лента даёт ("0", 0, head).
+        """
+        if not self.pm.tape:
+            return "0", 0, self.head
+        return self.tape, self.left, self.head - self.left
+
+    def __getitem__(self, key: str):
+        if key not in FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {key: getattr(self, key) for key in FIELDS}
+
+
+def build_report(pm: PostMachine, data: str) -> Dict[str, Any]:
+    return RunResult(pm, data).to_dict()
+
+
+def _format_int(value: int) -> str:
+    # Python ограничивает длину десятичного представления очень больших чисел
+    try:
+        return str(value)
+    except ValueError:
+        return f"({value.bit_length()} двоичных разрядов)"
+
+
+def format_report(r) -> str:
+    # r — словарь build_report или RunResult
+    return (
+        "Результат выполнения программы:\n\n"
+        f"Исходные данные: {r['input']} (десятичное: {_format_int(r['input_decimal'])})\n"
+        f"Шагов выполнено: {r['steps']}\n\n"
+        "Лента (физическая, слева-направо) — расширенный диапазон:\n"
+        f"  [{r['left_bound']} .. {r['right_bound']}]: {r['tape_full']}\n\n"
+        "Лента (физическая, где есть 1):\n"
+        f"  [{r['left']} .. {r['right']}]: {r['tape']}\n\n"
+        "Человекочитаемый результат (нормализованная лента):\n"
+        f"  Бинарно: {r['binary']}\n"
+        f"  Десятично: {_format_int(r['decimal'])}\n"
+        f"\nСмещение (offset): {r['offset']}\n"
+        f"Позиция головки (внутренняя): {r['head']}\n"
+        f"Позиция головки (нормализованная): {r['head_norm']}\n"
+    )
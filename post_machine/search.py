@@ -0,0 +1,403 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from bisect import insort
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice, product
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .machine import (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, OP_HALT, JUMP_OPS,
+                      NonTerminationError, PostMachine, Program)
+
+# Примерное число программ в одной части пространства поиска (задание для рабочего процесса)
+DEFAULT_SLICE_SIZE = 20000
+DEFAULT_STEP_LIMIT = 1000
+METRICS = ("steps", "marks")
+CHECKPOINT_VERSION = 2
+# Контрольная точка пишется не чаще одного раза за столько секунд (и всегда при завершении)
+CHECKPOINT_INTERVAL = 30.0
+# Частей в работе на один рабочий процесс
+MAX_IN_FLIGHT = 2
+
+_SIMPLE_OPS = (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_HALT)
+
+
+class Candidate(NamedTuple):
+    steps: int
+    marks: int
+    code: Tuple[Tuple[int, int], ...]
+
+
+class SliceResult(NamedTuple):
+    size: int
+    index: int
+    enumerated: int     # программ в части пространства
+    pruned: int         # отброшено без запуска
+    halted: int
+    unfinished: int     # дошли до лимита шагов
+    nonhalting: int     # доказанно не останавливаются (detect_loops)
+    best: Dict[str, Optional[Candidate]]
+
+
+class Champion(NamedTuple):
+    size: int
+    metric: str
+    value: int
+    steps: int
+    marks: int
+    program: str
+
+
+class SearchReport(NamedTuple):
+    enumerated: int
+    pruned: int
+    halted: int
+    unfinished: int
+    nonhalting: int
+    slices: int         # выполнено в этом запуске (без восстановленных из контрольной точки)
+    seconds: float
+    champions: List[Champion]
+
+
+# --- Пространство программ ---
+def alphabet(size: int) -> List[Tuple[int, int]]:
+    """Все команды программы из size команд: переходы только на её команды (не за конец)."""
+    return [(op, -1) for op in _SIMPLE_OPS] + [(op, t) for op in JUMP_OPS for t in range(size)]
+
+
+def _layout(size: int, slice_size: int) -> Tuple[int, int]:
+    # Части пространства задаются префиксом из первых k команд; возвращает (k, число частей)
+    width = len(alphabet(size))
+    rest = min(size, max(0, int(math.log(max(slice_size, 1), width))))
+    return size - rest, width ** (size - rest)
+
+
+def _prefix(size: int, index: int, k: int) -> Tuple[Tuple[int, int], ...]:
+    letters = alphabet(size)
+    digits = []
+    for _ in range(k):
+        index, d = divmod(index, len(letters))
+        digits.append(letters[d])
+    return tuple(reversed(digits))
+
+
+def _mirror_ok(code: Sequence[Tuple[int, int]]) -> bool:
+    # Зеркальные программы (LEFT <-> RIGHT) на пустой ленте делают столько же шагов и меток:
+    # оставляем ту, где первый по тексту сдвиг — RIGHT
+    for op, _ in code:
+        if op == OP_RIGHT:
+            return True
+        if op == OP_LEFT:
+            return False
+    return True
+
+
+def _well_formed(code: Sequence[Tuple[int, int]]) -> bool:
+    # Весь код достижим с первой команды, выполнение не выходит за конец, есть HALT
+    n = len(code)
+    seen = [False] * n
+    stack = [0]
+    count = 0
+    has_halt = False
+    while stack:
+        pc = stack.pop()
+        if pc >= n:
+            return False
+        if seen[pc]:
+            continue
+        seen[pc] = True
+        count += 1
+        op, target = code[pc]
+        if op == OP_HALT:
+            has_halt = True
+        elif op == OP_GOTO:
+            stack.append(target)
+        elif op == OP_IF1 or op == OP_IF0:
+            stack.append(target)
+            stack.append(pc + 1)
+        else:
+            stack.append(pc + 1)
+    return has_halt and count == n
+
+
+def _canonical(code: Sequence[Tuple[int, int]]) -> bool:
+    """Программа — представитель своего класса изоморфных.
+
+    Метки в разобранном коде уже сведены к индексам команд, поэтому переименование меток
+    не порождает новых программ. Остаётся перестановка цепочек — участков, связанных
+    переходом на следующую команду (цепочка кончается на GOTO или HALT): их можно
+    переставить, исправив цели переходов, и поведение не изменится. Канонической считается
+    программа, в которой цепочки идут в порядке первого упоминания, начиная с первой.
+    """
+    chain_of = []
+    starts = []
+    for pc, (op, _) in enumerate(code):
+        if pc == 0 or code[pc - 1][0] in (OP_GOTO, OP_HALT):
+            starts.append(pc)
+        chain_of.append(len(starts) - 1)
+    order = [0]
+    seen = {0}
+    i = 0
+    while i < len(order):
+        pc = starts[order[i]]
+        while True:
+            op, target = code[pc]
+            if op in JUMP_OPS:
+                chain = chain_of[target]
+                if chain not in seen:
+                    if chain != len(order):
+                        return False
+                    seen.add(chain)
+                    order.append(chain)
+            pc += 1
+            if op == OP_GOTO or op == OP_HALT or pc == len(code):
+                break
+        i += 1
+    return True
+
+
+def candidates(size: int) -> Iterator[Tuple[Tuple[int, int], ...]]:
+    """Все программы из size команд, оставшиеся после отсечений (в порядке перебора)."""
+    gen, _ = _candidates(size, ())
+    return (code for code in gen if _mirror_ok(code) and _well_formed(code) and _canonical(code))
+
+
+def _candidates(size: int, prefix: Tuple[Tuple[int, int], ...]):
+    # Возвращает (итератор программ, число отброшенных без проверки)
+    letters = alphabet(size)
+    rest = size - len(prefix)
+    total = len(letters) ** rest
+    if not _mirror_ok(prefix) or (prefix and rest == 0 and prefix[-1][0] not in (OP_GOTO, OP_HALT)):
+        return iter(()), total
+    if rest == 0:
+        return iter((prefix,)), 0
+    # Последняя команда — HALT или GOTO, иначе выполнение выходит за конец программы
+    last = [c for c in letters if c[0] in (OP_GOTO, OP_HALT)]
+    skipped = (len(letters) - len(last)) * len(letters) ** (rest - 1)
+    gen = (prefix + body + (tail,) for body in product(letters, repeat=rest - 1) for tail in last)
+    return gen, skipped
+
+
+def _better(a: Optional[Candidate], b: Optional[Candidate], metric: str) -> bool:
+    # a лучше b; при равенстве — меньший код, чтобы итог не зависел от порядка частей
+    if a is None:
+        return False
+    if b is None:
+        return True
+    va, vb = getattr(a, metric), getattr(b, metric)
+    return va > vb or (va == vb and a.code < b.code)
+
+
+def run_slice(size: int, index: int, step_limit: int = DEFAULT_STEP_LIMIT,
+              slice_size: int = DEFAULT_SLICE_SIZE, detect_loops: bool = False) -> SliceResult:
+    """Перебирает одну часть пространства программ из size команд на пустой ленте."""
+    k, _ = _layout(size, slice_size)
+    gen, pruned = _candidates(size, _prefix(size, index, k))
+    enumerated = len(alphabet(size)) ** (size - k)
+    halted = unfinished = nonhalting = 0
+    best: Dict[str, Optional[Candidate]] = {m: None for m in METRICS}
+    for code in gen:
+        if not (_mirror_ok(code) and _well_formed(code) and _canonical(code)):
+            pruned += 1
+            continue
+        pm = PostMachine(Program.from_code(code), step_limit=step_limit)
+        try:
+            pm.run(detect_loops=detect_loops)
+        except NonTerminationError:
+            nonhalting += 1
+            continue
+        if not pm.halted:
+            unfinished += 1
+            continue
+        halted += 1
+        found = Candidate(pm.steps, len(pm.tape), code)
+        for m in METRICS:
+            if _better(found, best[m], m):
+                best[m] = found
+    return SliceResult(size, index, enumerated, pruned, halted, unfinished, nonhalting, best)
+
+
+# --- Контрольные точки ---
+def _empty_state(params: dict) -> dict:
+    return {"version": CHECKPOINT_VERSION, "params": params, "done": {},
+            "stats": {"enumerated": 0, "pruned": 0, "halted": 0, "unfinished": 0, "nonhalting": 0},
+            "best": {}}
+
+
+def _mark_done(state: dict, size: int, index: int):
+    # Выполненные части размера size: все индексы меньше upto и отдельные индексы extra.
+    # Части завершаются почти по порядку, поэтому extra не длиннее окна заданий в работе
+    done = state["done"].setdefault(str(size), {"upto": 0, "extra": []})
+    if index != done["upto"]:
+        insort(done["extra"], index)
+        return
+    upto, extra = index + 1, done["extra"]
+    while extra and extra[0] == upto:
+        extra.pop(0)
+        upto += 1
+    done["upto"] = upto
+
+
+def _pending(state: dict, min_size: int, max_size: int, slice_size: int) -> Iterator[Tuple[int, int]]:
+    # Невыполненные части по порядку; список всех частей не строится (для size 8 их сотни миллионов)
+    for size in range(min_size, max_size + 1):
+        done = state["done"].get(str(size), {"upto": 0, "extra": []})
+        extra = set(done["extra"])
+        for i in range(done["upto"], _layout(size, slice_size)[1]):
+            if i not in extra:
+                yield size, i
+
+
+def load_checkpoint(path: str, params: dict) -> dict:
+    """Состояние поиска из файла; отсутствующий файл — новый поиск, другие параметры — ValueError."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return _empty_state(params)
+    if state.get("version") not in (1, CHECKPOINT_VERSION) or state.get("params") != params:
+        raise ValueError("Контрольная точка создана с другими параметрами поиска")
+    if state["version"] == 1:
+        # Версия 1 хранила полные списки выполненных частей
+        done, state["done"] = state["done"], {}
+        for size, indices in done.items():
+            for i in sorted(indices):
+                _mark_done(state, int(size), i)
+        state["version"] = CHECKPOINT_VERSION
+    return state
+
+
+def save_checkpoint(path: str, state: dict):
+    # Запись через временный файл: прерванный процесс не оставляет испорченную контрольную точку
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def _merge(state: dict, res: SliceResult):
+    _mark_done(state, res.size, res.index)
+    stats = state["stats"]
+    for field in ("enumerated", "pruned", "halted", "unfinished", "nonhalting"):
+        stats[field] += getattr(res, field)
+    best = state["best"].setdefault(str(res.size), {})
+    for m in METRICS:
+        cur = best.get(m)
+        cur = Candidate(cur[0], cur[1], tuple(map(tuple, cur[2]))) if cur else None
+        if _better(res.best[m], cur, m):
+            best[m] = list(res.best[m])
+
+
+def champions(state: dict) -> List[Champion]:
+    result = []
+    for size, best in sorted(state["best"].items(), key=lambda item: int(item[0])):
+        for m in METRICS:
+            if m in best:
+                steps, marks, code = best[m]
+                program = Program.from_code([tuple(c) for c in code]).text
+                result.append(Champion(int(size), m, steps if m == "steps" else marks, steps, marks, program))
+    return result
+
+
+def search(max_size: int, step_limit: int = DEFAULT_STEP_LIMIT, workers: Optional[int] = None,
+           slice_size: int = DEFAULT_SLICE_SIZE, detect_loops: bool = False, checkpoint: Optional[str] = None,
+           min_size: int = 1, record: bool = False, progress=None) -> SearchReport:
+    """Перебирает все программы из min_size..max_size команд и находит рекордные по шагам и меткам.
+
+    Пространство делится на части по префиксу программы; части выполняются в пуле процессов
+    (workers=1 — в текущем процессе), в работе не больше MAX_IN_FLIGHT частей на процесс.
+    С checkpoint состояние пишется в файл не чаще раза в CHECKPOINT_INTERVAL секунд и при
+    завершении или прерывании; повторный запуск с теми же параметрами продолжает с места
+    остановки. record=True
+    сохраняет рекорды в таблицу search_records базы данных.
+    """
+    if min_size < 1 or max_size < min_size:
+        raise ValueError("Размер программ должен быть не меньше 1")
+    params = {"min_size": min_size, "max_size": max_size, "step_limit": step_limit,
+              "slice_size": slice_size, "detect_loops": detect_loops}
+    state = load_checkpoint(checkpoint, params) if checkpoint else _empty_state(params)
+    tasks = _pending(state, min_size, max_size, slice_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    start = time.perf_counter()
+    finished = 0
+    saved = time.monotonic()
+
+    def finish(res: SliceResult):
+        nonlocal finished, saved
+        _merge(state, res)
+        finished += 1
+        if checkpoint and time.monotonic() - saved >= CHECKPOINT_INTERVAL:
+            save_checkpoint(checkpoint, state)
+            saved = time.monotonic()
+        if progress is not None:
+            progress(res)
+
+    try:
+        if workers <= 1:
+            for size, i in tasks:
+                finish(run_slice(size, i, step_limit, slice_size, detect_loops))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = set()
+                for size, i in islice(tasks, MAX_IN_FLIGHT * workers):
+                    pending.add(pool.submit(run_slice, size, i, step_limit, slice_size, detect_loops))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for size, i in islice(tasks, len(done)):
+                        pending.add(pool.submit(run_slice, size, i, step_limit, slice_size, detect_loops))
+                    for fut in done:
+                        finish(fut.result())
+    finally:
+        # Выполненные части не теряются и при прерывании (KeyboardInterrupt, ошибка в progress)
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+    found = champions(state)
+    if record:
+        from . import db
+        db.save_search_records(found, step_limit)
+    stats = state["stats"]
+    return SearchReport(stats["enumerated"], stats["pruned"], stats["halted"], stats["unfinished"],
+                        stats["nonhalting"], finished, time.perf_counter() - start, found)
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m post_machine.search",
+                                     description="Перебор всех программ машины Поста до заданного размера "
+                                                 "(поиск «усердных бобров» на пустой ленте)")
+    parser.add_argument("-n", "--max-size", type=int, required=True, help="наибольшее число команд")
+    parser.add_argument("--min-size", type=int, default=1)
+    parser.add_argument("-l", "--step-limit", type=int, default=DEFAULT_STEP_LIMIT)
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("-s", "--slice-size", type=int, default=DEFAULT_SLICE_SIZE,
+                        help="программ в одной части пространства")
+    parser.add_argument("--detect-loops", action="store_true", help="отличать зацикливание от лимита шагов")
+    parser.add_argument("-c", "--checkpoint", help="файл контрольной точки для продолжения поиска")
+    parser.add_argument("--db", help="сохранить рекорды в базу данных SQLite (путь к файлу)")
+    parser.add_argument("--json", action="store_true", help="вывод в формате JSON")
+    args = parser.parse_args(argv)
+    if args.db:
+        from . import db
+        db.DB_NAME = args.db
+        db.init_db()
+    report = search(args.max_size, args.step_limit, args.workers, args.slice_size, args.detect_loops,
+                    args.checkpoint, args.min_size, record=bool(args.db))
+    if args.json:
+        data = report._asdict()
+        data["champions"] = [c._asdict() for c in report.champions]
+        print(json.dumps(data, ensure_ascii=False))
+        return 0
+    print(f"Программ: {report.enumerated}, отброшено: {report.pruned}, остановились: {report.halted}, "
+          f"до лимита: {report.unfinished}, зациклились: {report.nonhalting} ({report.seconds:.1f} с)")
+    for c in report.champions:
+        title = "шагов" if c.metric == "steps" else "меток"
+        print(f"\n{c.size} команд, больше всего {title}: {c.value} (шагов {c.steps}, меток {c.marks})")
+        print(c.program, end="")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
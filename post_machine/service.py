@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import db
+from .machine import PostMachine, tape_from_str
+from .report import build_report
+from .snapshot import Snapshot, restore, snapshot
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+# Шагов за одну отправку машины в пул; между отрезками выполняются другие задания
+SLICE = 200000
+# Одновременно выполняемых заданий одного клиента (адреса), по всем его соединениям
+PER_CLIENT = 2
+# Заданий в очереди и в работе на весь сервис; сверх этого задания отклоняются сразу
+MAX_PENDING = 1000
+MAX_STEP_LIMIT = 10**9
+# Максимальная длина строки запроса
+MAX_LINE = 1 << 24
+
+
+# Типы полей задания; поля не из этого списка не проверяются
+_JOB_FIELDS = {"id": (str, int), "program": str, "program_name": str, "input": str, "input_name": str,
+               "step_limit": int, "fast": bool, "jit": bool, "cancel": bool}
+
+
+def _check_job(job: Any):
+    # Форма запроса проверяется до того, как он попадёт в очередь или в словарь заданий
+    if not isinstance(job, dict):
+        raise ValueError("Задание должно быть объектом JSON")
+    for key, types in _JOB_FIELDS.items():
+        value = job.get(key)
+        if value is None:
+            continue
+        if not isinstance(value, types) or (types is int and isinstance(value, bool)):
+            raise ValueError(f"Недопустимое значение поля {key!r}: {value!r}")
+
+
+def _run_slice(snap: Snapshot, n: int, fast: bool, jit: bool) -> Snapshot:
+    # Выполняется в рабочем процессе. Туда и обратно передаётся только состояние машины
+    # с лентой по биту на ячейку; программа разбирается один раз на процесс (parse_program кеширует)
+    pm = restore(snap, step_limit=min(snap.step_limit, snap.steps + n))
+    pm.run(fast=fast, jit=jit)
+    pm.step_limit = snap.step_limit
+    return snapshot(pm)
+
+
+class JobService:
+    """Очередь заданий машины Поста поверх asyncio и пула процессов.
+
+    Задание — словарь: "program" (текст) или "program_name" (имя в базе), "input" или
+    "input_name", необязательные "step_limit", "fast", "jit" и "id". Выполнение идёт
+    отрезками по slice шагов, поэтому длинные задания не задерживают короткие,
+    а после каждого отрезка вызывается progress(steps, head). Не более per_client
+    заданий одного клиента выполняются одновременно; клиент определяется адресом,
+    так что несколько соединений с одного адреса делят общий лимит.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, workers: Optional[int] = None,
+                 per_client: int = PER_CLIENT, max_pending: int = MAX_PENDING, slice: int = SLICE,
+                 max_step_limit: int = MAX_STEP_LIMIT):
+        self._own_executor = executor is None
+        self.executor = executor if executor is not None else ProcessPoolExecutor(max_workers=workers)
+        self.per_client = per_client
+        self.max_pending = max_pending
+        self.slice = slice
+        self.max_step_limit = max_step_limit
+        self.pending = 0
+        # адрес клиента -> [семафор, число открытых соединений]
+        self._clients: Dict[Any, List[Any]] = {}
+
+    async def _resolve(self, job: Dict[str, Any]):
+        # Обращения к базе выполняются в потоке, чтобы не блокировать цикл событий
+        loop = asyncio.get_running_loop()
+        if "program_name" in job:
+            code = await loop.run_in_executor(None, db.load_program, job["program_name"])
+        else:
+            code = job.get("program")
+        if "input_name" in job:
+            data = await loop.run_in_executor(None, db.load_input, job["input_name"])
+        else:
+            data = job.get("input")
+        if not isinstance(code, str):
+            raise ValueError("Не задана программа")
+        if not isinstance(data, str) or data == "" or any(ch not in "01" for ch in data):
+            raise ValueError("Входные данные должны быть двоичной строкой (например, 1011).")
+        return code, data
+
+    async def run_job(self, job: Dict[str, Any], progress: Optional[Callable[[int, int], None]] = None,
+                      limiter: Optional[asyncio.Semaphore] = None) -> Dict[str, Any]:
+        """Выполняет задание и возвращает отчёт build_report; ошибки — ValueError/RuntimeError."""
+        if self.pending >= self.max_pending:
+            raise RuntimeError("Очередь заданий переполнена, повторите позже")
+        self.pending += 1
+        try:
+            code, data = await self._resolve(job)
+            step_limit = min(int(job.get("step_limit", 10000)), self.max_step_limit)
+            pm = PostMachine(code, tape=tape_from_str(data), head=len(data) - 1, step_limit=step_limit)
+            fast, jit = bool(job.get("fast")), bool(job.get("jit"))
+            if fast and jit:
+                raise ValueError("Нельзя одновременно задать fast и jit")
+            loop = asyncio.get_running_loop()
+            if limiter is None:
+                limiter = asyncio.Semaphore(1)
+            snap = snapshot(pm)
+            async with limiter:
+                while not snap.halted and snap.steps < step_limit:
+                    snap = await loop.run_in_executor(self.executor, _run_slice, snap, self.slice, fast, jit)
+                    if progress is not None:
+                        progress(snap.steps, snap.head)
+            return build_report(restore(snap), data)
+        finally:
+            self.pending -= 1
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Протокол: по строке JSON на задание; ответы — строки JSON с полем "event"
+        peer = writer.get_extra_info("peername")
+        client = peer[0] if isinstance(peer, tuple) else peer
+        entry = self._clients.setdefault(client, [asyncio.Semaphore(self.per_client), 0])
+        entry[1] += 1
+        limiter = entry[0]
+        tasks: Dict[Any, asyncio.Task] = {}
+
+        def send(message: Dict[str, Any]):
+            if not writer.is_closing():
+                writer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+
+        async def serve(job_id, job):
+            try:
+                result = await self.run_job(job, lambda steps, head: send(
+                    {"id": job_id, "event": "progress", "steps": steps, "head": head}), limiter)
+                send({"id": job_id, "event": "done", "result": result})
+            except asyncio.CancelledError:
+                send({"id": job_id, "event": "cancelled"})
+            except Exception as e:
+                # Любая ошибка задания сообщается клиенту и не закрывает соединение
+                send({"id": job_id, "event": "error", "message": str(e) or type(e).__name__})
+            finally:
+                tasks.pop(job_id, None)
+            try:
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+        try:
+            counter = 0
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    job = json.loads(line)
+                    _check_job(job)
+                except ValueError as e:
+                    send({"event": "error", "message": f"Некорректный запрос: {e}"})
+                    continue
+                counter += 1
+                job_id = job.get("id", counter)
+                if job.get("cancel"):
+                    if job_id in tasks:
+                        tasks[job_id].cancel()
+                    continue
+                if job_id in tasks:
+                    send({"id": job_id, "event": "error", "message": "Задание с таким id уже выполняется"})
+                    continue
+                tasks[job_id] = asyncio.create_task(serve(job_id, job))
+            if tasks:
+                await asyncio.gather(*tasks.values(), return_exceptions=True)
+        finally:
+            # Клиент отключился: незавершённые задания больше некому получать
+            for task in list(tasks.values()):
+                task.cancel()
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._clients[client]
+            writer.close()
+
+    async def start(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> asyncio.AbstractServer:
+        return await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+
+    def close(self):
+        if self._own_executor:
+            self.executor.shutdown(cancel_futures=True)
+
+
+async def submit(job: Dict[str, Any], host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, Any]:
+    """Отправляет одно задание сервису и ждёт результата (отчёт build_report)."""
+    reader, writer = await asyncio.open_connection(host, port, limit=MAX_LINE)
+    try:
+        writer.write(json.dumps(job, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise RuntimeError("Сервис закрыл соединение")
+            message = json.loads(line)
+            event = message.get("event")
+            if event == "progress":
+                if progress is not None:
+                    progress(message["steps"], message["head"])
+            elif event == "done":
+                return message["result"]
+            else:
+                raise RuntimeError(message.get("message", "Задание отменено"))
+    finally:
+        writer.close()
+
+
+async def serve_forever(host: str, port: int, **kwargs):
+    service = JobService(**kwargs)
+    server = await service.start(host, port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m post_machine.service",
+                                     description="Сервис выполнения заданий машины Поста (JSON по строкам через TCP)")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db", help="путь к файлу базы данных SQLite")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="число процессов (по умолчанию — число ядер)")
+    parser.add_argument("--per-client", type=int, default=PER_CLIENT, help="одновременных заданий на клиента (адрес)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="заданий в очереди на весь сервис")
+    parser.add_argument("--max-step-limit", type=int, default=MAX_STEP_LIMIT)
+    args = parser.parse_args(argv)
+    if args.db:
+        db.DB_NAME = args.db
+    db.init_db()
+    print(f"Сервис слушает {args.host}:{args.port} (процесс {os.getpid()})", file=sys.stderr)
+    try:
+        asyncio.run(serve_forever(args.host, args.port, workers=args.workers, per_client=args.per_client,
+                                  max_pending=args.max_pending, max_step_limit=args.max_step_limit))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+import os
+import struct
+import zlib
+from typing import Callable, NamedTuple, Optional
+
+from . import db
+from .machine import PostMachine
+from .tape import pack_tape, unpack_tape
+
+MAGIC = b'PMSNAP1\0'
+# pc, head, steps, step_limit, halted, tape_left, tape_len, длина программы, длина сжатой ленты
+HEADER = struct.Struct('<qqqqBqqqq')
+
+
+class Snapshot(NamedTuple):
+    program: str
+    pc: int
+    head: int
+    steps: int
+    step_limit: int
+    halted: bool
+    tape_left: int
+    tape_len: int
+    tape_bits: bytes   # отмеченная область ленты, по биту на ячейку
+
+    def to_bytes(self) -> bytes:
+        program = self.program.encode('utf-8')
+        tape = zlib.compress(self.tape_bits)
+        return MAGIC + HEADER.pack(self.pc, self.head, self.steps, self.step_limit, int(self.halted),
+                                   self.tape_left, self.tape_len, len(program), len(tape)) + program + tape
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'Snapshot':
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Данные не являются снимком машины Поста")
+        pos = len(MAGIC)
+        pc, head, steps, step_limit, halted, left, length, plen, tlen = HEADER.unpack_from(data, pos)
+        pos += HEADER.size
+        program = data[pos:pos + plen].decode('utf-8')
+        tape = zlib.decompress(data[pos + plen:pos + plen + tlen])
+        return cls(program, pc, head, steps, step_limit, bool(halted), left, length, tape)
+
+
+def snapshot(pm: PostMachine) -> Snapshot:
+    left, length, bits = pack_tape(pm.tape)
+    # Разобранных строк программы достаточно, чтобы восстановить её без исходного текста
+    return Snapshot('\n'.join(pm.lines), pm.pc, pm.head, pm.steps, pm.step_limit, pm.halted, left, length, bits)
+
+
+def restore(snap: Snapshot, step_limit: Optional[int] = None, dense: bool = False) -> PostMachine:
+    pm = PostMachine(snap.program, tape=unpack_tape(snap.tape_left, snap.tape_len, snap.tape_bits, dense),
+                     head=snap.head, step_limit=snap.step_limit if step_limit is None else step_limit)
+    pm.pc, pm.steps, pm.halted = snap.pc, snap.steps, snap.halted
+    return pm
+
+
+def save_file(snap: Snapshot, path: str):
+    # Запись через временный файл, чтобы прерывание не оставило повреждённый снимок
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(snap.to_bytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_file(path: str) -> Snapshot:
+    with open(path, 'rb') as f:
+        return Snapshot.from_bytes(f.read())
+
+
+def save_db(snap: Snapshot, name: str):
+    db.save_snapshot(name, db.program_hash(snap.program), snap.steps, snap.to_bytes())
+
+
+def load_db(name: str) -> Snapshot:
+    return Snapshot.from_bytes(db.load_snapshot(name))
+
+
+def run_with_checkpoints(pm: PostMachine, every: int,
+                         save: Callable[[Snapshot], None], **run_kwargs) -> bool:
+    """Выполняет машину до остановки или step_limit, сохраняя снимок каждые every шагов и в конце."""
+    limit = pm.step_limit
+    try:
+        while not pm.halted and pm.steps < limit:
+            pm.step_limit = min(limit, pm.steps + every)
+            pm.run(**run_kwargs)
+            pm.step_limit = limit
+            save(snapshot(pm))
+    finally:
+        pm.step_limit = limit
+    return pm.halted
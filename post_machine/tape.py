@@ -0,0 +1,593 @@
+import mmap
+import re
+import struct
+from types import MappingProxyType
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+# Для каждого байта — 8 ячеек ленты, младший бит соответствует левой ячейке
+_BYTE_STR = [''.join('1' if (b >> i) & 1 else '0' for i in range(8)) for b in range(256)]
+_NONZERO = re.compile(rb'[^\x00]')
+_NONFULL = re.compile(rb'[^\xff]')
+_MIN_BYTES = 16
+# Перестановка битов в байте (для упаковки со старшим битом первым, как numpy.packbits)
+_REVERSE_BITS = bytes(int(format(b, '08b')[::-1], 2) for b in range(256))
+
+
+def _popcount(data) -> int:
+    value = int.from_bytes(data, 'little')
+    return value.bit_count() if hasattr(value, 'bit_count') else bin(value).count('1')
+
+
+class BitTape:
+    """Плотная лента: одна ячейка — один бит в растущем в обе стороны bytearray.
+
+    Поддерживает тот же интерфейс, что и словарь {позиция: 1}, который использует
+    PostMachine (get/pop/__setitem__/__contains__/len/keys), поэтому её можно
+    передавать в машину вместо dict. Границы отмеченной области и число единиц
+    поддерживаются инкрементально.
+    """
+
+    __slots__ = ('_bits', '_origin', '_count', '_left', '_right')
+
+    def __init__(self, cells: Optional[Dict[int,int]] = None):
+        self._bits = bytearray(_MIN_BYTES)
+        self._origin = -(_MIN_BYTES * 4)
+        self._count = 0
+        self._left = 0
+        self._right = -1
+        if cells:
+            for pos, val in cells.items():
+                if val:
+                    self[pos] = 1
+
+    @classmethod
+    def from_str(cls, s: str, left_index: int = 0) -> 'BitTape':
+        t = cls()
+        ones = s.translate(_TO_BITS) if s else ''
+        first = ones.find('1')
+        if first == -1:
+            return t
+        last = ones.rfind('1')
+        nbytes = (len(ones) + 7) // 8
+        # Разворот строки даёт little-endian число, у которого бит i — это s[i]
+        value = int(ones[::-1], 2)
+        t._bits = bytearray(value.to_bytes(nbytes, 'little'))
+        t._origin = left_index
+        t._count = ones.count('1')
+        t._left = left_index + first
+        t._right = left_index + last
+        return t
+
+    @classmethod
+    def from_bytes(cls, data, nbits: Optional[int] = None, left_index: int = 0,
+                   bitorder: str = 'little') -> 'BitTape':
+        """Лента из упакованных битов (bytes, memoryview, mmap): ячейка i — бит i.
+
+        bitorder='little' — младший бит байта соответствует левой ячейке (формат BitTape),
+        'big' — старший (numpy.packbits по умолчанию). Данные копируются один раз.
+        """
+        t = cls()
+        bits = bytearray(data)
+        if bitorder == 'big':
+            bits = bytearray(bits.translate(_REVERSE_BITS))
+        if nbits is not None:
+            del bits[(nbits + 7) // 8:]
+            if nbits & 7 and bits:
+                bits[-1] &= (1 << (nbits & 7)) - 1
+        m = _NONZERO.search(bits)
+        if m is None:
+            return t
+        t._bits = bits
+        t._origin = left_index
+        t._count = _popcount(bits)
+        first, last = m.start(), len(bits.rstrip(b'\x00')) - 1
+        t._left = left_index + (first << 3) + ((bits[first] & -bits[first]).bit_length() - 1)
+        t._right = left_index + (last << 3) + bits[last].bit_length() - 1
+        return t
+
+    def to_bytes(self, left: int, right: int) -> bytes:
+        # Упакованные биты диапазона [left, right] (младший бит — левая ячейка)
+        if left > right:
+            return b''
+        s = self.as_str_range(left, right)
+        return int(s[::-1], 2).to_bytes((len(s) + 7) // 8, 'little')
+
+    # --- интерфейс словаря ---
+    def get(self, pos: int, default: int = 0) -> int:
+        idx = pos - self._origin
+        if idx < 0 or idx >= len(self._bits) << 3:
+            return default
+        if (self._bits[idx >> 3] >> (idx & 7)) & 1:
+            return 1
+        return default
+
+    def __getitem__(self, pos: int) -> int:
+        if not self.get(pos, 0):
+            raise KeyError(pos)
+        return 1
+
+    def __setitem__(self, pos: int, val: int):
+        if not val:
+            self.pop(pos, None)
+            return
+        idx = pos - self._origin
+        if idx < 0 or idx >= len(self._bits) << 3:
+            self._grow(pos)
+            idx = pos - self._origin
+        mask = 1 << (idx & 7)
+        byte = self._bits[idx >> 3]
+        if byte & mask:
+            return
+        self._bits[idx >> 3] = byte | mask
+        if self._count == 0:
+            self._left = self._right = pos
+        elif pos < self._left:
+            self._left = pos
+        elif pos > self._right:
+            self._right = pos
+        self._count += 1
+
+    def pop(self, pos: int, default=None):
+        idx = pos - self._origin
+        if idx < 0 or idx >= len(self._bits) << 3:
+            return default
+        mask = 1 << (idx & 7)
+        byte = self._bits[idx >> 3]
+        if not byte & mask:
+            return default
+        self._bits[idx >> 3] = byte & ~mask
+        self._count -= 1
+        if self._count == 0:
+            self._left, self._right = 0, -1
+        elif pos == self._left:
+            self._left = self.find(pos + 1, 1, 1)
+        elif pos == self._right:
+            self._right = self.find(pos - 1, 1, -1)
+        return 1
+
+    def __delitem__(self, pos: int):
+        if self.pop(pos, None) is None:
+            raise KeyError(pos)
+
+    def __contains__(self, pos) -> bool:
+        return self.get(pos, 0) == 1
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __iter__(self) -> Iterator[int]:
+        return self.keys()
+
+    def keys(self) -> Iterator[int]:
+        if not self._count:
+            return
+        pos = self._left
+        while pos is not None and pos <= self._right:
+            yield pos
+            pos = self.find(pos + 1, 1, 1)
+
+    def values(self) -> Iterator[int]:
+        return (1 for _ in self.keys())
+
+    def items(self) -> Iterator[Tuple[int,int]]:
+        return ((pos, 1) for pos in self.keys())
+
+    def copy(self) -> 'BitTape':
+        t = BitTape.__new__(BitTape)
+        t._bits = bytearray(self._bits)
+        t._origin, t._count, t._left, t._right = self._origin, self._count, self._left, self._right
+        return t
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, BitTape):
+            return self._count == other._count and self.span() == other.span() and \
+                self.as_str_range(*self.span()) == other.as_str_range(*other.span())
+        if isinstance(other, dict):
+            return dict(self.items()) == {k: v for k, v in other.items() if v}
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"BitTape({dict(self.items())!r})" if self._count <= 32 else f"BitTape(<{self._count} marks>)"
+
+    # --- операции над диапазонами ---
+    def span(self) -> Tuple[int,int]:
+        if not self._count:
+            return (0, 0)
+        return (self._left, self._right)
+
+    def as_str_range(self, left: int, right: int) -> str:
+        if left > right:
+            return ""
+        lo = self._origin
+        hi = lo + (len(self._bits) << 3) - 1
+        a, b = max(left, lo), min(right, hi)
+        if a > b:
+            return '0' * (right - left + 1)
+        first, last = (a - lo) >> 3, (b - lo) >> 3
+        body = ''.join([_BYTE_STR[x] for x in self._bits[first:last + 1]])
+        start = (a - lo) - (first << 3)
+        body = body[start:start + (b - a + 1)]
+        return '0' * (a - left) + body + '0' * (right - b)
+
+    def find(self, pos: int, value: int, step: int, limit: Optional[int] = None) -> Optional[int]:
+        """Ближайшая к pos (включительно) ячейка со значением value в направлении step (±1).
+
+        limit ограничивает число просмотренных ячеек; None — если ячейка не найдена.
+        """
+        bits = self._bits
+        lo = self._origin
+        size = len(bits) << 3
+        idx = pos - lo
+        stop = None if limit is None else idx + step * (limit - 1)
+        if step > 0:
+            if idx >= size:
+                res = idx if value == 0 else None
+            else:
+                if idx < 0:
+                    if value == 0:
+                        return pos if limit is None or limit > 0 else None
+                    idx = 0
+                res = self._find_right(idx, value)
+            if res is None or (stop is not None and res > stop):
+                return None
+        else:
+            if idx < 0:
+                res = idx if value == 0 else None
+            else:
+                if idx >= size:
+                    if value == 0:
+                        return pos if limit is None or limit > 0 else None
+                    idx = size - 1
+                res = self._find_left(idx, value)
+            if res is None or (stop is not None and res < stop):
+                return None
+        return lo + res
+
+    def _find_right(self, idx: int, value: int) -> Optional[int]:
+        bits = self._bits
+        size = len(bits) << 3
+        # дочитываем текущий байт побитно
+        while idx < size and idx & 7:
+            if ((bits[idx >> 3] >> (idx & 7)) & 1) == value:
+                return idx
+            idx += 1
+        if idx >= size:
+            return idx if value == 0 else None
+        m = (_NONZERO if value else _NONFULL).search(bits, idx >> 3)
+        if m is None:
+            return size if value == 0 else None
+        i = m.start()
+        byte = bits[i] if value else ~bits[i] & 0xFF
+        return (i << 3) + ((byte & -byte).bit_length() - 1)
+
+    def _find_left(self, idx: int, value: int) -> Optional[int]:
+        bits = self._bits
+        while idx >= 0 and (idx & 7) != 7:
+            if ((bits[idx >> 3] >> (idx & 7)) & 1) == value:
+                return idx
+            idx -= 1
+        if idx < 0:
+            return idx if value == 0 else None
+        skip = 0 if value else 0xFF
+        i = idx >> 3
+        chunk = 64
+        # сканируем влево кусками растущего размера, чтобы не копировать весь буфер
+        while i >= 0:
+            a = max(0, i - chunk + 1)
+            seg = bits[a:i + 1].rstrip(bytes((skip,)))
+            if seg:
+                j = a + len(seg) - 1
+                byte = bits[j] if value else ~bits[j] & 0xFF
+                return (j << 3) + byte.bit_length() - 1
+            i = a - 1
+            chunk <<= 1
+        return -1 if value == 0 else None
+
+    def _grow(self, pos: int):
+        idx = pos - self._origin
+        size = len(self._bits)
+        if idx < 0:
+            need = (-idx + 7) >> 3
+            extra = max(need, size)
+            self._bits[0:0] = bytes(extra)
+            self._origin -= extra << 3
+        else:
+            need = (idx >> 3) + 1 - size
+            self._bits.extend(bytes(max(need, size)))
+
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+_TO_BITS = {ord(c): '0' for c in map(chr, range(128)) if c != '1'}
+
+
+# Сколько слоёв копирования при записи допускается до слияния нижних слоёв в один словарь
+MAX_COW_DEPTH = 8
+
+
+class CowTape:
+    """Лента с копированием при записи поверх общей неизменяемой ленты base.
+
+    Изменённые ячейки хранятся в собственном словаре (0 — стёртая ячейка base),
+    поэтому ответвлённая машина занимает память только под отличающиеся ячейки.
+    base больше не должна изменяться: её разделяют все ответвления. fork_tape поэтому
+    передаёт сюда только ленты только для чтения (MappingProxyType или CowTape).
+    """
+    __slots__ = ('_base', '_over', '_count', '_depth')
+
+    def __init__(self, base=None):
+        if base is None:
+            base = {}
+        depth = base._depth + 1 if isinstance(base, CowTape) else 1
+        if depth > MAX_COW_DEPTH:
+            base, depth = MappingProxyType(dict(base.items())), 1
+        self._base = base
+        self._over: Dict[int, int] = {}
+        self._count = len(base)
+        self._depth = depth
+
+    def get(self, pos: int, default=None):
+        val = self._over.get(pos)
+        if val is None:
+            return self._base.get(pos, default)
+        return val if val else default
+
+    def __getitem__(self, pos: int) -> int:
+        val = self.get(pos)
+        if val is None:
+            raise KeyError(pos)
+        return val
+
+    def __setitem__(self, pos: int, value: int):
+        if not value:
+            self.pop(pos, None)
+            return
+        was = self.get(pos, 0)
+        self._over[pos] = 1
+        if not was:
+            self._count += 1
+
+    def pop(self, pos: int, default=None):
+        val = self.get(pos)
+        if val is None:
+            return default
+        if pos in self._base:
+            self._over[pos] = 0
+        else:
+            del self._over[pos]
+        self._count -= 1
+        return val
+
+    def __contains__(self, pos: int) -> bool:
+        return self.get(pos) is not None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __bool__(self) -> bool:
+        return self._count > 0
+
+    def __iter__(self) -> Iterator[int]:
+        return self.keys()
+
+    def keys(self) -> Iterator[int]:
+        over = self._over
+        for pos in self._base.keys():
+            if over.get(pos, 1):
+                yield pos
+        for pos, val in over.items():
+            if val and pos not in self._base:
+                yield pos
+
+    def values(self) -> Iterator[int]:
+        return (1 for _ in self.keys())
+
+    def items(self) -> Iterator[Tuple[int,int]]:
+        return ((pos, 1) for pos in self.keys())
+
+    def copy(self) -> Dict[int,int]:
+        return dict(self.items())
+
+    @property
+    def divergent(self) -> int:
+        # Число ячеек, хранимых отдельно от base
+        return len(self._over)
+
+    def __eq__(self, other) -> bool:
+        if hasattr(other, 'items'):
+            return dict(self.items()) == {k: v for k, v in other.items() if v}
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CowTape({dict(self.items())!r})" if self._count <= 32 else f"CowTape(<{self._count} marks>)"
+
+    def __reduce__(self):
+        # MappingProxyType не сериализуется: передаём отмеченные ячейки одним словарём
+        return _cow_from_cells, (self.copy(),)
+
+
+def _cow_from_cells(cells: Dict[int,int]) -> 'CowTape':
+    return CowTape(MappingProxyType(cells))
+
+
+def fork_tape(tape) -> Tuple[Any, Any]:
+    # Ленты для исходной машины и ответвления.
+    # Битовая лента копируется целиком (копия bytearray, 1 бит на ячейку, O(n)): обе машины
+    # сохраняют плотное представление с O(1) span и быстрым поиском, а исходная лента —
+    # свою идентичность. Остальные ленты становятся общей основой двух CowTape; пустой
+    # слой не добавляется. Обычный словарь мог остаться у вызывающего (tape=t), поэтому
+    # основой становится его копия только для чтения: запись через прежнюю ссылку не меняет
+    # ни одну из машин. Копия делается один раз, последующие ответвления — O(1), а запись
+    # в ставшую основой CowTape вызывает TypeError.
+    if isinstance(tape, BitTape):
+        return tape, tape.copy()
+    if isinstance(tape, CowTape):
+        if not tape._over:
+            tape = tape._base
+        else:
+            # Прежняя лента становится основой: запись в неё через старую ссылку — TypeError
+            tape._over = MappingProxyType(tape._over)
+    else:
+        tape = MappingProxyType(dict(tape.items()))
+    return CowTape(tape), CowTape(tape)
+
+
+def tape_span(tape) -> Tuple[int,int]:
+    if isinstance(tape, BitTape):
+        return tape.span()
+    if not tape:
+        return (0, 0)
+    return (min(tape.keys()), max(tape.keys()))
+
+
+def tape_range_str(tape, left: int, right: int) -> str:
+    if left > right:
+        return ""
+    if isinstance(tape, BitTape):
+        return tape.as_str_range(left, right)
+    n = right - left + 1
+    if len(tape) < n:
+        # Разреженная лента: заполняем строку нулей по отмеченным ячейкам, а не опрашиваем каждую
+        buf = bytearray(b'0') * n
+        for pos, val in tape.items():
+            if left <= pos <= right:
+                buf[pos - left] = 48 + val
+        return buf.decode('ascii')
+    return ''.join(str(tape.get(i, 0)) for i in range(left, right+1))
+
+
+def tape_find(tape, pos: int, value: int, step: int, limit: Optional[int] = None) -> Optional[int]:
+    # Поиск ближайшей ячейки со значением value для обоих видов лент
+    if isinstance(tape, BitTape):
+        return tape.find(pos, value, step, limit)
+    if value == 0:
+        n = 0
+        while pos in tape:
+            n += 1
+            if limit is not None and n >= limit:
+                return None
+            pos += step
+        return pos if limit is None or limit > 0 else None
+    # Проверяем ячейки по одной: поиск стоит столько же, сколько длина пропуска
+    start = pos
+    marks = len(tape)
+    for _ in range(marks if limit is None else min(limit, marks)):
+        if pos in tape:
+            return pos
+        pos += step
+    if limit is not None and limit <= marks:
+        return None
+    # Пропуск длиннее числа отметок: один проход по ключам уже не дороже сделанных проверок
+    if step > 0:
+        found = min((k for k in tape if k >= pos), default=None)
+    else:
+        found = max((k for k in tape if k <= pos), default=None)
+    if found is None or (limit is not None and abs(found - start) >= limit):
+        return None
+    return found
+
+
+def pack_tape(tape) -> Tuple[int, int, bytes]:
+    # Отмеченная область ленты: (левая граница, число ячеек, биты little-endian по ячейкам)
+    if not tape:
+        return 0, 0, b''
+    left, right = tape_span(tape)
+    s = tape_range_str(tape, left, right)
+    return left, len(s), int(s[::-1], 2).to_bytes((len(s) + 7) // 8, 'little')
+
+
+def unpack_tape(left: int, length: int, data: bytes, dense: bool = False):
+    if length == 0:
+        return BitTape() if dense else {}
+    value = int.from_bytes(data, 'little')
+    s = format(value, 'b').zfill(length)[::-1][:length]
+    if dense:
+        return BitTape.from_str(s, left)
+    return {left + i: 1 for i, ch in enumerate(s) if ch == '1'}
+
+
+# --- Файлы лент и компактное хранение ---
+TAPE_MAGIC = b'PMTAPE1\0'
+_TAPE_HEADER = struct.Struct('<qq')   # левая граница, число ячеек
+
+
+def iter_range_chunks(tape, left: int, right: int, chunk: int = 1 << 16) -> Iterator[str]:
+    # Диапазон ленты кусками по chunk ячеек, без построения всей строки
+    keys = None
+    if not isinstance(tape, BitTape) and len(tape) < right - left + 1:
+        # Разреженная лента: отметки сортируются один раз, на каждый кусок — двоичный поиск
+        keys = sorted(tape.keys())
+    pos = left
+    while pos <= right:
+        end = min(right, pos + chunk - 1)
+        if keys is None:
+            yield tape_range_str(tape, pos, end)
+        else:
+            buf = bytearray(b'0') * (end - pos + 1)
+            for i in range(bisect_left(keys, pos), bisect_right(keys, end)):
+                buf[keys[i] - pos] = 48 + tape[keys[i]]
+            yield buf.decode('ascii')
+        pos = end + 1
+
+
+def write_tape_range(tape, left: int, right: int, f, chunk: int = 1 << 16):
+    for part in iter_range_chunks(tape, left, right, chunk):
+        f.write(part)
+
+
+def save_tape_file(tape, path: str, left: Optional[int] = None, right: Optional[int] = None):
+    """Сохраняет ленту в двоичный файл: заголовок и упакованные биты (по биту на ячейку)."""
+    if left is None or right is None:
+        lo, hi = tape_span(tape)
+        if not len(tape):
+            # Пустая лента сохраняется пустой, а не одной ячейкой (0, 0)
+            lo, hi = 0, -1
+        left = lo if left is None else left
+        right = hi if right is None else right
+    length = max(0, right - left + 1)
+    with open(path, 'wb') as f:
+        f.write(TAPE_MAGIC + _TAPE_HEADER.pack(left, length))
+        for part in iter_range_chunks(tape, left, right, 1 << 20):
+            f.write(int(part[::-1], 2).to_bytes((len(part) + 7) // 8, 'little'))
+
+
+def load_tape_file(path: str, dense: bool = True):
+    """Загружает ленту из файла save_tape_file через mmap без промежуточных строк."""
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                if bytes(view[:len(TAPE_MAGIC)]) != TAPE_MAGIC:
+                    raise ValueError("Файл не является лентой машины Поста")
+                left, length = _TAPE_HEADER.unpack_from(view, len(TAPE_MAGIC))
+                start = len(TAPE_MAGIC) + _TAPE_HEADER.size
+                tape = BitTape.from_bytes(view[start:start + (length + 7) // 8], length, left)
+            finally:
+                view.release()
+    return tape if dense else dict(tape.items())
+
+
+def encode_bits(s: str) -> bytes:
+    # Двоичная строка -> BLOB: 8 байт длины и упакованные биты
+    if not s:
+        return struct.pack('<q', 0)
+    return struct.pack('<q', len(s)) + int(s[::-1], 2).to_bytes((len(s) + 7) // 8, 'little')
+
+
+def decode_bits(blob: bytes) -> str:
+    (length,) = struct.unpack_from('<q', blob)
+    if length == 0:
+        return ''
+    value = int.from_bytes(blob[8:], 'little')
+    return format(value, f'0{length}b')[::-1][:length]
+
+
+def blob_to_tape(blob: bytes, left_index: int = 0, dense: bool = True):
+    (length,) = struct.unpack_from('<q', blob)
+    tape = BitTape.from_bytes(memoryview(blob)[8:], length, left_index)
+    return tape if dense else dict(tape.items())
@@ -0,0 +1,59 @@
+import pytest
+from post_machine.analysis import analyze, optimize
+from post_machine.machine import PostMachine, tape_from_str
+
+PROGRAM = """
+start:
+    IF0 done
+    RIGHT
+    GOTO hop
+hop:
+    GOTO start
+unused:
+    MARK
+    HALT
+done:
+    LEFT
+    RIGHT
+    MARK
+    ERASE
+    MARK
+    HALT
+"""
+
+def test_analyze_reports_problems():
+    pm = PostMachine(PROGRAM + "end:\n")
+    kinds = {d.kind for d in analyze(pm)}
+    assert kinds == {"unreachable", "unused_label", "dangling_label"}
+    unreachable = [d for d in analyze(pm) if d.kind == "unreachable"][0]
+    assert unreachable.line == 9
+
+def test_analyze_missing_halt_and_fall_off():
+    pm = PostMachine("start:\n    IF1 start\n    RIGHT\n")
+    kinds = [d.kind for d in analyze(pm)]
+    assert kinds == ["falls_off_end", "no_halt"]
+
+def test_optimize_merges_and_threads():
+    pm = PostMachine(PROGRAM)
+    opt = optimize(pm.code, pm.start_pc)
+    assert opt.removed == 2 and opt.threaded == 1
+    done = opt.blocks[pm.labels["done"]]
+    assert done.writes == ((0, 1),) and done.move == 0 and done.nsteps == 6
+
+def test_flatten_fuses_loop_bodies():
+    from post_machine.analysis import K_IF0, flatten
+    from post_machine.bench import BINARY_INCREMENT
+    pm = PostMachine(BINARY_INCREMENT)
+    table = flatten(optimize(pm.code, pm.start_pc), len(pm.code))
+    # ERASE, LEFT, GOTO start и IF0 в начале цикла — одно обращение к таблице
+    assert table[1] == (K_IF0, ((0, 0),), -1, 4, pm.labels["set1"], 1)
+    assert table[len(pm.code)] is None
+
+@pytest.mark.parametrize("limit", [0, 1, 5, 13, 14, 15, 100])
+def test_optimized_run_keeps_steps_exact(limit):
+    results = []
+    for optimize_flag in (False, True):
+        pm = PostMachine(PROGRAM, tape=tape_from_str("1111"), step_limit=limit)
+        pm.run(optimize=optimize_flag)
+        results.append((pm.steps, pm.pc, pm.head, pm.halted, pm.tape))
+    assert results[0] == results[1]
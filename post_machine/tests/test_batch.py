@@ -0,0 +1,77 @@
+import pytest
+from post_machine.batch import run_batch, run_matrix
+from post_machine.machine import PostMachine, tape_from_str
+
+INCREMENT = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    HALT
+"""
+
+LOOP = """
+start:
+    GOTO start
+"""
+
+def _reference(code, data):
+    pm = PostMachine(code, tape=tape_from_str(data), head=len(data) - 1)
+    pm.run()
+    if not pm.tape:
+        return pm.halted, pm.steps, "0", 0, pm.head
+    left, right = min(pm.tape), max(pm.tape)
+    norm = "".join("1" if i in pm.tape else "0" for i in range(left, right + 1))
+    return pm.halted, pm.steps, norm, left, pm.head - left
+
+def test_batch_matches_single_runs():
+    inputs = ["1011", "111", "0", "1"]
+    results = sorted(run_batch(INCREMENT, inputs, workers=1))
+    assert [r.input for r in results] == [0, 1, 2, 3]
+    for r in results:
+        assert (r.halted, r.steps, r.tape, r.offset, r.head) == _reference(INCREMENT, inputs[r.input])
+        assert r.error is None
+
+def test_matrix_in_process_pool():
+    inputs = [bin(n)[2:] for n in range(1, 40)]
+    results = list(run_matrix([INCREMENT, LOOP], inputs, step_limit=500, workers=2, chunk_size=7))
+    assert len(results) == 2 * len(inputs)
+    for r in results:
+        if r.program == 0:
+            assert (r.halted, r.steps, r.tape, r.offset, r.head) == _reference(INCREMENT, inputs[r.input])
+        else:
+            assert not r.halted and r.steps == 500
+
+def test_vector_engine_matches_interpreter():
+    pytest.importorskip("numpy")
+    inputs = [bin(n)[2:] for n in range(1, 60)]
+    interp = sorted(run_matrix([INCREMENT, LOOP], inputs, step_limit=300, workers=1))
+    vector = sorted(run_matrix([INCREMENT, LOOP], inputs, step_limit=300, engine="vector"))
+    strip = lambda rs: [r._replace(elapsed=0) for r in rs]
+    assert strip(interp) == strip(vector)
+
+def test_pool_reads_inputs_lazily():
+    class Inputs:
+        # Входы, которые отмечают, сколько из них уже прочитано
+        def __init__(self, n):
+            self.n = n
+            self.read = 0
+
+        def __len__(self):
+            return self.n
+
+        def __getitem__(self, i):
+            if i >= self.n:
+                raise IndexError(i)
+            self.read = max(self.read, i + 1)
+            return "1"
+
+    inputs = Inputs(1000)
+    results = run_matrix([INCREMENT], inputs, workers=2, chunk_size=10)
+    next(results)
+    # Окно из 2 частей на процесс могло завершиться целиком и сразу пополниться
+    assert inputs.read <= 10 * 2 * (2 * 2)
+    assert len(list(results)) == 999
@@ -0,0 +1,36 @@
+import pytest
+from post_machine import bench
+from post_machine.machine import PostMachine, tape_from_str
+
+
+def test_benchmark_report_is_machine_readable():
+    report = bench.run_benchmarks(program_size=20, tape_sizes=[1000], db_rows=20, repeat=1)
+    names = {r["name"] for r in report["results"]}
+    assert "steps_per_sec.binary_increment" in names
+    assert "tape_memory" in names and "db.save_inputs_many" in names
+    assert all(r["value"] > 0 for r in report["results"] if r["name"] != "tape_memory")
+
+
+# Замеры в стиле pytest-benchmark: запускаются только при установленном плагине
+@pytest.mark.parametrize("name", ["unary_increment", "unary_addition", "binary_increment", "long_scan"])
+@pytest.mark.parametrize("mode", ["run", "fast", "optimize"])
+def test_interpreter_speed(name, mode, request):
+    pytest.importorskip("pytest_benchmark")
+    benchmark = request.getfixturevalue("benchmark")
+    code, data, head = bench._programs(2000)[name]
+
+    def once():
+        pm = PostMachine(code, tape=tape_from_str(data), head=head, step_limit=10**9)
+        pm.run(fast=mode == "fast", optimize=mode == "optimize")
+        return pm
+
+    assert benchmark(once).halted
+
+
+@pytest.mark.parametrize("dense", [False, True])
+def test_tape_slicing_speed(dense, request):
+    pytest.importorskip("pytest_benchmark")
+    benchmark = request.getfixturevalue("benchmark")
+    pm = PostMachine(bench.UNARY_INCREMENT, tape=tape_from_str("10" * 50000, dense=dense))
+    left, right = pm.get_tape_span()
+    assert len(benchmark(pm.tape_as_str_range, left, right)) == right - left + 1
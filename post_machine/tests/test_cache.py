@@ -0,0 +1,76 @@
+import os
+import pytest
+from post_machine import db
+from post_machine.cache import ResultCache
+from post_machine.machine import PostMachine
+
+TEST_DB = "test_post_machine_cache.db"
+
+INCREMENT = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    HALT
+"""
+
+@pytest.fixture(autouse=True)
+def setup_test_db(monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+    db.init_db()
+    yield
+    db.close_db()
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+
+def test_hit_skips_execution(monkeypatch):
+    cache = ResultCache()
+    first = cache.run(INCREMENT, "1011")
+    calls = []
+    monkeypatch.setattr(PostMachine, "run", lambda self, **kw: calls.append(1))
+    second = cache.run(INCREMENT, "1011")
+    assert not calls
+    assert cache.hits == 1 and cache.misses == 1
+    assert (second.steps, second.head, second.halted, second.tape) == (first.steps, first.head, first.halted, first.tape)
+
+def test_persisted_between_instances():
+    ResultCache().run(INCREMENT, "111")
+    cache = ResultCache()
+    pm = cache.run(INCREMENT + "\n# комментарий\n", "111")
+    assert cache.hits == 1
+    assert pm.tape_as_str_range(-1, 2) == "1000"
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2, persistent=False)
+    for data in ("1", "10", "11"):
+        cache.run(INCREMENT, data)
+    cache.run(INCREMENT, "1")
+    assert cache.misses == 4
+
+def test_overwriting_program_invalidates():
+    cache = ResultCache()
+    db.save_program("inc", INCREMENT)
+    cache.run(INCREMENT, "1")
+    db.save_program("inc", INCREMENT.replace("MARK", "MARK\n    MARK"))
+    cache.run(INCREMENT, "1")
+    assert cache.hits == 0 and cache.misses == 2
+
+def test_hooks_do_not_keep_caches_alive():
+    import gc
+    import weakref
+    cache = ResultCache()
+    ref = weakref.ref(cache)
+    del cache
+    gc.collect()
+    assert ref() is None
+    db.save_program("inc", INCREMENT)
+    db.save_program("inc", INCREMENT.replace("MARK", "MARK\n    MARK"))
+    assert all(hook() is not None for hook in db.program_replaced_hooks)
+    closed = ResultCache()
+    closed.close()
+    assert closed._hook not in db.program_replaced_hooks
@@ -0,0 +1,110 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from post_machine import db
+from post_machine.cli import main
+
+TEST_DB = "test_post_machine_cli.db"
+
+INCREMENT = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    HALT
+"""
+
+@pytest.fixture(autouse=True)
+def setup_test_db(monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+    db.init_db()
+    yield
+    db.close_db()
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+
+def test_run_from_file(tmp_path, capsys):
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    assert main(["run", "-p", str(path), "-i", "1011", "--json"]) == 0
+    out = json.loads(capsys.readouterr().out)
+    assert out["binary"] == "1100"
+    assert out["decimal"] == 12
+    assert out["halted"]
+
+def test_run_from_db(capsys):
+    db.save_program("inc", INCREMENT)
+    db.save_input("seven", "111")
+    assert main(["run", "-P", "inc", "-I", "seven"]) == 0
+    assert "Десятично: 8" in capsys.readouterr().out
+
+def test_tape_out_file(tmp_path, capsys):
+    from post_machine.tape import load_tape_file
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    out = tmp_path / "tape.bin"
+    assert main(["run", "-p", str(path), "-i", "1011", "--tape-out", str(out)]) == 0
+    tape = load_tape_file(str(out))
+    assert tape.as_str_range(*tape.span()) == "11"
+
+def test_check_command(tmp_path, capsys):
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    assert main(["check", "-p", str(path)]) == 0
+    path.write_text(INCREMENT + "    RIGHT\n", encoding="utf-8")
+    assert main(["check", "-p", str(path), "--json"]) == 1
+    out = json.loads(capsys.readouterr().out.splitlines()[-1])
+    assert [d["kind"] for d in out["diagnostics"]] == ["unreachable"]
+
+def test_missing_program_in_db(capsys):
+    assert main(["run", "-P", "nope", "-i", "1"]) == 2
+
+def test_import_does_not_load_tkinter():
+    code = "import sys, post_machine.cli; print('tkinter' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+    assert out.stdout.strip() == "False"
+
+def test_list_command_pages(capsys):
+    db.init_db()
+    for name in ("alpha", "beta", "gamma"):
+        db.save_program(name, "start:\n    HALT")
+    assert main(["list", "programs", "-n", "2", "--json"]) == 0
+    first = json.loads(capsys.readouterr().out)
+    assert [row["name"] for row in first] == ["alpha", "beta"]
+    assert main(["list", "programs", "--after", "beta"]) == 0
+    assert capsys.readouterr().out.startswith("gamma\t")
+
+def test_history_must_be_positive(tmp_path, capsys):
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    for bad in ("0", "-3", "x"):
+        with pytest.raises(SystemExit) as exc:
+            main(["run", "-p", str(path), "-i", "1", "--history", bad])
+        assert exc.value.code == 2
+        assert "--history" in capsys.readouterr().err
+
+@pytest.mark.parametrize("flags", [["--jit", "--detect-loops"], ["--fast", "--memo"], ["--optimize", "--history", "2"]])
+def test_conflicting_engine_flags(tmp_path, capsys, flags):
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    with pytest.raises(SystemExit) as exc:
+        main(["run", "-p", str(path), "-i", "1"] + flags)
+    assert exc.value.code == 2
+    assert "нельзя использовать вместе" in capsys.readouterr().err
+
+@pytest.mark.parametrize("flags", [["--history", "3"], ["--fast"], ["--memo"]])
+def test_profile_with_other_modes_is_rejected(tmp_path, capsys, flags):
+    path = tmp_path / "inc.txt"
+    path.write_text(INCREMENT, encoding="utf-8")
+    with pytest.raises(SystemExit) as exc:
+        main(["run", "-p", str(path), "-i", "111", "--profile"] + flags)
+    assert exc.value.code == 2
+    assert "--profile" in capsys.readouterr().err
@@ -12,6 +12,7 @@ def setup_test_db(monkeypatch):
         os.remove(TEST_DB)
     db.init_db()
     yield
+    db.close_db()
     if os.path.exists(TEST_DB):
         os.remove(TEST_DB)
 
@@ -46,4 +47,104 @@ def test_load_nonexistent_program():
 
 def test_load_nonexistent_input():
     with pytest.raises(ValueError):
-        db.load_input("nope")
\ No newline at end of file
+        db.load_input("nope")
+
+def test_bulk_save_and_load_inputs():
+    items = [(f"in{i}", bin(i)[2:]) for i in range(1200)]
+    db.save_inputs_many(items)
+    loaded = db.load_inputs_many([f"in{i}" for i in range(0, 1200, 3)] + ["missing"])
+    assert len(loaded) == 400
+    assert loaded["in9"] == "1001"
+    assert list(db.iter_inputs(batch_size=100)) == items
+
+def test_failed_bulk_save_is_rolled_back():
+    with pytest.raises(sqlite3.Error):
+        db.save_inputs_many([("a", "1"), ("b",)])
+    assert db.list_inputs() == []
+
+def test_connection_is_shared_between_threads():
+    import threading
+    errors = []
+
+    def worker(n):
+        try:
+            for i in range(50):
+                db.save_input(f"t{n}_{i}", "1")
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert len(db.list_inputs()) == 200
+
+def test_binary_inputs_stored_packed():
+    db.save_input("big", "1" + "0" * 1000 + "1")
+    db.save_input("text", "abc")
+    conn = sqlite3.connect(TEST_DB)
+    kinds = dict(conn.execute("SELECT name, typeof(data) FROM inputs").fetchall())
+    conn.execute("INSERT INTO inputs (name, data) VALUES ('legacy', '0110')")
+    conn.commit()
+    conn.close()
+    assert kinds == {"big": "blob", "text": "text"}
+    assert db.load_input("big") == "1" + "0" * 1000 + "1"
+    assert db.load_input("legacy") == "0110"
+    assert db.load_inputs_many(["big", "text"])["text"] == "abc"
+    tape = db.load_input_tape("big")
+    assert tape.span() == (0, 1001) and len(tape) == 2
+    assert db.load_input_tape("legacy", dense=False) == {1: 1, 2: 1}
+
+def test_catalog_metadata_and_pages():
+    for i in range(25):
+        db.save_program(f"increment_{i:02d}", "start:\n    MARK\n    HALT")
+    db.save_program("сложение", "start:\n    RIGHT\n    HALT")
+    first = db.list_programs_page(limit=10)
+    assert [e.name for e in first] == [f"increment_{i:02d}" for i in range(10)]
+    second = db.list_programs_page(after=first[-1].name, limit=10)
+    assert second[0].name == "increment_10"
+    assert [e.name for e in db.list_programs_page("слож")] == ["сложение"]
+    assert [e.name for e in db.list_programs_page("RIGHT")] == ["сложение"]
+    assert [e.name for e in db.list_programs_page("incr 2")] == [f"increment_{i}" for i in range(20, 25)]
+    assert db.list_programs_page('"%') == []
+
+    entry = first[0]
+    assert entry.size == len("start:\n    MARK\n    HALT")
+    assert entry.hash == db.program_hash("start:\n    MARK\n    HALT")
+    db.save_program("increment_00", "start:\n    HALT")
+    updated = db.list_programs_page("increment_00")
+    assert [e.name for e in updated] == ["increment_00"]
+    assert (updated[0].id, updated[0].created) == (entry.id, entry.created)
+    assert updated[0].updated >= entry.updated and updated[0].hash != entry.hash
+    assert db.list_programs_page("MARK", limit=100)[0].name == "increment_01"
+
+def test_catalog_migrates_old_database():
+    db.close_db()
+    os.remove(TEST_DB)
+    conn = sqlite3.connect(TEST_DB)
+    conn.execute("CREATE TABLE programs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, code TEXT)")
+    conn.execute("CREATE TABLE inputs (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, data TEXT)")
+    conn.execute("INSERT INTO programs (name, code) VALUES ('old', 'start:\n    HALT')")
+    conn.execute("INSERT INTO inputs (name, data) VALUES ('legacy', '0110')")
+    conn.commit()
+    conn.close()
+    db.init_db()
+    db.save_input("fresh", "0110")
+    old, = db.list_programs_page("old")
+    assert old.size == len("start:\n    HALT") and old.created is not None
+    legacy, fresh = db.list_inputs_page("legacy"), db.list_inputs_page("fresh")
+    assert legacy[0].size == fresh[0].size == 4
+    assert legacy[0].hash == fresh[0].hash
+
+def test_results_store_packed_blobs():
+    db.save_result("k", "h", "1011", 3, 100, (0, "1" + "0" * 500 + "1", 4, 2, 17, 1))
+    conn = sqlite3.connect(TEST_DB)
+    kinds = conn.execute("SELECT typeof(input), typeof(tape), length(tape) FROM results").fetchone()
+    conn.execute("INSERT INTO results VALUES ('old', 'h', '1', 0, 10, 0, '101', 0, 1, 2, 1, 0)")
+    conn.commit()
+    conn.close()
+    assert kinds[:2] == ("blob", "blob") and kinds[2] < 100
+    assert db.load_result("k") == (0, "1" + "0" * 500 + "1", 4, 2, 17, 1)
+    assert db.load_result("old") == (0, "101", 0, 1, 2, 1)
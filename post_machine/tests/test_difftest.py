@@ -0,0 +1,30 @@
+import random
+from post_machine import difftest
+from post_machine.difftest import case_for, random_program, run_differential
+from post_machine.machine import PostMachine
+
+def test_generator_is_deterministic_and_valid():
+    assert case_for(7, 3) == case_for(7, 3)
+    rng = random.Random(1)
+    for _ in range(200):
+        PostMachine(random_program(rng))
+
+def test_engines_agree_with_reference():
+    report = run_differential(cases=150, seed=1, workers=1)
+    assert report.failures == []
+    assert set(report.throughput) == set(difftest.available_engines())
+    assert all(t["steps"] > 0 for t in report.throughput.values())
+
+def test_broken_engine_is_shrunk(monkeypatch):
+    def broken(case):
+        out, elapsed = difftest.ENGINES["run"](case)
+        # «Ошибка» проявляется, только если программа стирает ячейку
+        if "ERASE" in case.program:
+            out = out._replace(steps=out.steps + 1)
+        return out, elapsed
+    monkeypatch.setitem(difftest.ENGINES, "broken", broken)
+    report = run_differential(cases=100, seed=2, engines=["broken"], workers=1)
+    assert len(report.failures) == 1
+    case = report.failures[0].case
+    assert case.program.split() == ["L0:", "ERASE"]
+    assert case.step_limit == 0 and case.input == "0"
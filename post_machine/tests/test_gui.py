@@ -1,5 +1,8 @@
+import re
 import pytest
 from post_machine.gui import PostMachineGUI
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.timetravel import TimeTravel
 
 @pytest.fixture
 def app(monkeypatch):
@@ -30,4 +33,60 @@ def test_input_save_and_load(app):
     app.input_list.set("input1")
     app.load_input_action()
     val = app.input_entry.get()
-    assert val == "101"
\ No newline at end of file
+    assert val == "101"
+
+def _fts_match(query, name):
+    # Как db._fts_query: каждое слово запроса — префикс какого-либо слова имени
+    words = re.split(r"[\W_]+", name.lower())
+    return all(any(w.startswith(q) for w in words) for q in re.split(r"[\W_]+", query.lower()) if q)
+
+def test_catalog_combobox_pages_and_searches(app):
+    from post_machine.db import PAGE_SIZE
+    from post_machine.gui import CatalogCombobox, MORE_ITEM
+    names = sorted(f"prog{i:04d}" for i in range(PAGE_SIZE * 2 + 5))
+    calls = []
+
+    def fetch(query, after, limit):
+        calls.append((query, after))
+        found = [n for n in names if _fts_match(query, n) and (after is None or n > after)]
+        return [type("Row", (), {"name": n}) for n in found[:limit]]
+
+    combo = CatalogCombobox(app, fetch)
+    assert calls == []
+    combo.refresh()
+    values = list(combo["values"])
+    assert len(values) == PAGE_SIZE + 1 and values[-1] == MORE_ITEM
+    combo.set(MORE_ITEM)
+    combo._on_select(None)
+    assert calls[-1] == ("", names[PAGE_SIZE - 1])
+    assert len(combo["values"]) == 2 * PAGE_SIZE + 1
+    combo.set("prog001")
+    combo.refresh()
+    assert list(combo["values"]) == [f"prog001{i}" for i in range(10)]
+
+def test_cached_run_drops_old_history(app, monkeypatch):
+    import post_machine.gui as gui
+    done = PostMachine("s:\n MARK\n HALT", tape=tape_from_str("1"))
+    done.run()
+    started = []
+    monkeypatch.setattr(gui, "load_program", lambda name: "s:\n MARK\n HALT")
+    monkeypatch.setattr(gui, "load_input", lambda name: "1")
+    monkeypatch.setattr(gui.default_cache, "lookup", lambda *args, **kwargs: done)
+
+    class Worker:
+        def __init__(self, pm, events, history=None):
+            started.append(history)
+
+        def start(self):
+            pass
+    monkeypatch.setattr(gui, "MachineWorker", Worker)
+    monkeypatch.setattr(app, "after", lambda ms, callback: None)
+    app.run_prog_combo.set("p")
+    app.run_input_combo.set("i")
+    app._set_history(TimeTravel(done))
+    app.record_var.set(False)
+    app.run_program_action()
+    assert app.history is None and started == []
+    app.record_var.set(True)
+    app.run_program_action()
+    assert len(started) == 1 and isinstance(started[0], TimeTravel)
@@ -12,6 +12,7 @@ def setup_test_db(monkeypatch):
         os.remove(TEST_DB)
     db.init_db()
     yield
+    db.close_db()
     if os.path.exists(TEST_DB):
         os.remove(TEST_DB)
 
@@ -1,5 +1,5 @@
 import pytest
-from post_machine.machine import PostMachine, tape_from_str
+from post_machine.machine import PostMachine, tape_from_str, NonTerminationError
 
 BASIC_PROGRAM = """
 start:
@@ -103,4 +103,249 @@ set1:
     pm.run()
     left, right = pm.get_tape_span()
     res = pm.tape_as_str_range(left, right)
-    assert int(res, 2) == int("10011", 2)
\ No newline at end of file
+    assert int(res, 2) == int("10011", 2)
+
+def test_unknown_command_fails_at_load():
+    with pytest.raises(ValueError):
+        PostMachine("start:\n    JUMP\n    HALT")
+
+def test_missing_label_fails_at_load():
+    with pytest.raises(ValueError):
+        PostMachine("start:\n    GOTO nowhere\n    HALT")
+
+def test_run_matches_step_by_step():
+    code = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+done:
+    MARK
+    LEFT
+    IF1 done2
+    GOTO start
+done2:
+    HALT
+"""
+    fast = PostMachine(code, tape=tape_from_str("1111"))
+    fast.run()
+    slow = PostMachine(code, tape=tape_from_str("1111"))
+    while not slow.halted:
+        slow.step()
+    assert (fast.steps, fast.head, fast.pc, fast.tape) == (slow.steps, slow.head, slow.pc, slow.tape)
+
+def test_run_stops_at_step_limit():
+    pm = PostMachine("loop:\n    GOTO loop", step_limit=50)
+    assert pm.run() is False
+    assert pm.steps == 50
+
+SCAN_PROGRAM = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+done:
+    MARK
+back:
+    LEFT
+    IF1 back
+    RIGHT
+    HALT
+"""
+
+@pytest.mark.parametrize("dense", [False, True])
+@pytest.mark.parametrize("limit", [7, 100, 303, 304, 10000])
+def test_fast_mode_matches_interpreter(dense, limit):
+    results = []
+    for fast in (False, True):
+        pm = PostMachine(SCAN_PROGRAM, tape=tape_from_str("1" * 60, dense=dense), step_limit=limit)
+        pm.run(fast=fast)
+        results.append((pm.steps, pm.head, pm.pc, pm.halted, sorted(pm.tape.keys())))
+    assert results[0] == results[1]
+
+GAP_SCAN_PROGRAM = """
+ones:
+    RIGHT
+    IF1 ones
+zeros:
+    RIGHT
+    IF0 zeros
+    GOTO ones
+"""
+
+@pytest.mark.parametrize("limit", [5, 99, 400, 4000])
+def test_fast_gap_scan_matches_interpreter(limit):
+    results = []
+    for fast in (False, True):
+        pm = PostMachine(GAP_SCAN_PROGRAM, tape=tape_from_str("1100" * 100), step_limit=limit)
+        pm.run(fast=fast)
+        results.append((pm.steps, pm.head, pm.pc, pm.halted))
+    assert results[0] == results[1]
+
+def test_detects_exact_cycle():
+    code = """
+a:
+    MARK
+b:
+    ERASE
+    GOTO a
+"""
+    pm = PostMachine(code, step_limit=10**6)
+    with pytest.raises(NonTerminationError) as exc:
+        pm.run(detect_loops=True)
+    assert exc.value.kind == 'cycle'
+    assert pm.steps < 100
+
+def test_detects_translated_cycle():
+    code = """
+a:
+    MARK
+    RIGHT
+    RIGHT
+    LEFT
+    GOTO a
+"""
+    pm = PostMachine(code, tape=tape_from_str("101"), step_limit=10**6)
+    with pytest.raises(NonTerminationError) as exc:
+        pm.run(detect_loops=True)
+    assert exc.value.kind == 'translated'
+    assert pm.steps < 100
+
+def test_detection_keeps_halting_programs_intact():
+    pm = PostMachine(SCAN_PROGRAM, tape=tape_from_str("1" * 20))
+    ref = PostMachine(SCAN_PROGRAM, tape=tape_from_str("1" * 20))
+    assert pm.run(detect_loops=True)
+    ref.run()
+    assert (pm.steps, pm.head, pm.tape) == (ref.steps, ref.head, ref.tape)
+
+@pytest.mark.parametrize("limit", [1, 5, 6, 100, 10000])
+def test_jit_matches_interpreter(limit):
+    ref = PostMachine(SCAN_PROGRAM, tape=tape_from_str("1" * 30), step_limit=limit)
+    ref.run()
+    pm = PostMachine(SCAN_PROGRAM, tape=tape_from_str("1" * 30), step_limit=limit)
+    pm.run(jit=True)
+    assert (pm.steps, pm.head, pm.pc, pm.halted, pm.tape) == (ref.steps, ref.head, ref.pc, ref.halted, ref.tape)
+
+def test_jit_resumes_inside_block_and_reports_pc_errors():
+    code = """
+start:
+    MARK
+    RIGHT
+    MARK
+    GOTO end
+end:
+"""
+    pm = PostMachine(code, step_limit=2)
+    pm.run()
+    pm.step_limit = 100
+    with pytest.raises(RuntimeError):
+        pm.run(jit=True)
+    assert (pm.steps, pm.head, sorted(pm.tape)) == (4, 1, [0, 1])
+
+@pytest.mark.parametrize("dense", [False, True])
+def test_run_result_matches_report(dense):
+    from post_machine.report import RunResult, build_report, format_report
+    pm = PostMachine(BASIC_PROGRAM, tape=tape_from_str("0110", left_index=-3, dense=dense), head=-3)
+    pm.run()
+    result = RunResult(pm, "0110")
+    assert result.tape_full == pm.tape_as_str_range(result.left_bound, result.right_bound)
+    assert result.tape == pm.tape_as_str_range(*pm.get_tape_span())
+    assert result.decimal == int(result.binary, 2)
+    assert format_report(result) == format_report(build_report(pm, "0110"))
+    assert result.binary == (result.tape_full.lstrip("0") or "0")
+
+@pytest.mark.parametrize("dense", [False, True])
+def test_normalized_result(dense):
+    from post_machine.report import RunResult
+    pm = PostMachine("s:\n HALT", tape=tape_from_str("00101100", left_index=-4, dense=dense), head=3)
+    result = RunResult(pm, "00101100")
+    assert result.normalized == ("1011", -2, 5)
+    assert "tape_full" not in result.__dict__
+    assert result.binary == "1011000000"
+    pm = PostMachine("s:\n HALT", tape=tape_from_str("000", dense=dense), head=1)
+    assert RunResult(pm, "000").normalized == ("0", 0, 1)
+
+def test_report_of_huge_number():
+    from post_machine.report import RunResult, format_report
+    data = "1" + "0" * 20000
+    pm = PostMachine("s:\n HALT", tape=tape_from_str(data))
+    assert "(20001 двоичных разрядов)" in format_report(RunResult(pm, data))
+
+def test_program_is_parsed_once_and_shared():
+    from post_machine.machine import Program
+    a = PostMachine(BASIC_PROGRAM)
+    b = PostMachine(BASIC_PROGRAM)
+    assert a.program is b.program
+    assert PostMachine(a.program).program is a.program
+    with pytest.raises(AttributeError):
+        a.program.code = ()
+    with pytest.raises(AttributeError):
+        a.extra = 1
+    import pickle
+    assert pickle.loads(pickle.dumps(a.program)) is a.program
+    assert isinstance(a.program, Program)
+
+def test_fork_copies_on_write():
+    pm = PostMachine(BASIC_PROGRAM, tape=tape_from_str("1" * 1000), step_limit=2)
+    pm.run()
+    children = [pm.fork() for _ in range(100)]
+    for i, child in enumerate(children):
+        child.tape[5000 + i] = 1
+        child.tape.pop(i, None)
+        assert child.tape.divergent == 2
+    pm.step_limit = 100
+    pm.run()
+    ref = PostMachine(BASIC_PROGRAM, tape=tape_from_str("1" * 1000), step_limit=100)
+    ref.run()
+    assert (pm.steps, pm.head, pm.tape) == (ref.steps, ref.head, ref.tape)
+    assert len(children[3].tape) == 1000 and 3 not in children[3].tape and 5003 in children[3].tape
+    assert children[3].steps == 2 and children[4].tape != children[3].tape
+
+def test_fork_base_cannot_be_changed():
+    import pickle
+    tape = tape_from_str("0110")
+    pm = PostMachine(BASIC_PROGRAM, tape=tape)
+    child = pm.fork()
+    tape[10] = 1
+    assert 10 not in pm.tape and 10 not in child.tape
+    pm.tape[20] = 1
+    old = pm.tape
+    grandchild = pm.fork()
+    with pytest.raises(TypeError):
+        old[30] = 1
+    assert 30 not in pm.tape and 30 not in grandchild.tape and len(old) == 3
+    assert pickle.loads(pickle.dumps(grandchild.tape)) == {1: 1, 2: 1, 20: 1}
+
+def test_fork_keeps_dense_tape():
+    from post_machine.tape import BitTape
+    pm = PostMachine(BASIC_PROGRAM, tape=tape_from_str("0110", dense=True), step_limit=2)
+    tape = pm.tape
+    pm.run()
+    child = pm.fork()
+    assert pm.tape is tape and isinstance(child.tape, BitTape)
+    child.tape[-50] = 1
+    assert child.get_tape_span()[0] == -50 and pm.get_tape_span()[0] >= 0
+    assert -50 not in tape
+
+def test_program_from_code_matches_parsed_text():
+    from post_machine.machine import Program, parse_program
+    base = parse_program(BASIC_PROGRAM)
+    built = Program.from_code(base.code)
+    parsed = parse_program(built.text)
+    assert built.code == parsed.code == base.code
+    assert (built.lines, built.line_numbers, built.instructions) == \
+        (parsed.lines, parsed.line_numbers, parsed.instructions)
+    a, b = PostMachine(base), PostMachine(built)
+    a.run()
+    b.run()
+    assert (a.steps, a.tape) == (b.steps, b.tape)
+    with pytest.raises(ValueError):
+        Program.from_code([(6, 5)])
+
+@pytest.mark.parametrize("flags", [dict(jit=True, detect_loops=True), dict(fast=True, memo=True),
+                                   dict(optimize=True, trace=lambda rec: None)])
+def test_conflicting_engines_are_rejected(flags):
+    pm = PostMachine(BASIC_PROGRAM)
+    with pytest.raises(ValueError, match="несовместимы"):
+        pm.run(**flags)
+    assert pm.steps == 0
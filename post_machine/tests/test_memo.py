@@ -0,0 +1,81 @@
+import pytest
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.memo import TransitionCache, program_cache, run_memoized
+
+COUNTER = """
+inc:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO inc
+set1:
+    MARK
+back:
+    RIGHT
+    IF0 back
+    LEFT
+    GOTO inc
+"""
+
+UNARY_ADDITION = """
+start:
+    IF0 gap
+    RIGHT
+    GOTO start
+gap:
+    MARK
+    RIGHT
+second:
+    IF0 last
+    RIGHT
+    GOTO second
+last:
+    LEFT
+    ERASE
+    HALT
+"""
+
+def _state(pm):
+    return pm.steps, pm.pc, pm.head, pm.halted, dict(pm.tape.items())
+
+@pytest.mark.parametrize("limit", [0, 1, 77, 5000, 123457])
+@pytest.mark.parametrize("dense", [False, True])
+def test_memo_matches_interpreter(limit, dense):
+    data = "0" * 20 + "1"
+    ref = PostMachine(COUNTER, tape=tape_from_str(data), head=19, step_limit=limit)
+    ref.run()
+    pm = PostMachine(COUNTER, tape=tape_from_str(data, dense=dense), head=19, step_limit=limit)
+    run_memoized(pm, block_size=8, cache=TransitionCache())
+    assert _state(pm) == _state(ref)
+
+def test_memo_halts_and_reuses_transitions():
+    data = "1" * 1000 + "0" + "1" * 1000
+    ref = PostMachine(UNARY_ADDITION, tape=tape_from_str(data), step_limit=10**6)
+    ref.run()
+    pm = PostMachine(UNARY_ADDITION, tape=tape_from_str(data), step_limit=10**6)
+    assert pm.run(memo=True)
+    assert _state(pm) == _state(ref)
+    stats = program_cache(pm).stats()
+    assert stats["hits"] > stats["misses"] > 0
+
+def test_program_caches_are_bounded(monkeypatch):
+    from post_machine import memo
+    monkeypatch.setattr(memo, "PROGRAM_CACHES", 2)
+    memo.clear_caches()
+    machines = [PostMachine(f"s{i}:\n    MARK\n    RIGHT\n    GOTO s{i}", step_limit=50) for i in range(3)]
+    caches = [program_cache(pm) for pm in machines]
+    assert program_cache(machines[2]) is caches[2]
+    assert len(memo._caches) == 2 and program_cache(machines[0]) is not caches[0]
+    memo.clear_caches()
+
+def test_cache_is_bounded():
+    cache = TransitionCache(maxsize=4)
+    pm = PostMachine(COUNTER, tape=tape_from_str("0" * 20 + "1"), head=19, step_limit=100000)
+    run_memoized(pm, block_size=4, cache=cache)
+    assert len(cache) == 4 and cache.evictions > 0
+
+def test_memo_reports_pc_errors():
+    pm = PostMachine("start:\n    RIGHT\n    RIGHT\n", step_limit=100)
+    with pytest.raises(RuntimeError, match="PC"):
+        pm.run(memo=True)
+    assert (pm.steps, pm.pc, pm.head) == (2, 2, 2)
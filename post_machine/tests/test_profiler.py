@@ -0,0 +1,42 @@
+import json
+import pytest
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.profiler import Profile
+
+PROGRAM = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+# дописываем единицу
+done:
+    MARK
+    HALT
+"""
+
+def test_profile_counts_and_result():
+    ref = PostMachine(PROGRAM, tape=tape_from_str("1111"))
+    ref.run()
+    pm = PostMachine(PROGRAM, tape=tape_from_str("1111"))
+    profile = Profile()
+    pm.run(profile=profile)
+    assert (pm.steps, pm.head, pm.tape) == (ref.steps, ref.head, ref.tape)
+    assert profile.counts == [5, 4, 4, 1, 1]
+    assert sum(profile.counts) == profile.steps == pm.steps
+    assert profile.label_counts() == {"start": 13, "done": 2}
+    assert profile.head_travel == 4 and profile.cells_touched == 5 and profile.writes == 1
+
+def test_profile_report_maps_to_source_lines():
+    pm = PostMachine(PROGRAM, tape=tape_from_str("11"))
+    profile = Profile()
+    pm.run(profile=profile)
+    data = json.loads(profile.to_json())
+    assert [i["line"] for i in data["instructions"]] == [3, 4, 5, 8, 9]
+    assert data["instructions"][0]["text"] == "IF0 done"
+    assert "IF0 done" in profile.report().splitlines()[1]
+
+def test_empty_profile_fails_cleanly():
+    profile = Profile()
+    for call in (profile.report, profile.to_dict, profile.label_counts):
+        with pytest.raises(ValueError, match="Профиль пуст"):
+            call()
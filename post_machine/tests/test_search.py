@@ -0,0 +1,99 @@
+import json
+import os
+from itertools import product
+
+import pytest
+from post_machine import db
+from post_machine.machine import OP_MARK, OP_RIGHT, OP_IF1, OP_GOTO, OP_HALT, PostMachine, Program
+from post_machine.search import (alphabet, candidates, load_checkpoint, run_slice, search,
+                                 _canonical, _layout, _well_formed)
+
+TEST_DB = "test_search.db"
+
+def _outcome(code):
+    pm = PostMachine(Program.from_code(code), step_limit=200)
+    pm.run()
+    return pm.halted, pm.steps, len(pm.tape)
+
+def test_pruning_keeps_every_behaviour():
+    # Отсечённые программы повторяют поведение оставшихся (на пустой ленте)
+    full = [code for code in product(alphabet(3), repeat=3) if _well_formed(code)]
+    kept = list(candidates(3))
+    assert len(kept) < len(full)
+    assert {_outcome(c) for c in kept} == {_outcome(c) for c in full}
+
+def test_chain_permutations_are_isomorphic():
+    # Одна и та же программа с переставленными цепочками: каноническая только первая
+    a = ((OP_IF1, 2), (OP_GOTO, 4), (OP_RIGHT, -1), (OP_HALT, -1), (OP_MARK, -1), (OP_GOTO, 0))
+    swapped = ((OP_IF1, 4), (OP_GOTO, 2), (OP_MARK, -1), (OP_GOTO, 0), (OP_RIGHT, -1), (OP_HALT, -1))
+    assert _well_formed(a) and _well_formed(swapped)
+    assert _canonical(a) and not _canonical(swapped)
+    assert _outcome(a) == _outcome(swapped)
+
+def test_slices_partition_the_space():
+    k, slices = _layout(4, 500)
+    results = [run_slice(4, i, slice_size=500) for i in range(slices)]
+    assert sum(r.enumerated for r in results) == len(alphabet(4)) ** 4
+    assert sum(r.halted + r.unfinished for r in results) == len(list(candidates(4)))
+    whole = search(4, min_size=4, workers=1)
+    assert whole.halted == sum(r.halted for r in results)
+
+def test_search_finds_champions_in_parallel():
+    one = search(4, workers=1, slice_size=1000)
+    two = search(4, workers=2, slice_size=1000)
+    assert one.champions == two.champions
+    by_key = {(c.size, c.metric): c for c in one.champions}
+    assert by_key[(4, "steps")].value == 5 and by_key[(4, "marks")].value == 2
+    best = by_key[(4, "steps")]
+    pm = PostMachine(best.program, step_limit=1000)
+    assert pm.run() and (pm.steps, len(pm.tape)) == (best.steps, best.marks)
+
+def test_checkpoint_resume(tmp_path):
+    path = str(tmp_path / "search.json")
+    done = []
+
+    def interrupt(res):
+        done.append(res)
+        if len(done) == 3:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        search(4, workers=1, slice_size=1000, checkpoint=path, progress=interrupt)
+    resumed = search(4, workers=1, slice_size=1000, checkpoint=path)
+    full = search(4, workers=1, slice_size=1000)
+    assert resumed.slices == full.slices - 3
+    assert resumed._replace(slices=0, seconds=0) == full._replace(slices=0, seconds=0)
+    with pytest.raises(ValueError):
+        load_checkpoint(path, {"max_size": 5})
+
+def test_checkpoint_is_compact_and_rate_limited(tmp_path, monkeypatch):
+    import post_machine.search as search_module
+    from post_machine.search import _empty_state, _mark_done
+    state = _empty_state({})
+    for i in (0, 2, 3, 1, 5):
+        _mark_done(state, 4, i)
+    assert state["done"]["4"] == {"upto": 4, "extra": [5]}
+    writes = []
+    monkeypatch.setattr(search_module, "save_checkpoint", lambda path, state: writes.append(json.dumps(state)))
+    path = str(tmp_path / "search.json")
+    report = search(4, workers=2, slice_size=1000, checkpoint=path)
+    assert len(writes) == 1 and report.slices > 1
+    done = json.loads(writes[0])["done"]
+    assert all(d["extra"] == [] for d in done.values())
+
+def test_records_keep_the_best(monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+    db.init_db()
+    try:
+        search(3, workers=1, record=True)
+        rows = db.list_search_records()
+        assert [(size, metric) for size, metric, *_ in rows] == [(s, m) for s in (1, 2, 3) for m in ("marks", "steps")]
+        worse = search(2, workers=1).champions[0]._replace(size=3, value=0)
+        db.save_search_records([worse], 10)
+        assert db.list_search_records() == rows
+    finally:
+        db.close_db()
+        if os.path.exists(TEST_DB):
+            os.remove(TEST_DB)
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from post_machine import db
+from post_machine.machine import PostMachine
+from post_machine.service import JobService, submit
+
+TEST_DB = "test_post_machine_service.db"
+
+INCREMENT = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    HALT
+"""
+
+LOOP = """
+start:
+    GOTO start
+"""
+
+@pytest.fixture(autouse=True)
+def setup_test_db(monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+    db.init_db()
+    yield
+    db.close_db()
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+
+def _serve(coro_fn, **kwargs):
+    async def main():
+        service = JobService(executor=ThreadPoolExecutor(2), **kwargs)
+        server = await service.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            return await coro_fn(service, port)
+    return asyncio.run(main())
+
+def test_jobs_from_text_and_db():
+    db.save_program("inc", INCREMENT)
+    db.save_input("seven", "111")
+
+    async def scenario(service, port):
+        return await asyncio.gather(
+            submit({"program": INCREMENT, "input": "1011"}, port=port),
+            submit({"program_name": "inc", "input_name": "seven"}, port=port))
+    first, second = _serve(scenario)
+    assert first["decimal"] == 12 and first["halted"]
+    assert second["decimal"] == 8
+
+def test_progress_and_step_limit():
+    ref = PostMachine(LOOP, step_limit=1000)
+    ref.run()
+    seen = []
+
+    async def scenario(service, port):
+        return await submit({"program": LOOP, "input": "1", "step_limit": 10**6}, port=port,
+                            progress=lambda steps, head: seen.append(steps))
+    result = _serve(scenario, slice=300, max_step_limit=1000)
+    assert seen == [300, 600, 900, 1000]
+    assert result["steps"] == ref.steps and not result["halted"]
+
+def test_errors_are_reported():
+    async def scenario(service, port):
+        with pytest.raises(RuntimeError, match="не найдена"):
+            await submit({"program_name": "nope", "input": "1"}, port=port)
+        with pytest.raises(RuntimeError, match="двоичной"):
+            await submit({"program": INCREMENT, "input": "12"}, port=port)
+        with pytest.raises(RuntimeError, match="fast и jit"):
+            await submit({"program": INCREMENT, "input": "1", "fast": True, "jit": True}, port=port)
+        return service.pending
+    assert _serve(scenario) == 0
+
+def test_per_client_limit_serialises_jobs():
+    async def scenario(service, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for job_id in ("a", "b"):
+            writer.write(json.dumps({"id": job_id, "program": LOOP, "input": "1", "step_limit": 500}).encode() + b"\n")
+        await writer.drain()
+        events = []
+        while sum(e["event"] == "done" for e in events) < 2:
+            events.append(json.loads(await reader.readline()))
+        writer.close()
+        return events
+    events = _serve(scenario, slice=100, per_client=1)
+    ids = [e["id"] for e in events]
+    assert ids == ["a"] * 6 + ["b"] * 6
+    assert events[5]["result"]["steps"] == 500
+
+def test_bad_requests_keep_connection_open():
+    async def scenario(service, port):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        for job in ({"id": [1], "program": INCREMENT, "input": "1"},
+                    {"id": "x", "program": INCREMENT, "input": "1", "step_limit": "10"},
+                    {"id": "ok", "program": INCREMENT, "input": "1"}):
+            writer.write(json.dumps(job).encode() + b"\n")
+        await writer.drain()
+        events = []
+        while not events or events[-1]["event"] != "done":
+            events.append(json.loads(await reader.readline()))
+        writer.close()
+        return events
+    bad_id, bad_limit, *_, done = _serve(scenario)
+    assert bad_id["event"] == "error" and "'id'" in bad_id["message"]
+    assert bad_limit["event"] == "error" and "'step_limit'" in bad_limit["message"]
+    assert (done["id"], done["event"], done["result"]["decimal"]) == ("ok", "done", 2)
+
+def test_unexpected_job_error_is_reported(monkeypatch):
+    import post_machine.service as service_module
+
+    def broken(*args):
+        raise KeyError("сбой")
+    monkeypatch.setattr(service_module, "_run_slice", broken)
+
+    async def scenario(service, port):
+        with pytest.raises(RuntimeError, match="сбой"):
+            await submit({"program": INCREMENT, "input": "1"}, port=port)
+        return service._clients
+    assert _serve(scenario) == {}
+
+def test_client_limit_is_shared_by_connections():
+    async def scenario(service, port):
+        streams = [await asyncio.open_connection("127.0.0.1", port) for _ in range(2)]
+        for job_id, (reader, writer) in zip("ab", streams):
+            writer.write(json.dumps({"id": job_id, "program": LOOP, "input": "1", "step_limit": 300}).encode() + b"\n")
+            await writer.drain()
+        events = []
+
+        async def collect(reader):
+            while True:
+                event = json.loads(await reader.readline())
+                events.append(event["id"])
+                if event["event"] == "done":
+                    return
+        await asyncio.gather(*(collect(reader) for reader, _ in streams))
+        for _, writer in streams:
+            writer.close()
+        return events
+    assert _serve(scenario, slice=100, per_client=1) == ["a"] * 4 + ["b"] * 4
+
+def test_process_pool():
+    async def scenario():
+        service = JobService(workers=1)
+        try:
+            return await service.run_job({"program": INCREMENT, "input": "111"})
+        finally:
+            service.close()
+    assert asyncio.run(scenario())["decimal"] == 8
@@ -0,0 +1,66 @@
+import os
+import pytest
+from post_machine import db
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.snapshot import (Snapshot, snapshot, restore, save_file, load_file, save_db, load_db,
+                                   run_with_checkpoints)
+
+TEST_DB = "test_post_machine_snapshot.db"
+
+PROGRAM = """
+# инкремент в двоичной записи
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    RIGHT
+    IF1 set1
+    HALT
+"""
+
+@pytest.fixture(autouse=True)
+def setup_test_db(monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", TEST_DB)
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+    db.init_db()
+    yield
+    db.close_db()
+    if os.path.exists(TEST_DB):
+        os.remove(TEST_DB)
+
+def _reference():
+    pm = PostMachine(PROGRAM, tape=tape_from_str("1" * 50), head=49)
+    pm.run()
+    return pm
+
+def test_resume_after_step_limit_matches_full_run(tmp_path):
+    pm = PostMachine(PROGRAM, tape=tape_from_str("1" * 50), head=49, step_limit=70)
+    assert not pm.run()
+    path = str(tmp_path / "m.snap")
+    save_file(snapshot(pm), path)
+    resumed = restore(load_file(path))
+    assert resumed.steps == 70
+    resumed.run_for(10000)
+    ref = _reference()
+    assert (resumed.steps, resumed.head, resumed.pc, resumed.tape) == (ref.steps, ref.head, ref.pc, ref.tape)
+
+def test_bytes_round_trip_and_db():
+    pm = PostMachine(PROGRAM, tape=tape_from_str("1011001", -3), head=2, step_limit=5)
+    pm.run()
+    snap = snapshot(pm)
+    assert Snapshot.from_bytes(snap.to_bytes()) == snap
+    save_db(snap, "cp")
+    dense = restore(load_db("cp"), dense=True)
+    assert dense.tape == pm.tape and (dense.pc, dense.head, dense.steps) == (pm.pc, pm.head, pm.steps)
+
+def test_periodic_checkpoints():
+    saved = []
+    pm = PostMachine(PROGRAM, tape=tape_from_str("1" * 50), head=49)
+    assert run_with_checkpoints(pm, 40, saved.append)
+    assert [s.steps for s in saved[:-1]] == list(range(40, pm.steps, 40))
+    assert saved[-1].halted and saved[-1].steps == pm.steps == _reference().steps
+    assert pm.step_limit == 10000
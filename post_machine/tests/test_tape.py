@@ -0,0 +1,105 @@
+import pytest
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.tape import (BitTape, decode_bits, encode_bits, iter_range_chunks,
+                                load_tape_file, save_tape_file, tape_find)
+
+INCREMENT = """
+start:
+    RIGHT
+find_end:
+    IF0 at_end
+    RIGHT
+    GOTO find_end
+at_end:
+    LEFT
+add:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO add
+set1:
+    MARK
+    HALT
+"""
+
+def test_bit_tape_behaves_like_dict():
+    t = BitTape()
+    t[5] = 1
+    t[-40] = 1
+    assert 5 in t and -40 in t
+    assert len(t) == 2
+    assert t.span() == (-40, 5)
+    assert t.pop(-40) == 1
+    assert t.span() == (5, 5)
+    assert t.get(-40, 0) == 0
+    assert t == {5: 1}
+
+def test_bit_tape_from_str_and_range():
+    t = BitTape.from_str("0010110", left_index=-3)
+    assert t.span() == (-1, 2)
+    assert t.as_str_range(-5, 5) == "00001011000"
+    assert len(t) == 3
+
+def test_bit_tape_find():
+    t = BitTape.from_str("1111100001")
+    assert t.find(0, 0, 1) == 5
+    assert t.find(5, 1, 1) == 9
+    assert t.find(9, 0, -1) == 8
+    assert t.find(4, 0, -1) == -1
+    assert t.find(10, 1, 1) is None
+    assert t.find(0, 0, 1, limit=3) is None
+
+def test_dict_tape_find_matches_bit_tape():
+    data = "1111100001" + "0" * 30 + "1"
+    bits, cells = BitTape.from_str(data), tape_from_str(data)
+    for pos in range(-3, 45):
+        for value in (0, 1):
+            for step in (1, -1):
+                for limit in (None, 1, 4, 12, 100):
+                    assert tape_find(cells, pos, value, step, limit) == bits.find(pos, value, step, limit)
+
+@pytest.mark.parametrize("data", ["1011", "1111", "0", "100000000000000000001"])
+def test_machine_same_result_on_both_tapes(data):
+    sparse = PostMachine(INCREMENT, tape=tape_from_str(data))
+    dense = PostMachine(INCREMENT, tape=tape_from_str(data, dense=True))
+    sparse.run()
+    dense.run()
+    assert (sparse.steps, sparse.head, sparse.halted) == (dense.steps, dense.head, dense.halted)
+    assert sparse.get_tape_span() == dense.get_tape_span()
+    assert sparse.tape_as_str_range(-3, 30) == dense.tape_as_str_range(-3, 30)
+    assert dense.tape == sparse.tape
+
+@pytest.mark.parametrize("data", ["1", "0011010", "1" * 17, "10000000" * 3 + "1"])
+def test_bit_tape_from_bytes(data):
+    packed = int(data[::-1], 2).to_bytes((len(data) + 7) // 8, 'little')
+    t = BitTape.from_bytes(packed + b'\xff', len(data), left_index=-3)
+    assert t == BitTape.from_str(data, -3)
+    assert t.span() == BitTape.from_str(data, -3).span()
+    big = bytes(int(format(b, '08b')[::-1], 2) for b in packed)
+    assert BitTape.from_bytes(big, len(data), -3, bitorder='big') == t
+
+def test_tape_file_round_trip(tmp_path):
+    data = "1101" + "0" * 5000 + "1"
+    path = str(tmp_path / "tape.bin")
+    save_tape_file(tape_from_str(data, left_index=-2), path)
+    dense = load_tape_file(path)
+    assert dense.span() == (-2, len(data) - 3)
+    assert dense.as_str_range(-2, len(data) - 3) == data
+    assert load_tape_file(path, dense=False) == tape_from_str(data, left_index=-2)
+
+def test_streaming_export_and_blob_encoding():
+    data = "1011" * 1000
+    t = tape_from_str(data, dense=True)
+    assert ''.join(iter_range_chunks(t, 0, len(data) - 1, chunk=333)) == data
+    for s in ["0", "1", "10110", "1" * 64, "0" * 9]:
+        assert decode_bits(encode_bits(s)) == s
+
+def test_sparse_chunks_and_empty_tape_file(tmp_path):
+    tape = {-5: 1, 0: 1, 700: 1, 10**5: 1}
+    left, right = -10, 10**5 + 3
+    expected = ''.join('1' if i in tape else '0' for i in range(left, right + 1))
+    assert ''.join(iter_range_chunks(tape, left, right, chunk=97)) == expected
+    path = str(tmp_path / "empty.bin")
+    save_tape_file({}, path)
+    assert len(load_tape_file(path)) == 0
+    assert load_tape_file(path, dense=False) == {}
@@ -0,0 +1,78 @@
+import pytest
+
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.timetravel import TimeTravel
+
+# Двоичный счётчик: ленту постоянно переписывает, головка ходит в обе стороны
+COUNTER = """
+start:
+    IF0 set
+    ERASE
+    LEFT
+    GOTO start
+set:
+    MARK
+back:
+    RIGHT
+    IF1 back
+    LEFT
+    GOTO start
+"""
+
+ADD_ONE = """
+start:
+    RIGHT
+    IF1 start
+    MARK
+    HALT
+"""
+
+def _state(pm):
+    return pm.steps, pm.pc, pm.head, pm.halted, dict(pm.tape.items())
+
+def _reference(program, data, step_limit, dense=False):
+    pm = PostMachine(program, tape=tape_from_str(data, dense=dense), head=len(data) - 1, step_limit=step_limit)
+    states = [_state(pm)]
+    while not pm.halted and pm.steps < step_limit:
+        pm.step()
+        states.append(_state(pm))
+    return states
+
+def test_step_back_restores_every_step():
+    states = _reference(COUNTER, "1", 500)
+    pm = PostMachine(COUNTER, tape=tape_from_str("1"), head=0, step_limit=500)
+    tt = TimeTravel(pm)
+    assert not tt.run()
+    assert _state(pm) == states[-1] and tt.history_size == 500
+    for expected in reversed(states[:-1]):
+        assert tt.step_back() == 1
+        assert _state(pm) == expected
+    assert tt.step_back() == 0
+
+def test_step_back_over_halt():
+    states = _reference(ADD_ONE, "11", 100)
+    pm = PostMachine(ADD_ONE, tape=tape_from_str("11"), head=1, step_limit=100)
+    tt = TimeTravel(pm)
+    assert tt.run()
+    assert tt.step_back(2) == 2 and _state(pm) == states[-3]
+    assert tt.forward(10) == 2 and _state(pm) == states[-1]
+
+@pytest.mark.parametrize("dense", [False, True])
+def test_seek_beyond_trimmed_log_uses_snapshots(dense):
+    states = _reference(COUNTER, "1", 3000, dense)
+    pm = PostMachine(COUNTER, tape=tape_from_str("1", dense=dense), head=0, step_limit=3000)
+    tt = TimeTravel(pm, max_history=64, snapshot_every=16, max_snapshots=8)
+    tt.run()
+    assert tt.history_size <= 64 + 16
+    assert len(tt._snapshots) <= 8 and tt.earliest == 0
+    for step in (2999, 0, 1234, 1235, 17, 2500, 3000, 1):
+        assert tt.seek(step) == step
+        assert _state(pm) == states[step]
+        assert type(pm.tape) is type(tape_from_str("1", dense=dense))
+    tt.seek(100)
+    assert tt.step_back(50) == 50 and _state(pm) == states[50]
+
+def test_constructor_checks_sizes():
+    pm = PostMachine(ADD_ONE, tape=tape_from_str("1"), head=0)
+    with pytest.raises(ValueError):
+        TimeTravel(pm, max_history=10, snapshot_every=8)
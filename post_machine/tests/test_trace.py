@@ -0,0 +1,53 @@
+import io
+import pytest
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.trace import BinaryTraceWriter, RingTrace, iter_trace, read_trace
+
+PROGRAM = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+done:
+    MARK
+    HALT
+"""
+
+def _machine():
+    return PostMachine(PROGRAM, tape=tape_from_str("111"))
+
+def test_trace_does_not_change_result():
+    ref = _machine()
+    ref.run()
+    pm = _machine()
+    records = []
+    pm.run(trace=records.append)
+    assert (pm.steps, pm.head, pm.tape) == (ref.steps, ref.head, ref.tape)
+    assert [r.step for r in records] == list(range(1, ref.steps + 1))
+    assert records[-2].bit == 1 and records[-2].head == 3
+
+def test_sampling_and_ring_buffer():
+    sampled = list(iter_trace(_machine(), every=4))
+    assert [r.step for r in sampled] == [4, 8, 12]
+    ring = RingTrace(3)
+    pm = _machine()
+    pm.run(trace=ring)
+    assert [r.step for r in ring.records()] == [pm.steps - 2, pm.steps - 1, pm.steps]
+
+def test_ring_buffer_needs_capacity():
+    with pytest.raises(ValueError):
+        RingTrace(0)
+
+def test_binary_round_trip():
+    buf = io.BytesIO()
+    writer = BinaryTraceWriter(buf, buffer=2)
+    records = []
+
+    def both(rec):
+        records.append(rec)
+        writer(rec)
+
+    _machine().run(trace=both)
+    writer.close()
+    buf.seek(0)
+    assert list(read_trace(buf)) == records
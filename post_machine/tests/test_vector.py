@@ -0,0 +1,48 @@
+import pytest
+from post_machine.machine import PostMachine, tape_from_str
+
+np = pytest.importorskip("numpy")
+from post_machine.vector import VectorMachine, HALTED, FAILED, RUNNING  # noqa: E402
+
+PROGRAM = """
+start:
+    IF0 set1
+    ERASE
+    LEFT
+    GOTO start
+set1:
+    MARK
+    RIGHT
+    IF1 back
+    HALT
+back:
+    GOTO nowhere
+nowhere:
+"""
+
+def test_lanes_match_separate_machines():
+    inputs = ["1011", "111", "0", "1", "110", "1" * 40, "10" * 30]
+    for limit in (3, 20, 1000):
+        vm = VectorMachine(PROGRAM, inputs, step_limit=limit)
+        status = vm.run()
+        for i, data in enumerate(inputs):
+            ref = PostMachine(PROGRAM, tape=tape_from_str(data), head=len(data) - 1, step_limit=limit)
+            try:
+                ref.run()
+                expected = HALTED if ref.halted else RUNNING
+            except RuntimeError:
+                expected = FAILED
+            pm = vm.machine(i)
+            assert status[i] == expected
+            assert (pm.steps, pm.head, pm.pc, pm.tape) == (ref.steps, ref.head, ref.pc, ref.tape)
+
+def test_tape_grows_in_both_directions():
+    code = """
+start:
+    RIGHT
+    IF0 start
+"""
+    vm = VectorMachine(code, ["1", "0"], heads=[-200, 0], step_limit=500)
+    vm.run()
+    assert vm.machine(0).head == 0 and vm.machine(0).steps == 400
+    assert vm.machine(1).steps == 500
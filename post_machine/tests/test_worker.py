@@ -0,0 +1,62 @@
+from post_machine.machine import PostMachine, tape_from_str
+from post_machine.timetravel import TimeTravel
+from post_machine.worker import MachineWorker
+
+SCAN = """
+start:
+    IF0 done
+    RIGHT
+    GOTO start
+done:
+    MARK
+    HALT
+"""
+
+LOOP = """
+start:
+    GOTO start
+"""
+
+def _events(worker):
+    events = []
+    while True:
+        event = worker.events.get(timeout=10)
+        events.append(event)
+        if event[0] != 'progress':
+            return events
+
+def test_worker_reports_progress_and_result():
+    ref = PostMachine(SCAN, tape=tape_from_str("1" * 100), step_limit=10**6)
+    ref.run()
+    pm = PostMachine(SCAN, tape=tape_from_str("1" * 100), step_limit=10**6)
+    worker = MachineWorker(pm, slice=50)
+    worker.start()
+    events = _events(worker)
+    assert events[-1] == ('done', pm)
+    progress = [e for e in events if e[0] == 'progress']
+    assert len(progress) == ref.steps // 50 + 1
+    _, steps, rate, head, left, window = progress[0]
+    assert steps == 50 and len(window) == 61 and window[head - left] in "01"
+    assert (pm.steps, pm.head, pm.tape, pm.step_limit) == (ref.steps, ref.head, ref.tape, 10**6)
+
+def test_worker_pause_and_cancel():
+    pm = PostMachine(LOOP, step_limit=10**9)
+    worker = MachineWorker(pm, slice=1000)
+    worker.pause()
+    worker.start()
+    assert worker.paused
+    worker.cancel()
+    assert _events(worker) == [('cancelled', pm)]
+    assert pm.steps == 0
+
+def test_worker_records_history():
+    ref = PostMachine(SCAN, tape=tape_from_str("1" * 100), step_limit=10**6)
+    ref.run()
+    pm = PostMachine(SCAN, tape=tape_from_str("1" * 100), step_limit=10**6)
+    history = TimeTravel(pm)
+    worker = MachineWorker(pm, slice=50, history=history)
+    worker.start()
+    assert _events(worker)[-1] == ('done', pm)
+    assert (pm.steps, pm.head, pm.tape) == (ref.steps, ref.head, ref.tape)
+    history.seek(0)
+    assert (pm.steps, pm.head, pm.pc, pm.halted, pm.tape) == (0, 0, 0, False, tape_from_str("1" * 100))
@@ -0,0 +1,204 @@
+from array import array
+from bisect import bisect_right, insort
+from typing import Dict, List
+
+from .machine import OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, PostMachine
+from .snapshot import Snapshot, snapshot
+from .tape import BitTape, unpack_tape
+
+# Шагов в журнале отмены (8 байт на шаг)
+MAX_HISTORY = 1 << 22
+# Полный снимок состояния каждые столько шагов
+SNAPSHOT_EVERY = 1 << 16
+# Снимков сверх этого числа прореживаются: старые остаются через один
+MAX_SNAPSHOTS = 256
+
+
+class TimeTravel:
+    """Запись выполнения машины с возможностью шагать назад и переходить к любому шагу.
+
+    На каждый шаг в журнал (array) пишется одно число: pc выполненной команды и прежний
+    бит ячейки под головкой (pc * 2 + бит); сдвиг головки и остановка восстанавливаются
+    по коду команды. Журнал ограничен max_history шагами — при переполнении отбрасывается
+    старая половина. Дальше журнала назад позволяют вернуться периодические полные снимки
+    (snapshot.Snapshot) с последующим повторным выполнением до нужного шага.
+    """
+
+    def __init__(self, pm: PostMachine, max_history: int = MAX_HISTORY,
+                 snapshot_every: int = SNAPSHOT_EVERY, max_snapshots: int = MAX_SNAPSHOTS):
+        if max_history < 2 * snapshot_every:
+            raise ValueError("max_history должен быть не меньше двух интервалов между снимками")
+        self.pm = pm
+        self.max_history = max_history
+        self.snapshot_every = snapshot_every
+        self.max_snapshots = max_snapshots
+        self._log = array('q')
+        self._log_start = pm.steps   # шаг, с которого начинается журнал
+        self._snapshots: Dict[int, Snapshot] = {}
+        self._snapshot_steps: List[int] = []
+        self._take_snapshot()
+
+    @property
+    def position(self) -> int:
+        return self.pm.steps
+
+    @property
+    def earliest(self) -> int:
+        """Самый ранний шаг, к которому можно вернуться."""
+        return self._snapshot_steps[0]
+
+    @property
+    def history_size(self) -> int:
+        return len(self._log)
+
+    def _take_snapshot(self):
+        steps = self.pm.steps
+        if steps in self._snapshots:
+            return
+        self._snapshots[steps] = snapshot(self.pm)
+        insort(self._snapshot_steps, steps)
+        if len(self._snapshot_steps) > self.max_snapshots:
+            # Прореживание: среди снимков старше журнала каждый второй удаляется (первый сохраняется)
+            old = [s for s in self._snapshot_steps[1:] if s < self._log_start]
+            drop = set(old[1::2]) or {self._snapshot_steps[1]}
+            for s in drop:
+                del self._snapshots[s]
+            self._snapshot_steps = [s for s in self._snapshot_steps if s not in drop]
+
+    def _trim(self):
+        # Отбрасываем старую половину журнала; эти шаги остаются доступны через снимки
+        drop = len(self._log) - self.max_history // 2
+        del self._log[:drop]
+        self._log_start += drop
+
+    def _sync(self):
+        # Машину выполняли в обход записи (например, обычным run()): журнал начинается заново
+        if len(self._log) != self.pm.steps - self._log_start:
+            del self._log[:]
+            self._log_start = self.pm.steps
+
+    def forward(self, n: int = 1) -> int:
+        """Выполняет до n шагов с записью (не дальше step_limit и остановки); возвращает число шагов."""
+        pm = self.pm
+        self._sync()
+        if pm.halted:
+            return 0
+        code = pm.code
+        size = len(code)
+        tape = pm.tape
+        read = tape.get
+        erase = tape.pop
+        log = self._log
+        append = log.append
+        every = self.snapshot_every
+        pc, head, steps = pm.pc, pm.head, pm.steps
+        start = steps
+        end = min(pm.step_limit, steps + n)
+        try:
+            while steps < end:
+                if steps % every == 0:
+                    pm.pc, pm.head, pm.steps = pc, head, steps
+                    self._take_snapshot()
+                    if len(log) > self.max_history:
+                        self._trim()
+                # Вложенный цикл до ближайшей границы снимка без лишних проверок
+                stop = min(end, (steps // every + 1) * every)
+                while steps < stop:
+                    if not (0 <= pc < size):
+                        raise RuntimeError("PC выходит за границы программы")
+                    op, target = code[pc]
+                    steps += 1
+                    if op == OP_IF1:
+                        append(pc << 1)
+                        pc = target if read(head, 0) == 1 else pc + 1
+                    elif op == OP_IF0:
+                        append(pc << 1)
+                        pc = target if read(head, 0) == 0 else pc + 1
+                    elif op == OP_RIGHT:
+                        append(pc << 1)
+                        head += 1
+                        pc += 1
+                    elif op == OP_LEFT:
+                        append(pc << 1)
+                        head -= 1
+                        pc += 1
+                    elif op == OP_GOTO:
+                        append(pc << 1)
+                        pc = target
+                    elif op == OP_MARK:
+                        append(pc << 1 | (1 if read(head, 0) else 0))
+                        tape[head] = 1
+                        pc += 1
+                    elif op == OP_ERASE:
+                        append(pc << 1 | (1 if erase(head, None) else 0))
+                        pc += 1
+                    else:
+                        append(pc << 1)
+                        pm.halted = True
+                        return steps - start
+        finally:
+            pm.pc, pm.head, pm.steps = pc, head, steps
+        return steps - start
+
+    def run(self) -> bool:
+        """Выполняет с записью до остановки или step_limit."""
+        self.forward(self.pm.step_limit - self.pm.steps)
+        return self.pm.halted
+
+    def step_back(self, n: int = 1) -> int:
+        """Отменяет до n шагов; за пределами журнала — через снимок. Возвращает число отменённых шагов."""
+        pm = self.pm
+        self._sync()
+        target = max(self.earliest, pm.steps - n)
+        if target < self._log_start:
+            done = pm.steps - target
+            self.seek(target)
+            return done
+        code = pm.code
+        tape = pm.tape
+        log = self._log
+        pop = log.pop
+        head, steps = pm.head, pm.steps
+        pc = pm.pc
+        count = pm.steps - target
+        for _ in range(count):
+            entry = pop()
+            pc = entry >> 1
+            op = code[pc][0]
+            if op == OP_LEFT:
+                head += 1
+            elif op == OP_RIGHT:
+                head -= 1
+            elif op == OP_MARK or op == OP_ERASE:
+                if entry & 1:
+                    tape[head] = 1
+                else:
+                    tape.pop(head, None)
+            elif op not in (OP_IF1, OP_IF0, OP_GOTO):
+                pm.halted = False
+            steps -= 1
+        pm.pc, pm.head, pm.steps = pc, head, steps
+        return count
+
+    def _restore(self, snap: Snapshot):
+        pm = self.pm
+        pm.tape = unpack_tape(snap.tape_left, snap.tape_len, snap.tape_bits, isinstance(pm.tape, BitTape))
+        pm.pc, pm.head, pm.steps, pm.halted = snap.pc, snap.head, snap.steps, snap.halted
+        # Журнал относится к отменённой ветви истории: начинаем его заново со снимка
+        del self._log[:]
+        self._log_start = snap.steps
+
+    def seek(self, step: int) -> int:
+        """Переходит к шагу step (в пределах earliest..step_limit); возвращает достигнутый шаг."""
+        pm = self.pm
+        self._sync()
+        step = max(step, self.earliest)
+        if step >= pm.steps:
+            self.forward(step - pm.steps)
+        elif step >= self._log_start:
+            self.step_back(pm.steps - step)
+        else:
+            snap_step = self._snapshot_steps[bisect_right(self._snapshot_steps, step) - 1]
+            self._restore(self._snapshots[snap_step])
+            self.forward(step - snap_step)
+        return pm.steps
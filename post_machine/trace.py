@@ -0,0 +1,108 @@
+import struct
+from array import array
+from typing import BinaryIO, Callable, Iterator, List, NamedTuple, Optional
+
+from .machine import PostMachine
+
+# Запись в двоичном файле трассы: step, pc, opcode, head, bit
+RECORD = struct.Struct('<qiBqB')
+MAGIC = b'PMTRACE1'
+
+
+class TraceRecord(NamedTuple):
+    step: int
+    pc: int      # индекс выполненной инструкции
+    opcode: int
+    head: int    # позиция головки после шага
+    bit: int     # значение ячейки под головкой после шага
+
+
+def iter_trace(pm: PostMachine, every: int = 1) -> Iterator[TraceRecord]:
+    """Выполняет машину по шагам и выдаёт каждую every-ю запись (и последнюю)."""
+    code = pm.code
+    while not pm.halted and pm.steps < pm.step_limit:
+        pc = pm.pc
+        pm.step()
+        if pm.steps % every == 0 or pm.halted:
+            yield TraceRecord(pm.steps, pc, code[pc][0], pm.head, pm._read(pm.head))
+
+
+def run_traced(pm: PostMachine, callback: Callable[[TraceRecord], None], every: int = 1) -> bool:
+    for rec in iter_trace(pm, every):
+        callback(rec)
+    return pm.halted
+
+
+class RingTrace:
+    """Последние k записей в массивах фиксированного размера — без объекта на каждый шаг."""
+
+    def __init__(self, k: int):
+        if k < 1:
+            raise ValueError("Размер истории должен быть не меньше 1")
+        self.k = k
+        self.count = 0
+        self._step = array('q', bytes(8 * k))
+        self._pc = array('i', bytes(4 * k))
+        self._op = array('B', bytes(k))
+        self._head = array('q', bytes(8 * k))
+        self._bit = array('B', bytes(k))
+
+    def __call__(self, rec: TraceRecord):
+        i = self.count % self.k
+        self._step[i], self._pc[i], self._op[i], self._head[i], self._bit[i] = rec
+        self.count += 1
+
+    def __len__(self) -> int:
+        return min(self.count, self.k)
+
+    def records(self) -> List[TraceRecord]:
+        n = len(self)
+        start = self.count - n
+        return [TraceRecord(self._step[i % self.k], self._pc[i % self.k], self._op[i % self.k],
+                            self._head[i % self.k], self._bit[i % self.k]) for i in range(start, self.count)]
+
+
+class BinaryTraceWriter:
+    """Пишет записи в файл по мере выполнения (буфер сбрасывается каждые buffer записей)."""
+
+    def __init__(self, f: BinaryIO, buffer: int = 4096):
+        self.f = f
+        self.buffer = buffer
+        self._chunk = bytearray()
+        self._pending = 0
+        f.write(MAGIC)
+
+    def __call__(self, rec: TraceRecord):
+        self._chunk += RECORD.pack(*rec)
+        self._pending += 1
+        if self._pending >= self.buffer:
+            self.flush()
+
+    def flush(self):
+        self.f.write(self._chunk)
+        self._chunk = bytearray()
+        self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.f.flush()
+
+
+def read_trace(f: BinaryIO) -> Iterator[TraceRecord]:
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Файл не является трассой машины Поста")
+    while True:
+        chunk = f.read(RECORD.size * 4096)
+        if not chunk:
+            return
+        for fields in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+            yield TraceRecord(*fields)
+
+
+def format_trace(records, pm: Optional[PostMachine] = None) -> str:
+    # Человекочитаемая история команд; с машиной — с исходным текстом инструкций
+    lines = []
+    for rec in records:
+        instr = pm.instructions[rec.pc][1] if pm is not None else str(rec.opcode)
+        lines.append(f"step={rec.step:6d} pc={rec.pc:3d} {instr:<12} head={rec.head:4d} bit={rec.bit}")
+    return '\n'.join(lines)
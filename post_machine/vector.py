@@ -0,0 +1,124 @@
+from typing import List, Optional, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # numpy — необязательная зависимость
+    np = None
+
+from .machine import (OP_MARK, OP_ERASE, OP_LEFT, OP_RIGHT, OP_IF1, OP_IF0, OP_GOTO, OP_HALT,
+                      PostMachine)
+
+RUNNING, HALTED, FAILED = 0, 1, 2
+# Запас пустых ячеек по краям ленты при создании и расширении
+PADDING = 64
+
+
+class VectorMachine:
+    """Одна программа на N лентах одновременно: шаг выполняется для всех дорожек сразу.
+
+    Ленты хранятся в двумерном массиве bool (дорожка × ячейка), pc/head/steps — векторы.
+    Каждый шаг — набор масочных операций по кодам команд; остановившиеся дорожки
+    исключаются из дальнейших шагов. Результат совпадает с отдельным запуском PostMachine.
+    """
+
+    def __init__(self, program_text: str, inputs: Sequence[str], heads: Optional[Sequence[int]] = None,
+                 step_limit: int = 10000):
+        if np is None:
+            raise ImportError("Для VectorMachine требуется numpy (pip install numpy)")
+        self.template = PostMachine(program_text, step_limit=step_limit)
+        self.step_limit = step_limit
+        n = len(inputs)
+        if heads is None:
+            heads = [len(data) - 1 for data in inputs]
+        width = max([len(data) for data in inputs] + [1])
+        lo = min(list(heads) + [0])
+        hi = max(list(heads) + [width - 1])
+        # base — позиция ленты, соответствующая столбцу 0
+        self.base = lo - PADDING
+        self.tapes = np.zeros((n, hi - lo + 1 + 2 * PADDING), dtype=bool)
+        for i, data in enumerate(inputs):
+            if data:
+                row = np.frombuffer(data.encode('ascii'), dtype=np.uint8) == ord('1')
+                self.tapes[i, -self.base:-self.base + len(data)] = row
+        self.head = np.asarray(heads, dtype=np.int64) - self.base
+        self.pc = np.full(n, self.template.start_pc, dtype=np.int64)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.status = np.zeros(n, dtype=np.int8)
+        code = self.template.code
+        # Фиктивная команда в конце таблицы для pc вне программы
+        self._ops = np.array([op for op, _ in code] + [-1], dtype=np.int8)
+        self._targets = np.array([t for _, t in code] + [0], dtype=np.int64)
+
+    def _grow(self):
+        n, width = self.tapes.shape
+        pad = max(PADDING, width // 2)
+        self.tapes = np.pad(self.tapes, ((0, 0), (pad, pad)))
+        self.head += pad
+        self.base -= pad
+
+    def run(self) -> np.ndarray:
+        """Выполняет все дорожки до остановки, лимита шагов или ошибки; возвращает status."""
+        ops, targets = self._ops, self._targets
+        n_code = len(ops) - 1
+        active = np.flatnonzero((self.status == RUNNING) & (self.steps < self.step_limit))
+        while active.size:
+            pc = self.pc[active]
+            out = (pc < 0) | (pc >= n_code)
+            if out.any():
+                self.status[active[out]] = FAILED
+                active = active[~out]
+                pc = pc[~out]
+                if not active.size:
+                    break
+            op = ops[pc]
+            head = self.head[active]
+            cell = self.tapes[active, head]
+
+            mark = op == OP_MARK
+            if mark.any():
+                self.tapes[active[mark], head[mark]] = True
+            erase = op == OP_ERASE
+            if erase.any():
+                self.tapes[active[erase], head[erase]] = False
+            head = head + (op == OP_RIGHT) - (op == OP_LEFT)
+
+            jump = (op == OP_GOTO) | ((op == OP_IF1) & cell) | ((op == OP_IF0) & ~cell)
+            halt = op == OP_HALT
+            new_pc = np.where(jump, targets[pc], pc + 1)
+            new_pc[halt] = pc[halt]
+
+            self.pc[active] = new_pc
+            self.head[active] = head
+            self.steps[active] += 1
+            if halt.any():
+                self.status[active[halt]] = HALTED
+
+            if head.size and (head.min() <= 0 or head.max() >= self.tapes.shape[1] - 1):
+                self._grow()
+            keep = (self.status[active] == RUNNING) & (self.steps[active] < self.step_limit)
+            if not keep.all():
+                active = active[keep]
+        return self.status
+
+    def __len__(self) -> int:
+        return self.tapes.shape[0]
+
+    def machine(self, i: int) -> PostMachine:
+        """Состояние дорожки i в виде PostMachine (лента — словарь)."""
+        cols = np.flatnonzero(self.tapes[i])
+        pm = PostMachine(self.template.program, tape={int(c) + self.base: 1 for c in cols},
+                         head=int(self.head[i]) + self.base, step_limit=self.step_limit)
+        pm.pc = int(self.pc[i])
+        pm.steps = int(self.steps[i])
+        pm.halted = bool(self.status[i] == HALTED)
+        return pm
+
+    def machines(self) -> List[PostMachine]:
+        return [self.machine(i) for i in range(len(self))]
+
+
+def run_vectorized(program_text: str, inputs: Sequence[str], heads: Optional[Sequence[int]] = None,
+                   step_limit: int = 10000) -> List[PostMachine]:
+    vm = VectorMachine(program_text, inputs, heads, step_limit)
+    vm.run()
+    return vm.machines()
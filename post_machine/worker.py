@@ -0,0 +1,82 @@
+import queue
+import threading
+import time
+from typing import Optional
+
+from .machine import PostMachine
+from .timetravel import TimeTravel
+
+# Шагов за один отрезок между проверками паузы/отмены и отчётами о ходе выполнения
+SLICE = 20000
+# Половина ширины окна ленты вокруг головки, передаваемого в отчётах
+WINDOW = 30
+
+
+class MachineWorker(threading.Thread):
+    """Выполняет машину в фоновом потоке отрезками по slice шагов.
+
+    Сообщения в очереди events:
+      ('progress', steps, steps_per_sec, head, left, window) — окно ленты [left, left+2*WINDOW]
+      ('done', pm) | ('cancelled', pm) | ('error', pm, текст)
+    С history (TimeTravel для той же машины) выполнение записывается, и после остановки
+    по нему можно перемещаться назад и вперёд без повторного счёта.
+    """
+
+    def __init__(self, pm: PostMachine, events: Optional[queue.Queue] = None, slice: int = SLICE,
+                 window: int = WINDOW, history: Optional[TimeTravel] = None, **run_kwargs):
+        super().__init__(daemon=True)
+        self.pm = pm
+        self.events = events if events is not None else queue.Queue()
+        self.slice = slice
+        self.window = window
+        self.history = history
+        self.run_kwargs = run_kwargs
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancel = threading.Event()
+
+    def pause(self):
+        self._resume.clear()
+
+    def resume(self):
+        self._resume.set()
+
+    def cancel(self):
+        self._cancel.set()
+        self._resume.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resume.is_set()
+
+    def _progress(self, rate: float):
+        pm = self.pm
+        left = pm.head - self.window
+        self.events.put(('progress', pm.steps, rate, pm.head, left,
+                         pm.tape_as_str_range(left, pm.head + self.window)))
+
+    def run(self):
+        pm = self.pm
+        limit = pm.step_limit
+        try:
+            while not pm.halted and pm.steps < limit:
+                self._resume.wait()
+                if self._cancel.is_set():
+                    self.events.put(('cancelled', pm))
+                    return
+                start, before = time.perf_counter(), pm.steps
+                if self.history is not None:
+                    self.history.forward(self.slice)
+                else:
+                    # отрезок выполняется обычным run() с временно уменьшенным лимитом
+                    pm.step_limit = min(limit, pm.steps + self.slice)
+                    try:
+                        pm.run(**self.run_kwargs)
+                    finally:
+                        pm.step_limit = limit
+                elapsed = time.perf_counter() - start
+                self._progress((pm.steps - before) / elapsed if elapsed > 0 else 0.0)
+        except Exception as e:
+            self.events.put(('error', pm, str(e)))
+            return
+        self.events.put(('done', pm))